@@ -0,0 +1,142 @@
+""" Adaptive allocation of repeated runs over the points of a sweep
+
+Every timestep keeps a running mean and variance of its outcome fractions (Welford's algorithm).
+Repeats are requested in rounds: a timestep gets another repeat only while the confidence interval
+of one of its outcome fractions is wider than the target width, and only while the shot budget lasts.
+The widest intervals are served first when the budget runs short.
+"""
+import numpy as np
+
+
+def binomial_width(shots, repeats, z=1.96):
+    """ Widest confidence interval an outcome fraction can reach after repeats of shots each
+
+    The shot noise floor of AdaptiveScheduler.width() for a fraction of 0.5, the middle of a quantum beats curve.
+    A target width below it can not be reached with that many repeats.
+    """
+    return 2 * z * np.sqrt(0.25 / (shots * repeats))
+
+
+class RunningStats(object):
+    """ Running mean and variance of a vector of observations, updated one observation at a time """
+
+    def __init__(self, size):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+
+    def update(self, value):
+        value = np.asarray(value, dtype=float)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """ Sample variance, as np.var(..., ddof=1) """
+        if self.count < 2:
+            return np.full(self.mean.shape, np.inf)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        """ Population standard deviation, as np.std """
+        if self.count == 0:
+            return np.full(self.mean.shape, np.nan)
+        return np.sqrt(self._m2 / self.count)
+
+    def ci_width(self, z=1.96):
+        """ Width of the confidence interval of the mean, z = 1.96 for 95% """
+        return 2 * z * np.sqrt(self.variance / max(self.count, 1))
+
+
+class AdaptiveScheduler(object):
+    """ Decides which timesteps get another repeat of shots each
+
+    Every timestep gets min_repeats repeats in the first round. After that a timestep gets one more repeat per round
+    until the widest confidence interval of its outcome fractions is at most target_width, it reached max_repeats,
+    or shot_budget shots were spent on the whole sweep. With min_repeats == max_repeats every timestep gets
+    exactly that many repeats, in one round.
+    """
+
+    def __init__(self, timesteps, n_outcomes, shots, target_width, shot_budget=None,
+                 min_repeats=2, max_repeats=9, z=1.96):
+        self.timesteps = list(timesteps)
+        self.shots = shots
+        self.target_width = target_width
+        self.shot_budget = shot_budget
+        self.min_repeats = min_repeats
+        self.max_repeats = max_repeats
+        self.z = z
+        self.stats = dict((t, RunningStats(n_outcomes)) for t in self.timesteps)
+        self.requested = dict((t, 0) for t in self.timesteps)
+        self.shots_requested = 0
+
+    def record(self, t, counts):
+        """ Adds the outcome counts of a finished repeat of timestep t """
+        counts = np.asarray(counts, dtype=float)
+        self.stats[t].update(counts / counts.sum())
+
+    def width(self, t):
+        """ Widest confidence interval of the outcome fractions of timestep t
+
+        The variance between repeats is never taken to be below the binomial shot noise of one repeat,
+        so a few repeats that agree by chance do not end a timestep early.
+        """
+        stats = self.stats[t]
+        if stats.count < 2:
+            return np.inf
+        variance = np.maximum(stats.variance, stats.mean * (1 - stats.mean) / self.shots)
+        return np.max(2 * self.z * np.sqrt(variance / stats.count))
+
+    def converged(self, t):
+        return self.width(t) <= self.target_width
+
+    def _affordable(self, repeats):
+        if self.shot_budget is None:
+            return repeats
+        return max(min(repeats, (self.shot_budget - self.shots_requested) // self.shots), 0)
+
+    def next_round(self):
+        """ (t, repeat) of every repeat to run next, empty when the sweep is done """
+        requests = []
+        for t in self.timesteps:
+            for repeat in range(self.requested[t], self.min_repeats):
+                requests.append((t, repeat))
+        if not requests:
+            candidates = [t for t in self.timesteps
+                          if self.requested[t] < self.max_repeats and not self.converged(t)]
+            candidates.sort(key=self.width, reverse=True)
+            requests = [(t, self.requested[t]) for t in candidates]
+        requests = requests[:self._affordable(len(requests))]
+        for t, repeat in requests:
+            self.requested[t] = repeat + 1
+        self.shots_requested += len(requests) * self.shots
+        return requests
+
+    def run(self, run_round):
+        """ Runs rounds until the sweep is done
+
+        run_round(requests) runs a list of (t, repeat) and returns {(t, repeat): outcome counts}.
+        """
+        requests = self.next_round()
+        while requests:
+            counts = run_round(requests)
+            for t, repeat in requests:
+                self.record(t, counts[t, repeat])
+            requests = self.next_round()
+
+    def repeats(self, t):
+        return self.stats[t].count
+
+    def summary(self):
+        """ Repeats and shots spent, to compare with a fixed number of repeats """
+        repeats = sum(self.repeats(t) for t in self.timesteps)
+        return {
+            'repeats': repeats,
+            'shots': repeats * self.shots,
+            'converged': sum(1 for t in self.timesteps if self.converged(t)),
+            'timesteps': len(self.timesteps),
+        }
+
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from .adaptive import AdaptiveScheduler, RunningStats, binomial_width
+
+
+class RunningStatsTest(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        values = np.random.RandomState(0).rand(20, 4)
+        stats = RunningStats(4)
+        for value in values:
+            stats.update(value)
+        np.testing.assert_allclose(stats.mean, values.mean(axis=0))
+        np.testing.assert_allclose(stats.std, values.std(axis=0))
+        np.testing.assert_allclose(stats.variance, values.var(axis=0, ddof=1))
+
+
+class AdaptiveSchedulerTest(unittest.TestCase):
+
+    def run_sweep(self, scheduler, probabilities, seed=0):
+        random_state = np.random.RandomState(seed)
+
+        def run_round(requests):
+            return dict(((t, repeat), random_state.multinomial(scheduler.shots, probabilities[t]))
+                        for t, repeat in requests)
+        scheduler.run(run_round)
+
+    def test_fixed_repeats(self):
+        scheduler = AdaptiveScheduler(range(3), 4, 1024, target_width=0.0, min_repeats=9, max_repeats=9)
+        self.assertEqual(len(scheduler.next_round()), 27)
+        self.assertEqual(scheduler.next_round(), [])
+
+    def test_noisy_points_get_more_repeats(self):
+        # Timestep 0 is deterministic, timestep 1 is a coin flip
+        probabilities = {0: [0, 1, 0, 0], 1: [0, 0.5, 0.5, 0]}
+        scheduler = AdaptiveScheduler(range(2), 4, 1024, target_width=0.04, max_repeats=9)
+        self.run_sweep(scheduler, probabilities)
+        self.assertEqual(scheduler.repeats(0), 2)
+        self.assertGreater(scheduler.repeats(1), 2)
+        self.assertTrue(scheduler.converged(1))
+
+    def test_mid_curve_points_converge_within_budget(self):
+        # Outcome fractions around 0.5 have the widest intervals, the target of the QPU std script
+        probabilities = dict((t, [0.02, 0.49 + 0.01 * t, 0.49 - 0.01 * t, 0]) for t in range(-3, 4))
+        scheduler = AdaptiveScheduler(range(-3, 4), 4, 1024, binomial_width(1024, 3), shot_budget=7 * 5 * 1024)
+        self.run_sweep(scheduler, probabilities)
+        self.assertEqual(scheduler.summary()['converged'], 7)
+        self.assertLessEqual(scheduler.summary()['shots'], 7 * 5 * 1024)
+        # A target below the shot noise of 5 repeats can never be reached by them
+        self.assertGreater(binomial_width(1024, 5), 0.02)
+
+    def test_shot_budget(self):
+        probabilities = dict((t, [0.25] * 4) for t in range(4))
+        scheduler = AdaptiveScheduler(range(4), 4, 1000, target_width=0.0, shot_budget=11000, max_repeats=9)
+        self.run_sweep(scheduler, probabilities)
+        self.assertEqual(scheduler.summary()['shots'], 11000)
+        self.assertEqual(sorted(scheduler.repeats(t) for t in range(4)), [2, 3, 3, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
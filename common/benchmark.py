@@ -0,0 +1,308 @@
+""" Benchmarks of the sweep pipeline, with a baseline to catch regressions
+
+Every benchmark times one step of a sweep at a range of sizes: number of time points, shots, repeats or qubits.
+Benchmarks that need a package that is not installed (pyquil, or either qiskit version) are skipped.
+Results are written as JSON, name -> seconds per call, so a run can be stored as the baseline
+and later runs compared against it:
+
+    python -m common.benchmark --save          # store the baseline
+    python -m common.benchmark                 # compare with it, exits with 1 if anything got slower
+    python -m common.benchmark --quick --filter counting
+
+Timings are the best of a few repeats of a loop that runs for at least MIN_TIME, like timeit.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+
+DEFAULT_BASELINE = os.path.join("results", "benchmark_baseline.json")
+MIN_TIME = 0.2
+REPEATS = 3
+# A benchmark regressed if it takes this many times as long as in the baseline
+THRESHOLD = 1.25
+
+# setup(size) prepares the inputs and returns the function to time
+Benchmark = namedtuple('Benchmark', ['name', 'setup', 'sizes'])
+
+BENCHMARKS = []
+
+
+def benchmark(name, sizes=(None,)):
+    """ Registers setup(size) as a benchmark, run once for every size """
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, tuple(sizes)))
+        return setup
+    return register
+
+
+def case_name(name, size):
+    return name if size is None else "%s[%s]" % (name, size)
+
+
+# Circuit construction
+
+@benchmark('rigetti.create_singlet_state')
+def _rigetti_singlet_state(size):
+    from rigetti.quantum_beats_rigetti_qvm import add_switch_to_singlet_triplet_basis_gate_to_program, \
+        create_singlet_state
+
+    def run():
+        program = create_singlet_state()
+        add_switch_to_singlet_triplet_basis_gate_to_program(program)
+        return program
+    return run
+
+
+@benchmark('ibmq.create_quantum_programs', sizes=(30, 300))
+def _ibmq_programs(size):
+    from ibmq.core import create_quantum_programs_to_simulate_quantum_beats
+    from common.sweep import phase_angles
+    angles = phase_angles(np.linspace(0, 30, size))
+    return lambda: create_quantum_programs_to_simulate_quantum_beats(angles)
+
+
+@benchmark('ibmq.bind_parametric_circuit', sizes=(30, 300))
+def _ibmq_parametric(size):
+    from ibmq.core_qiskit0_8_1 import create_parametric_quantum_circuit_to_simulate_quantum_beats
+    from common.sweep import phase_angles
+    angles = phase_angles(np.linspace(0, 30, size))
+
+    def run():
+        circuit, angle = create_parametric_quantum_circuit_to_simulate_quantum_beats()
+        return [circuit.bind_parameters({angle: value}) for value in angles]
+    return run
+
+
+@benchmark('optimizer.optimize', sizes=('ibmq', 'rigetti'))
+def _optimizer(size):
+    from common.optimizer import optimize, quantum_beats_gates
+    gates = quantum_beats_gates(0.46)
+    return lambda: optimize(gates, size)
+
+
+# Counting
+
+@benchmark('counting.distribution', sizes=(1024, 10 ** 5, 10 ** 6))
+def _distribution(size):
+    from rigetti.counting import distribution
+    data = np.random.RandomState(0).randint(0, 2, (size, 2)).tolist()
+    return lambda: distribution(data)
+
+
+@benchmark('counting.sample_counts', sizes=(30, 300, 3000))
+def _sample_counts(size):
+    from rigetti.counting import sample_counts
+    from common.sweep import ideal_probabilities, phase_angles
+    # Every time point with 9 repeats
+    probabilities = np.repeat(ideal_probabilities(phase_angles(np.linspace(0, 30, size)))[:, np.newaxis], 9, axis=1)
+    random_state = np.random.RandomState(0)
+    return lambda: sample_counts(probabilities, 1024, random_state)
+
+
+@benchmark('uncertainty.bootstrap_std', sizes=(1024, 9 * 1024))
+def _bootstrap(size):
+    from rigetti.uncertainty import bootstrap_std
+    data = np.random.RandomState(0).randint(0, 2, (size, 2))
+    return lambda: bootstrap_std(data, 1024, resamples=200, random_state=0)
+
+
+# Local simulation
+
+@benchmark('statevector.simulate_quantum_beats', sizes=(30, 3000))
+def _statevector(size):
+    from rigetti.quantum_beats_rigetti_qvm import add_switch_to_singlet_triplet_basis_gate_to_program, \
+        create_singlet_state
+    from rigetti.statevector import simulate_quantum_beats
+    program = create_singlet_state()
+    add_switch_to_singlet_triplet_basis_gate_to_program(program)
+    angles = np.linspace(0, 14, size)
+    return lambda: simulate_quantum_beats(program, angles)
+
+
+@benchmark('noise.simulate_noisy_quantum_beats', sizes=(30, 3000))
+def _noise(size):
+    from rigetti.quantum_beats_rigetti_qvm import add_switch_to_singlet_triplet_basis_gate_to_program, \
+        create_singlet_state
+    from rigetti.noise import simulate_noisy_quantum_beats
+    program = create_singlet_state()
+    add_switch_to_singlet_triplet_basis_gate_to_program(program)
+    angles = np.linspace(0, 14, size)
+    return lambda: simulate_noisy_quantum_beats(program, angles)
+
+
+@benchmark('radical_pair.singlet_probability', sizes=(4, 8, 12))
+def _radical_pair(size):
+    from common.radical_pair import RadicalPair
+    # size qubits: two electrons and their nuclei
+    nuclei = size - 2
+    pair = RadicalPair(hyperfine=([0.1] * (nuclei // 2), [0.05] * (nuclei - nuclei // 2)))
+    return lambda: pair.singlet_probability(np.linspace(0, 30, 31), samples=4 if nuclei > 6 else None,
+                                            random_state=0)
+
+
+@benchmark('radical_pair.trotter_circuit', sizes=(4, 8, 12))
+def _trotter(size):
+    from common.radical_pair import RadicalPair, run_gates
+    nuclei = size - 2
+    pair = RadicalPair(hyperfine=([0.1] * (nuclei // 2), [0.05] * (nuclei - nuclei // 2)))
+    gates = pair.trotter_gates(5.0, 20)
+    return lambda: run_gates(gates, pair.n_qubits)
+
+
+@benchmark('ensemble.singlet_probability', sizes=(1024, 16384))
+def _ensemble(size):
+    from common.ensemble import HyperfineEnsemble
+    ensemble = HyperfineEnsemble(hyperfine=((0.1, 0.05), (0.08,)))
+    timesteps = np.linspace(0, 30, 301)
+    return lambda: ensemble.singlet_probability(timesteps, samples=size, random_state=0)
+
+
+# I/O
+
+@benchmark('results.write', sizes=(30, 300, 3000))
+def _write_results(size):
+    from common.results import Column, ResultWriter
+    # Records like the QPU std script: counts of 9 repeats for 4 outcomes
+    columns = [Column('t', 'f8')] + [Column('counts_%s' % i, 'f8', (9,)) for i in range(4)]
+    counts = np.random.RandomState(0).randint(0, 1024, (size, 4, 9)).astype(float)
+
+    def run():
+        directory = tempfile.mkdtemp()
+        try:
+            with ResultWriter(directory, columns) as writer:
+                for t in range(size):
+                    writer.append(t=t, **dict(('counts_%s' % i, counts[t, i]) for i in range(4)))
+        finally:
+            shutil.rmtree(directory)
+    return run
+
+
+@benchmark('checkpoint.record', sizes=(30, 300))
+def _checkpoint(size):
+    from common.checkpoint import Checkpoint
+    shots = np.random.RandomState(0).randint(0, 2, (1024, 2))
+
+    def run():
+        directory = tempfile.mkdtemp()
+        try:
+            with Checkpoint(os.path.join(directory, "journal.jsonl"), resume=False) as checkpoint:
+                for t in range(size):
+                    checkpoint.record((t, 'qpu', 0), shots)
+        finally:
+            shutil.rmtree(directory)
+    return run
+
+
+# Running and comparing
+
+def time_function(function, min_time=MIN_TIME, repeats=REPEATS):
+    """ Best time of one call in seconds, over repeats loops of at least min_time each """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    times = [elapsed] + timer.repeat(repeats - 1, number)
+    return min(times) / number
+
+
+def run_benchmarks(pattern=None, quick=False, min_time=MIN_TIME, repeats=REPEATS, stream=sys.stderr):
+    """ Results of all benchmarks whose name matches the regular expression pattern, name -> seconds
+
+    With quick=True every benchmark only runs at its smallest size. Skipped benchmarks are not in the results.
+    """
+    results = OrderedDict()
+    for name, setup, sizes in BENCHMARKS:
+        if pattern and not re.search(pattern, name):
+            continue
+        for size in sizes[:1] if quick else sizes:
+            label = case_name(name, size)
+            try:
+                function = setup(size)
+            except (ImportError, AttributeError) as e:
+                print("%s skipped: %s" % (label, e), file=stream)
+                break
+            results[label] = time_function(function, min_time, repeats)
+            print("%s: %.3g s" % (label, results[label]), file=stream)
+    return results
+
+
+def environment():
+    """ Versions the timings depend on """
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as fp:
+        json.dump({'environment': environment(), 'results': results}, fp, indent=2)
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    with open(path) as fp:
+        return json.load(fp)['results']
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """ (name, baseline seconds, seconds, ratio, status) of every benchmark in both, status 'slower', 'faster' or 'same' """
+    comparison = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name]
+        if ratio > threshold:
+            status = 'slower'
+        elif ratio < 1 / threshold:
+            status = 'faster'
+        else:
+            status = 'same'
+        comparison.append((name, baseline[name], seconds, ratio, status))
+    return comparison
+
+
+def main(baseline=DEFAULT_BASELINE, save=False, pattern=None, quick=False, threshold=THRESHOLD):
+    """ Runs the benchmarks, then stores them as the baseline or compares them with it
+
+    Returns the number of benchmarks that got slower than threshold times the baseline.
+    """
+    results = run_benchmarks(pattern, quick)
+    if save or not os.path.exists(baseline):
+        save_baseline(results, baseline)
+        print("Baseline stored in %s" % baseline)
+        return 0
+    print("Benchmark, Baseline (s), Now (s), Ratio, Status")
+    comparison = compare(results, load_baseline(baseline), threshold)
+    for name, old, new, ratio, status in comparison:
+        print("%s, %.3g, %.3g, %.2f, %s" % (name, old, new, ratio, status))
+    return sum(1 for entry in comparison if entry[-1] == 'slower')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks of the quantum beats sweep pipeline")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="JSON file of the baseline")
+    parser.add_argument('--save', action='store_true', help="store the results as the baseline")
+    parser.add_argument('--filter', dest='pattern', help="only benchmarks matching this regular expression")
+    parser.add_argument('--quick', action='store_true', help="only the smallest size of every benchmark")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+    sys.exit(1 if main(args.baseline, args.save, args.pattern, args.quick, args.threshold) else 0)
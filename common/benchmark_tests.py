@@ -0,0 +1,38 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from .benchmark import compare, load_baseline, run_benchmarks, save_baseline, time_function
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_time_function(self):
+        seconds = time_function(lambda: sum(range(1000)), min_time=0.01)
+        self.assertGreater(seconds, 0)
+        self.assertLess(seconds, 0.01)
+
+    def test_run_and_store_baseline(self):
+        stream = io.StringIO()
+        results = run_benchmarks('^counting', quick=True, min_time=0.01, stream=stream)
+        self.assertEqual(list(results), ['counting.distribution[1024]', 'counting.sample_counts[30]'])
+        path = os.path.join(self.directory, 'baseline.json')
+        save_baseline(results, path)
+        self.assertEqual(load_baseline(path), results)
+
+    def test_compare(self):
+        baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+        comparison = compare({'a': 2.0, 'b': 0.5, 'c': 1.1, 'new': 1.0}, baseline)
+        self.assertEqual([(name, status) for name, _, _, _, status in comparison],
+                         [('a', 'slower'), ('b', 'faster'), ('c', 'same')])
+
+
+if __name__ == '__main__':
+    unittest.main()
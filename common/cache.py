@@ -0,0 +1,209 @@
+""" Content addressed on-disk cache of circuit execution results
+
+Results are stored as .npz files named after a hash of everything that determines them:
+program text, backend, shots and seed or noise model, and for devices their calibration (device_fingerprint),
+so results of a device are not reused once it is recalibrated. The least recently used files are evicted
+when the cache grows over its size limit. Used by both the pyquil and the qiskit scripts.
+
+Shots of QVMs, simulators and devices are random draws, so reusing them freezes one draw: the scripts only
+cache them when asked to (use_cache=True).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+from common import tracing
+
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "quantum_beats")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def program_text(program):
+    """ Canonical text of a pyquil program, a qiskit circuit or a string """
+    if hasattr(program, 'qasm'):
+        text = program.qasm()
+    elif hasattr(program, 'out'):
+        text = program.out()
+    else:
+        text = "%s" % program
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+# Attributes of pyquil devices and qiskit backends that change when they are calibrated
+CALIBRATION_ATTRIBUTES = ('specs', 'isa', 'noise_model', 'calibration', 'parameters')
+
+
+def device_fingerprint(device):
+    """ Text that changes whenever device is recalibrated
+
+    device is a pyquil Device or qiskit backend, whose specs, ISA, noise model, calibration and parameters are
+    used, or anything else that identifies a calibration, e.g. a calibration date.
+    """
+    description = {}
+    for name in CALIBRATION_ATTRIBUTES:
+        value = getattr(device, name, None)
+        if callable(value):
+            value = value()
+        if hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        if value is not None:
+            description[name] = value
+    if not description:
+        description = device
+    return json.dumps(description, sort_keys=True, default=str)
+
+
+def cache_key(program, backend, shots=None, seed=None, noise_model=None, device=None):
+    """ Hash of everything that determines the result of running a program
+
+    For hardware backends use seed to tell repeated runs of the same program apart,
+    and pass the device (or its calibration) so results are not reused after it was recalibrated.
+    """
+    if noise_model is not None and hasattr(noise_model, 'key'):
+        noise_model = noise_model.key()
+    description = {
+        'program': program_text(program),
+        'backend': "%s" % backend,
+        'shots': shots,
+        'seed': seed,
+        'noise_model': noise_model,
+        'device': device_fingerprint(device) if device is not None else None,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """ Directory of results keyed by cache_key, evicted least recently used first """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Running total of the entry sizes, so not every put has to scan the directory
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.npz')
+
+    def get(self, key):
+        """ Stored arrays as a dict, or None if the key is not in the cache """
+        path = self.path(key)
+        try:
+            with np.load(path) as stored:
+                arrays = dict((name, stored[name]) for name in stored.files)
+            # The modification time orders the entries for eviction
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return arrays
+
+    def put(self, key, **arrays):
+        """ Stores arrays under key and evicts old entries when the cache is over its size limit """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            np.savez(fp, **arrays)
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            if os.path.exists(path):
+                # Replacing an entry frees its old size
+                self._size -= os.path.getsize(path)
+            self._size += os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def cached(self, key, compute):
+        """ Stored arrays of key, computed by compute() and stored if they are not in the cache yet """
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = compute()
+            self.put(key, **arrays)
+        return arrays
+
+    def entries(self):
+        """ (modification time, size, path) of every entry """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.npz'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits in max_bytes """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+        self._size = 0
+
+
+def _traced_cached(cache, key, compute):
+    """ cache.cached, counting hits and misses when tracing is on """
+    if not tracing.enabled():
+        return cache.cached(key, compute)
+    misses = []
+
+    def counted():
+        misses.append(1)
+        return compute()
+    arrays = cache.cached(key, counted)
+    tracing.count('cache', hits=0 if misses else 1, misses=len(misses))
+    return arrays
+
+
+def cached_shots(cache, run, program, backend, shots, seed=None, noise_model=None, device=None):
+    """ Measured bits of every shot, as returned by pyquil's run(), from the cache or by calling run() """
+    def counted_run():
+        data = run()
+        if tracing.enabled():
+            tracing.count(backend, runs=1, shots=shots, bytes=np.asarray(data, dtype=np.uint8).nbytes)
+        return data
+
+    if cache is None:
+        return counted_run()
+    key = cache_key(program, backend, shots, seed, noise_model, device)
+    return _traced_cached(cache, key, lambda: {'bits': np.asarray(counted_run(), dtype=np.uint8)})['bits']
+
+
+def cached_counts(cache, run, program, backend, shots, seed=None, noise_model=None, device=None):
+    """ Counts dict, as returned by qiskit's get_counts(), from the cache or by calling run() """
+    if cache is None:
+        return run()
+    key = cache_key(program, backend, shots, seed, noise_model, device)
+
+    def compute():
+        counts = run()
+        labels = sorted(counts)
+        return {'labels': np.array(labels, dtype=str), 'counts': np.array([counts[label] for label in labels])}
+
+    arrays = _traced_cached(cache, key, compute)
+    return dict(zip(arrays['labels'].tolist(), arrays['counts'].tolist()))
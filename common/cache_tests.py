@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from .cache import ResultCache, cache_key, cached_shots, cached_counts
+
+
+class Device(object):
+
+    def __init__(self, specs):
+        self.specs = specs
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        program = "X 0\nMEASURE 0 [0]"
+        self.assertEqual(cache_key(program, "QVM", 1024), cache_key(program + "\n", "QVM", 1024))
+        self.assertNotEqual(cache_key(program, "QVM", 1024), cache_key(program, "QVM", 1000))
+        self.assertNotEqual(cache_key(program, "8Q-Agave", 1024, seed=0), cache_key(program, "8Q-Agave", 1024, seed=1))
+
+    def test_key_changes_with_calibration(self):
+        program = "X 0\nMEASURE 0 [0]"
+        calibrated = cache_key(program, "8Q-Agave", 1024, device=Device({'f1QRB': {'0': 0.97}}))
+        self.assertEqual(calibrated, cache_key(program, "8Q-Agave", 1024, device=Device({'f1QRB': {'0': 0.97}})))
+        self.assertNotEqual(calibrated, cache_key(program, "8Q-Agave", 1024, device=Device({'f1QRB': {'0': 0.98}})))
+        self.assertNotEqual(calibrated, cache_key(program, "8Q-Agave", 1024))
+        self.assertNotEqual(cache_key(program, "ibmqx4", 1024, device="2018-09-01"),
+                            cache_key(program, "ibmqx4", 1024, device="2018-09-02"))
+
+    def test_cached_shots(self):
+        cache = ResultCache(self.directory)
+        calls = []
+
+        def run():
+            calls.append(1)
+            return [[1, 0], [0, 1]]
+
+        first = cached_shots(cache, run, "X 0", "QVM", 2)
+        second = cached_shots(cache, run, "X 0", "QVM", 2)
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_array_equal(first, second)
+        np.testing.assert_array_equal(second, [[1, 0], [0, 1]])
+
+    def test_cached_counts(self):
+        cache = ResultCache(self.directory)
+        counts = cached_counts(cache, lambda: {'01': 510, '10': 514}, "qasm", "ibmqx4", 1024)
+        self.assertEqual(cached_counts(cache, lambda: {}, "qasm", "ibmqx4", 1024), counts)
+
+    def test_size_of_replaced_entry(self):
+        cache = ResultCache(self.directory)
+        key = cache_key("X 0", "QVM")
+        cache.put(key, bits=np.zeros(10))
+        cache.put(key, bits=np.zeros(100))
+        self.assertEqual(cache._size, cache.size())
+
+    def test_least_recently_used_eviction(self):
+        cache = ResultCache(self.directory, max_bytes=1000)
+        keys = [cache_key("X 0", "QVM", seed=i) for i in range(5)]
+        for key in keys:
+            cache.put(key, bits=np.zeros(10))
+            # Keep the first entry in use
+            time.sleep(0.01)
+            cache.get(keys[0])
+        self.assertLessEqual(cache.size(), 1000)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[-1]))
+        self.assertIsNone(cache.get(keys[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+""" Checkpointing of long sweeps
+
+Every finished job of a sweep is appended to a journal file, one JSON line per job with its
+(t, backend, repeat) key and result, and the file is synced to disk before the job counts as done.
+When a crashed or timed out sweep is started again, the jobs found in the journal are not run again,
+so a QPU reservation is spent on the jobs that did not run yet.
+The first line of the journal holds a hash of the parameters of the sweep (shots, time grid, target width, ...),
+and a journal of a sweep with other parameters is not resumed.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class ParametersMismatch(ValueError):
+    """ The journal to resume belongs to a sweep with other parameters """
+
+
+def _json_value(value):
+    # numpy arrays and scalars, e.g. the time grid
+    return value.tolist() if hasattr(value, 'tolist') else "%s" % value
+
+
+def parameters_hash(parameters):
+    """ Hash of a JSON serializable description of a sweep, numpy arrays included """
+    text = json.dumps(parameters, sort_keys=True, default=_json_value)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Checkpoint(object):
+    """ Journal of finished sweep jobs, keyed by (t, backend, repeat)
+
+    With resume=False an existing journal is discarded and the sweep starts from scratch.
+    parameters describes the sweep; resuming a journal that was written with other parameters
+    raises ParametersMismatch, as its results would be mixed into a different sweep.
+    Results are stored as JSON, arrays (e.g. measured bits) are read back as numpy arrays.
+    """
+
+    def __init__(self, path, resume=True, parameters=None):
+        self.path = path
+        self.parameters = parameters_hash(parameters) if parameters is not None else None
+        self.results = OrderedDict()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = None
+        if resume and os.path.exists(path):
+            header = self._load()
+            if (header is not None or self.results) and header != {'parameters': self.parameters}:
+                raise ParametersMismatch("Journal %s belongs to a sweep with other parameters, "
+                                         "start from scratch with resume=False" % path)
+        mode = 'a' if resume else 'w'
+        self._fp = open(path, mode)
+        if header is None:
+            self._write({'parameters': self.parameters})
+
+    def _load(self):
+        """ Reads the finished jobs of the journal and returns its header, None if it has none
+
+        A last line without its newline was cut off when the sweep died while writing it. It is truncated,
+        so the next record starts on a line of its own instead of being glued onto it.
+        """
+        header = None
+        complete = 0
+        with open(self.path, 'rb') as fp:
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    break
+                complete += len(line)
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                if 'parameters' in entry:
+                    header = entry
+                    continue
+                self.results[tuple(entry['key'])] = np.asarray(entry['result'])
+        if os.path.getsize(self.path) > complete:
+            with open(self.path, 'r+b') as fp:
+                fp.truncate(complete)
+        return header
+
+    def _write(self, entry):
+        self._fp.write(json.dumps(entry) + "\n")
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+
+    def __contains__(self, key):
+        return tuple(key) in self.results
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, key):
+        return self.results.get(tuple(key))
+
+    def record(self, key, result):
+        """ Appends a finished job to the journal and waits until it is on disk """
+        key = tuple(key)
+        # numpy scalars (e.g. timesteps from np.arange) are not JSON serializable
+        entry = {'key': [getattr(part, 'item', lambda: part)() for part in key], 'result': np.asarray(result).tolist()}
+        with self._lock:
+            self._write(entry)
+            self.results[key] = np.asarray(result)
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _recorded(checkpoint, key, function):
+    def run():
+        result = function()
+        checkpoint.record(key, result)
+        return result
+    return run
+
+
+def resume_sweep(jobs, checkpoint, run_sweep, **kwargs):
+    """ Runs the jobs that are not in checkpoint with run_sweep and records each one as soon as it finishes
+
+    Returns the results of all jobs, the ones from the journal included, like run_sweep:
+    an OrderedDict {(t, backend, repeat): result} sorted by timestep.
+    """
+    jobs = list(jobs)
+    pending = [job._replace(function=_recorded(checkpoint, (job.t, job.backend, job.repeat), job.function))
+               for job in jobs if (job.t, job.backend, job.repeat) not in checkpoint]
+    results = run_sweep(pending, **kwargs) if pending else {}
+    ordered = sorted(enumerate(jobs), key=lambda item: (item[1].t, item[0]))
+    merged = OrderedDict()
+    for _, job in ordered:
+        key = (job.t, job.backend, job.repeat)
+        merged[key] = results[key] if key in results else checkpoint.get(key)
+    return merged
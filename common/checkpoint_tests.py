@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple, OrderedDict
+from functools import partial
+import numpy as np
+from .checkpoint import Checkpoint, ParametersMismatch, resume_sweep
+
+
+Job = namedtuple('Job', ['t', 'backend', 'repeat', 'function'])
+
+
+def run_in_order(jobs):
+    return OrderedDict(((job.t, job.backend, job.repeat), job.function()) for job in jobs)
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "journal.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def jobs(self, calls):
+        def shots(t, repeat):
+            calls.append((t, repeat))
+            return np.array([[t, repeat]] * 4, dtype=np.uint8)
+        return [Job(t, 'qpu', i, partial(shots, t, i)) for t in range(3) for i in range(2)]
+
+    def test_resume_skips_finished_jobs(self):
+        calls = []
+        jobs = self.jobs(calls)
+        with Checkpoint(self.path) as checkpoint:
+            resume_sweep(jobs[:4], checkpoint, run_in_order)
+        # The sweep died while writing the next entry
+        with open(self.path, 'a') as fp:
+            fp.write('{"key": [2, "qpu", 0], "res')
+
+        calls[:] = []
+        with Checkpoint(self.path) as checkpoint:
+            self.assertEqual(len(checkpoint), 4)
+            results = resume_sweep(jobs, checkpoint, run_in_order)
+        self.assertEqual(calls, [(2, 0), (2, 1)])
+        self.assertEqual(list(results), [(t, 'qpu', i) for t in range(3) for i in range(2)])
+        np.testing.assert_array_equal(results[1, 'qpu', 1], [[1, 1]] * 4)
+        np.testing.assert_array_equal(results[2, 'qpu', 0], [[2, 0]] * 4)
+
+    def test_records_after_a_crash_survive(self):
+        calls = []
+        jobs = self.jobs(calls)
+        with Checkpoint(self.path) as checkpoint:
+            resume_sweep(jobs[:1], checkpoint, run_in_order)
+        with open(self.path, 'a') as fp:
+            fp.write('{"key": [0, "qpu", 1], "res')
+        with Checkpoint(self.path) as checkpoint:
+            self.assertEqual(len(checkpoint), 1)
+            resume_sweep(jobs[:3], checkpoint, run_in_order)
+        with Checkpoint(self.path) as checkpoint:
+            self.assertEqual(list(checkpoint.results), [(0, 'qpu', 0), (0, 'qpu', 1), (1, 'qpu', 0)])
+        calls[:] = []
+        with Checkpoint(self.path) as checkpoint:
+            resume_sweep(jobs[:3], checkpoint, run_in_order)
+        self.assertEqual(calls, [])
+
+    def test_no_resume(self):
+        calls = []
+        with Checkpoint(self.path) as checkpoint:
+            resume_sweep(self.jobs(calls), checkpoint, run_in_order)
+        with Checkpoint(self.path, resume=False) as checkpoint:
+            self.assertEqual(len(checkpoint), 0)
+            resume_sweep(self.jobs(calls), checkpoint, run_in_order)
+        self.assertEqual(len(calls), 12)
+
+    def test_resume_needs_same_parameters(self):
+        calls = []
+        parameters = {'shots': 1024, 'timesteps': np.arange(0.0, 3.0), 'target_width': 0.035}
+        with Checkpoint(self.path, parameters=parameters) as checkpoint:
+            resume_sweep(self.jobs(calls)[:2], checkpoint, run_in_order)
+        with Checkpoint(self.path, parameters=dict(parameters)) as checkpoint:
+            self.assertEqual(len(checkpoint), 2)
+        for changed in [dict(parameters, shots=2048), dict(parameters, timesteps=np.arange(0.0, 3.0, 0.5)), None]:
+            self.assertRaises(ParametersMismatch, Checkpoint, self.path, parameters=changed)
+        with Checkpoint(self.path, resume=False, parameters=dict(parameters, shots=2048)) as checkpoint:
+            self.assertEqual(len(checkpoint), 0)
+        with Checkpoint(self.path, parameters=dict(parameters, shots=2048)) as checkpoint:
+            self.assertEqual(len(checkpoint), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
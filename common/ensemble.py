@@ -0,0 +1,87 @@
+""" Quantum beats averaged over distributions of hyperfine fields
+
+In the semiclassical picture every electron of the pair precesses about the sum of the external field and
+a static random field of its nuclei. For a nucleus with hyperfine constant a and spin 1/2 every component of
+that field is Gaussian with variance a^2 / 4, so the field of many nuclei has a variance of sum(a^2) / 4.
+
+Both electrons rotate about fixed axes, U_i = cos(|w_i| t / 2) - i sin(|w_i| t / 2) n_i . sigma, and the singlet
+probability of a configuration has the closed form
+
+    P_S(t) = (c_1 c_2 + s_1 s_2 n_1 . n_2)^2
+
+so an ensemble of thousands of field configurations is one array expression over (samples, timesteps).
+Samples are processed in chunks and only their running sums are kept, which bounds the memory of large ensembles.
+The measured decay of the beats is the average of these curves.
+"""
+import math
+import numpy as np
+
+from common.sweep import W_LARMOR
+
+
+DEFAULT_SAMPLES = 4096
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def hyperfine_width(hyperfine):
+    """ Standard deviation of every component of the field of nuclei with hyperfine constants (rad/ns) """
+    return math.sqrt(sum(float(a) ** 2 for a in hyperfine) / 4)
+
+
+def configuration_singlet_probabilities(timesteps, fields_1, fields_2):
+    """ Singlet probability of every field configuration at every timestep, (samples, T)
+
+    fields_1 and fields_2 are the (samples, 3) precession vectors of the electrons in rad/ns.
+    """
+    t = np.asarray(timesteps, dtype=float)
+    fields_1 = np.asarray(fields_1, dtype=float)
+    fields_2 = np.asarray(fields_2, dtype=float)
+    norm_1 = np.linalg.norm(fields_1, axis=-1)
+    norm_2 = np.linalg.norm(fields_2, axis=-1)
+    # The axis of a zero field does not matter, as its sine vanishes
+    axes_1 = fields_1 / np.where(norm_1 > 0, norm_1, 1)[:, np.newaxis]
+    axes_2 = fields_2 / np.where(norm_2 > 0, norm_2, 1)[:, np.newaxis]
+    cos_axes = np.einsum('si,si->s', axes_1, axes_2)[:, np.newaxis]
+    half_1 = norm_1[:, np.newaxis] * t / 2
+    half_2 = norm_2[:, np.newaxis] * t / 2
+    return (np.cos(half_1) * np.cos(half_2) + np.sin(half_1) * np.sin(half_2) * cos_axes) ** 2
+
+
+class HyperfineEnsemble(object):
+    """ Radical pairs in an external field with random hyperfine fields
+
+    electron_frequencies are the Larmor frequencies of the electrons along z, as for common.radical_pair.RadicalPair.
+    hyperfine holds the hyperfine constants of the nuclei of electron 1 and of electron 2; widths overrides
+    the resulting field widths directly.
+    """
+
+    def __init__(self, electron_frequencies=(W_LARMOR, 0.0), hyperfine=((), ()), widths=None):
+        self.electron_frequencies = tuple(float(w) for w in electron_frequencies)
+        if widths is None:
+            widths = (hyperfine_width(hyperfine[0]), hyperfine_width(hyperfine[1]))
+        self.widths = tuple(float(width) for width in widths)
+
+    def sample_fields(self, samples, random_state=None):
+        """ Precession vectors of both electrons for samples configurations, (2, samples, 3) """
+        if not isinstance(random_state, np.random.RandomState):
+            random_state = np.random.RandomState(random_state)
+        fields = random_state.normal(size=(2, samples, 3)) * np.array(self.widths)[:, np.newaxis, np.newaxis]
+        fields[..., 2] += np.array(self.electron_frequencies)[:, np.newaxis]
+        return fields
+
+    def singlet_probability(self, timesteps, samples=DEFAULT_SAMPLES, random_state=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE):
+        """ (mean, standard error) of the singlet probability at every timestep, over samples configurations """
+        if not isinstance(random_state, np.random.RandomState):
+            random_state = np.random.RandomState(random_state)
+        timesteps = np.asarray(timesteps, dtype=float)
+        total = np.zeros(len(timesteps))
+        total_squares = np.zeros(len(timesteps))
+        for start in range(0, samples, chunk_size):
+            fields_1, fields_2 = self.sample_fields(min(chunk_size, samples - start), random_state)
+            probabilities = configuration_singlet_probabilities(timesteps, fields_1, fields_2)
+            total += probabilities.sum(axis=0)
+            total_squares += (probabilities ** 2).sum(axis=0)
+        mean = total / samples
+        variance = np.maximum(total_squares / samples - mean ** 2, 0) * samples / max(samples - 1, 1)
+        return mean, np.sqrt(variance / samples)
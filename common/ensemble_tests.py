@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from .ensemble import HyperfineEnsemble, configuration_singlet_probabilities, hyperfine_width
+from .radical_pair import gate_matrix
+from .sweep import SINGLET, ideal_probabilities, phase_angles
+
+
+def rotation(field, t):
+    """ exp(-i t field . sigma / 2) """
+    generator = sum(w * gate_matrix(name, None) for w, name in zip(field, ['X', 'Y', 'Z']))
+    values, vectors = np.linalg.eigh(generator)
+    return vectors.dot(np.diag(np.exp(-0.5j * t * values))).dot(vectors.conj().T)
+
+
+class EnsembleTest(unittest.TestCase):
+
+    def test_hyperfine_width(self):
+        self.assertAlmostEqual(hyperfine_width([0.3, 0.4]), 0.25)
+
+    def test_closed_form_matches_rotated_singlet(self):
+        random_state = np.random.RandomState(1)
+        fields = random_state.normal(size=(2, 3, 3))
+        timesteps = [0.0, 0.7, 2.5]
+        singlet = np.array([0, 1, -1, 0]) / np.sqrt(2)
+        expected = [[abs(singlet.conj().dot(np.kron(rotation(f2, t), rotation(f1, t))).dot(singlet)) ** 2
+                     for t in timesteps] for f1, f2 in zip(*fields)]
+        np.testing.assert_allclose(configuration_singlet_probabilities(timesteps, *fields), expected, atol=1e-12)
+
+    def test_without_hyperfine_fields(self):
+        timesteps = np.arange(0.0, 30.0)
+        mean, stderr = HyperfineEnsemble().singlet_probability(timesteps, samples=10)
+        np.testing.assert_allclose(mean, ideal_probabilities(phase_angles(timesteps))[:, SINGLET], atol=1e-12)
+        np.testing.assert_allclose(stderr, 0, atol=1e-7)
+
+    def test_gaussian_field_on_one_electron(self):
+        # Without external field <cos(|w| t)> = (1 - s^2 t^2) exp(-s^2 t^2 / 2) for a Gaussian field of width s
+        timesteps = np.linspace(0, 10, 21)
+        ensemble = HyperfineEnsemble((0.0, 0.0), widths=(0.5, 0.0))
+        mean, stderr = ensemble.singlet_probability(timesteps, samples=20000, random_state=0, chunk_size=3000)
+        x = (0.5 * timesteps) ** 2
+        expected = 0.5 + 0.5 * (1 - x) * np.exp(-x / 2)
+        self.assertTrue(np.all(np.abs(mean - expected) <= 5 * stderr + 1e-12))
+        self.assertLess(stderr.max(), 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
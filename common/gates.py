@@ -0,0 +1,103 @@
+""" Gate matrices and a batched gate application for NumPy statevectors
+
+Follows the Rigetti conventions: qubit 0 is the least significant bit of a basis state index, and the first qubit
+a gate is applied to is the most significant bit of the gate matrix.
+http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+Used by the simulators of rigetti/ and the backend neutral models of common/, so it needs neither pyquil nor qiskit.
+"""
+import math
+import numpy as np
+
+
+GATE_MATRICES = {
+    'I': np.eye(2),
+    'X': np.array([[0, 1], [1, 0]]),
+    'Y': np.array([[0, -1j], [1j, 0]]),
+    'Z': np.array([[1, 0], [0, -1]]),
+    'H': np.array([[1, 1], [1, -1]]) / math.sqrt(2),
+    'S': np.array([[1, 0], [0, 1j]]),
+    'T': np.array([[1, 0], [0, np.exp(1j * math.pi / 4)]]),
+    'CNOT': np.array([
+        [1, 0, 0, 0],
+        [0, 1, 0, 0],
+        [0, 0, 0, 1],
+        [0, 0, 1, 0],
+    ]),
+    'CZ': np.diag([1, 1, 1, -1]),
+    'SWAP': np.array([
+        [1, 0, 0, 0],
+        [0, 0, 1, 0],
+        [0, 1, 0, 0],
+        [0, 0, 0, 1],
+    ]),
+}
+
+
+def phase_matrix(angle):
+    """ PHASE gate, batched over the shape of angle """
+    angle = np.asarray(angle, dtype=float)
+    matrix = np.zeros(angle.shape + (2, 2), dtype=complex)
+    matrix[..., 0, 0] = 1
+    matrix[..., 1, 1] = np.exp(1j * angle)
+    return matrix
+
+
+def rz_matrix(angle):
+    """ RZ gate, batched over the shape of angle """
+    angle = np.asarray(angle, dtype=float)
+    matrix = np.zeros(angle.shape + (2, 2), dtype=complex)
+    matrix[..., 0, 0] = np.exp(-0.5j * angle)
+    matrix[..., 1, 1] = np.exp(0.5j * angle)
+    return matrix
+
+
+def rx_matrix(angle):
+    """ RX gate, batched over the shape of angle """
+    angle = np.asarray(angle, dtype=float)
+    matrix = np.zeros(angle.shape + (2, 2), dtype=complex)
+    matrix[..., 0, 0] = matrix[..., 1, 1] = np.cos(angle / 2)
+    matrix[..., 0, 1] = matrix[..., 1, 0] = -1j * np.sin(angle / 2)
+    return matrix
+
+
+def ry_matrix(angle):
+    """ RY gate, batched over the shape of angle """
+    angle = np.asarray(angle, dtype=float)
+    matrix = np.zeros(angle.shape + (2, 2), dtype=complex)
+    matrix[..., 0, 0] = matrix[..., 1, 1] = np.cos(angle / 2)
+    matrix[..., 0, 1] = -np.sin(angle / 2)
+    matrix[..., 1, 0] = np.sin(angle / 2)
+    return matrix
+
+
+PARAMETRIC_GATES = {
+    'PHASE': phase_matrix,
+    'RZ': rz_matrix,
+    'RX': rx_matrix,
+    'RY': ry_matrix,
+}
+
+
+def apply_gate(states, matrix, qubits):
+    """ Applies a gate to a batch of statevectors
+
+    states has shape (T, 2**n). matrix is either a single (2**k, 2**k) gate
+    or a (T, 2**k, 2**k) stack with one gate per statevector.
+    """
+    batch, dim = states.shape
+    n_qubits = int(round(math.log(dim, 2)))
+    k = len(qubits)
+    # Axis 1 holds the most significant qubit
+    axes = [n_qubits - qubit for qubit in qubits]
+    targets = list(range(n_qubits + 1 - k, n_qubits + 1))
+
+    tensor = np.moveaxis(states.reshape((batch,) + (2,) * n_qubits), axes, targets)
+    moved_shape = tensor.shape
+    tensor = tensor.reshape(batch, -1, 2 ** k)
+    matrix = np.asarray(matrix)
+    if matrix.ndim == 2:
+        tensor = np.einsum('brj,kj->brk', tensor, matrix)
+    else:
+        tensor = np.einsum('brj,bkj->brk', tensor, matrix)
+    tensor = np.moveaxis(tensor.reshape(moved_shape), targets, axes)
+    return tensor.reshape(batch, dim)
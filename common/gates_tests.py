@@ -0,0 +1,23 @@
+import unittest
+import numpy as np
+from .gates import GATE_MATRICES, apply_gate, phase_matrix
+
+
+class ApplyGateTest(unittest.TestCase):
+
+    def test_qubit_order(self):
+        # |01>: qubit 0 set. CNOT with control 0 and target 1 gives |11>
+        states = np.zeros((1, 4), dtype=complex)
+        states[0, 1] = 1
+        np.testing.assert_array_equal(apply_gate(states, GATE_MATRICES['CNOT'], [0, 1]), [[0, 0, 0, 1]])
+        np.testing.assert_array_equal(apply_gate(states, GATE_MATRICES['CNOT'], [1, 0]), [[0, 1, 0, 0]])
+
+    def test_one_gate_per_statevector(self):
+        angles = np.array([0.0, 0.5, 1.0])
+        states = np.tile(np.array([0, 1, 0, 0], dtype=complex), (3, 1))
+        phased = apply_gate(states, phase_matrix(angles), [0])
+        np.testing.assert_allclose(phased[:, 1], np.exp(1j * angles))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,430 @@
+""" Local optimizer for gate lists
+
+Works on the backend neutral gate lists of common.radical_pair, (name, angle, qubits) with qubit 0 as the least
+significant bit and the first qubit of a two qubit gate as its most significant bit (the control of CNOT).
+Fused single qubit gates are 'U3' with angle (theta, phi, lambda), in the u3 convention of IBM Q.
+
+The passes are
+  - resynthesis: every block of gates on the same two qubits that uses more CNOTs than its unitary needs
+    (0 to 3, from the invariants of Shende, Markov and Bullock, quant-ph/0308045) is replaced by a circuit
+    with the minimal number of CNOTs, whose single qubit gates are fitted numerically,
+  - fusion: adjacent single qubit gates on a qubit, e.g. the u1 time step and its neighbours, become one U3,
+  - cancellation: pairs of equal CNOTs cancel, also across single qubit gates that commute with them,
+  - translation to the native gates of a backend, 'ibmq' (u1, u2, u3, cx) or 'rigetti' (RZ, RX(k pi / 2), CZ).
+
+optimize returns the native gate list, circuit_stats the depth and gate counts before and after.
+"""
+import math
+import warnings
+from collections import namedtuple, Counter
+import numpy as np
+from scipy.optimize import minimize
+
+from common import tracing
+from common.gates import apply_gate
+from common.radical_pair import gate_matrix
+
+
+# Gates are equal if their matrices differ by less than this, up to a global phase
+TOLERANCE = 1e-9
+SYNTHESIS_ATTEMPTS = 20
+# Synthesized blocks of the last unitaries, so a sweep fits every distinct block only once
+SYNTHESIS_CACHE_SIZE = 256
+
+NATIVE_GATES = {
+    'ibmq': ('u1', 'u2', 'u3', 'cx'),
+    'rigetti': ('RZ', 'RX', 'CZ'),
+}
+
+CircuitStats = namedtuple('CircuitStats', ['depth', 'gates', 'two_qubit_gates', 'counts'])
+
+SIGMA_YY = np.kron(gate_matrix('Y', None), gate_matrix('Y', None))
+
+
+# Single qubit gates
+
+def u3_matrix(theta, phi, lam):
+    return np.array([
+        [math.cos(theta / 2), -np.exp(1j * lam) * math.sin(theta / 2)],
+        [np.exp(1j * phi) * math.sin(theta / 2), np.exp(1j * (phi + lam)) * math.cos(theta / 2)],
+    ])
+
+
+def u3_angles(matrix):
+    """ (theta, phi, lambda) of a single qubit unitary, ignoring its global phase """
+    matrix = np.asarray(matrix, dtype=complex)
+    matrix = matrix / np.sqrt(np.linalg.det(matrix))
+    theta = 2 * math.atan2(abs(matrix[1, 0]), abs(matrix[0, 0]))
+    # For SU(2): arg(m11) = (phi + lambda) / 2, arg(m10) = (phi - lambda) / 2
+    total = 2 * np.angle(matrix[1, 1]) if abs(matrix[1, 1]) > TOLERANCE else 0.0
+    difference = 2 * np.angle(matrix[1, 0]) if abs(matrix[1, 0]) > TOLERANCE else 0.0
+    if abs(matrix[1, 1]) <= TOLERANCE:
+        total = -difference
+    return theta, (total + difference) / 2, (total - difference) / 2
+
+
+def is_identity(matrix):
+    """ Whether matrix is the identity up to a global phase """
+    return abs(abs(np.trace(matrix)) - len(matrix)) < TOLERANCE
+
+
+def _wrap(angle):
+    """ Angle in (-pi, pi] """
+    angle = math.fmod(angle, 2 * math.pi)
+    if angle > math.pi:
+        angle -= 2 * math.pi
+    elif angle <= -math.pi:
+        angle += 2 * math.pi
+    return angle
+
+
+def matrix_of(gate):
+    name, angle, _ = gate
+    if name == 'U3':
+        return u3_matrix(*angle)
+    if name == 'CNOT':
+        return gate_matrix('CNOT', None)
+    return gate_matrix(name, angle)
+
+
+def circuit_unitary(gates, n_qubits):
+    """ Unitary of a gate list, column k is the state the gates make of basis state k """
+    states = np.eye(2 ** n_qubits, dtype=complex)
+    for gate in gates:
+        states = apply_gate(states, matrix_of(gate), gate[2])
+    return states.T
+
+
+# Statistics
+
+def circuit_stats(gates):
+    """ Depth, number of gates, number of two qubit gates and gate counts by name """
+    levels = {}
+    for _, _, qubits in gates:
+        level = max(levels.get(qubit, 0) for qubit in qubits) + 1
+        for qubit in qubits:
+            levels[qubit] = level
+    counts = Counter(name for name, _, _ in gates)
+    two_qubit = sum(1 for _, _, qubits in gates if len(qubits) == 2)
+    return CircuitStats(max(levels.values()) if levels else 0, len(gates), two_qubit, dict(counts))
+
+
+def report(before, after):
+    """ One line comparison of two CircuitStats """
+    return "depth %s -> %s, gates %s -> %s, two qubit gates %s -> %s" % (
+        before.depth, after.depth, before.gates, after.gates, before.two_qubit_gates, after.two_qubit_gates)
+
+
+# Two qubit blocks
+
+def minimal_cnot_count(unitary):
+    """ Number of CNOTs a two qubit unitary needs, 0 to 3 (Shende, Markov and Bullock) """
+    unitary = np.asarray(unitary, dtype=complex)
+    unitary = unitary / np.linalg.det(unitary) ** 0.25
+    gamma = unitary.dot(SIGMA_YY).dot(unitary.T).dot(SIGMA_YY)
+    trace = np.trace(gamma)
+    if np.allclose(gamma, np.eye(4), atol=1e-7) or np.allclose(gamma, -np.eye(4), atol=1e-7):
+        return 0
+    if abs(trace) < 1e-7 and np.allclose(gamma.dot(gamma), -np.eye(4), atol=1e-7):
+        return 1
+    if abs(trace.imag) < 1e-7:
+        return 2
+    return 3
+
+
+def collect_blocks(gates):
+    """ Splits a gate list into blocks of gates on at most two qubits, in an order that preserves the circuit
+
+    A block grows while its qubits are not touched by a gate of another block.
+    """
+    blocks = []
+    current = {}
+    for gate in gates:
+        qubits = gate[2]
+        owners = set(current.get(qubit) for qubit in qubits)
+        if len(owners) == 1 and None not in owners:
+            block = owners.pop()
+            if len(qubits) == 1 or set(qubits) <= blocks[block][0]:
+                blocks[block][1].append(gate)
+                continue
+        blocks.append((set(qubits), [gate]))
+        for qubit in qubits:
+            current[qubit] = len(blocks) - 1
+    return blocks
+
+
+def _template(parameters, cnots, pair):
+    """ cnots CNOTs on pair, with a U3 on both qubits before, between and after them """
+    angles = np.reshape(parameters, (cnots + 1, 2, 3))
+    gates = []
+    for layer in range(cnots + 1):
+        if layer:
+            gates.append(('CNOT', None, list(pair)))
+        gates += [('U3', tuple(angles[layer, i]), [pair[i]]) for i in range(2)]
+    return gates
+
+
+def _local_unitary(gates, pair):
+    """ Unitary of gates on pair, as a 4 x 4 matrix with pair[0] as the most significant bit """
+    relabel = {pair[0]: 1, pair[1]: 0}
+    return circuit_unitary([(name, angle, [relabel[q] for q in qubits]) for name, angle, qubits in gates], 2)
+
+
+def synthesize(unitary, pair, cnots, random_state=None):
+    """ Gates on pair with cnots CNOTs that implement unitary up to a global phase, or None if the fit fails """
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+    unitary = np.asarray(unitary, dtype=complex)
+
+    cnot = gate_matrix('CNOT', None)
+
+    def infidelity(parameters):
+        # Same circuit as _template, multiplied out directly, with pair[0] as the most significant bit
+        angles = np.reshape(parameters, (cnots + 1, 2, 3))
+        candidate = np.kron(u3_matrix(*angles[0, 0]), u3_matrix(*angles[0, 1]))
+        for layer in range(1, cnots + 1):
+            candidate = np.kron(u3_matrix(*angles[layer, 0]), u3_matrix(*angles[layer, 1])).dot(cnot.dot(candidate))
+        return 1 - abs(np.trace(candidate.conj().T.dot(unitary))) / 4
+
+    for _ in range(SYNTHESIS_ATTEMPTS):
+        start = random_state.uniform(-math.pi, math.pi, 6 * (cnots + 1))
+        fit = minimize(infidelity, start, method='BFGS', options={'gtol': 1e-12})
+        if fit.fun < 1e-12:
+            return _template(fit.x, cnots, pair)
+    return None
+
+
+_synthesized = {}
+
+
+def _cached_synthesize(unitary, pair, cnots, random_state):
+    """ synthesize(), remembered for blocks with the same unitary when random_state is a seed """
+    if isinstance(random_state, np.random.RandomState):
+        return synthesize(unitary, pair, cnots, random_state)
+    key = (np.round(unitary, 12).tobytes(), tuple(pair), cnots, random_state)
+    if key not in _synthesized:
+        if len(_synthesized) >= SYNTHESIS_CACHE_SIZE:
+            _synthesized.pop(next(iter(_synthesized)))
+        _synthesized[key] = synthesize(unitary, pair, cnots, random_state)
+    return _synthesized[key]
+
+
+def resynthesize(gates, random_state=0):
+    """ Replaces every two qubit block by a circuit with the minimal number of CNOTs, when that saves CNOTs
+
+    A block whose fit fails is kept as it is, with a warning, and counted as a resynthesis failure of the optimizer
+    (common/tracing.py), so fewer CNOTs are saved than minimal_cnot_count promises.
+    """
+    optimized = []
+    for qubits, block in collect_blocks(gates):
+        cnots = sum(1 for gate in block if len(gate[2]) == 2)
+        if len(qubits) == 2 and cnots:
+            pair = next(gate[2] for gate in block if len(gate[2]) == 2)
+            unitary = _local_unitary(block, pair)
+            needed = minimal_cnot_count(unitary)
+            if needed < cnots:
+                replacement = _cached_synthesize(unitary, pair, needed, random_state)
+                if replacement is not None:
+                    block = replacement
+                else:
+                    tracing.count('optimizer', resynthesis_failures=1)
+                    warnings.warn("Resynthesis of a block on qubits %s with %s instead of %s CNOTs failed, "
+                                  "keeping it" % (pair, needed, cnots))
+        optimized += block
+    return optimized
+
+
+# Peephole passes
+
+def fuse_single_qubit_gates(gates):
+    """ Merges runs of single qubit gates on a qubit into one U3, dropping runs that are the identity """
+    optimized = []
+    pending = {}
+
+    def flush(qubit):
+        if qubit in pending:
+            matrix = pending.pop(qubit)
+            if not is_identity(matrix):
+                optimized.append(('U3', u3_angles(matrix), [qubit]))
+
+    for gate in gates:
+        name, angle, qubits = gate
+        if len(qubits) == 1:
+            qubit = qubits[0]
+            pending[qubit] = matrix_of(gate).dot(pending.get(qubit, np.eye(2)))
+            continue
+        for qubit in qubits:
+            flush(qubit)
+        optimized.append(gate)
+    for qubit in sorted(pending):
+        flush(qubit)
+    return optimized
+
+
+def _commutes_with_cnot(gate, control, target):
+    """ Whether a single qubit gate commutes with CNOT(control, target): diagonal on the control, X type on the target """
+    matrix = matrix_of(gate)
+    qubit = gate[2][0]
+    if qubit == control:
+        return abs(matrix[0, 1]) < TOLERANCE and abs(matrix[1, 0]) < TOLERANCE
+    if qubit == target:
+        return abs(matrix[0, 0] - matrix[1, 1]) < TOLERANCE and abs(matrix[0, 1] - matrix[1, 0]) < TOLERANCE
+    return True
+
+
+def cancel_cnots(gates):
+    """ Removes pairs of equal CNOTs that are only separated by gates commuting with them """
+    gates = list(gates)
+    changed = True
+    while changed:
+        changed = False
+        for i, (name, _, qubits) in enumerate(gates):
+            if name != 'CNOT':
+                continue
+            control, target = qubits
+            for j in range(i + 1, len(gates)):
+                other = gates[j]
+                if not set(other[2]) & set(qubits):
+                    continue
+                if other[0] == 'CNOT' and list(other[2]) == list(qubits):
+                    del gates[j], gates[i]
+                    changed = True
+                elif len(other[2]) == 1 and _commutes_with_cnot(other, control, target):
+                    continue
+                break
+            if changed:
+                break
+    return gates
+
+
+# Native gate sets
+
+def _to_ibmq(gate):
+    name, angle, qubits = gate
+    if name == 'CNOT':
+        return [('cx', None, qubits)]
+    theta, phi, lam = angle
+    if abs(_wrap(theta)) < TOLERANCE:
+        return [('u1', _wrap(phi + lam), qubits)]
+    if abs(_wrap(theta) - math.pi / 2) < TOLERANCE:
+        return [('u2', (_wrap(phi), _wrap(lam)), qubits)]
+    return [('u3', (theta, _wrap(phi), _wrap(lam)), qubits)]
+
+
+def _to_rigetti(gate):
+    name, angle, qubits = gate
+    if name == 'CZ':
+        return [gate]
+    theta, phi, lam = angle
+    # U3(theta, phi, lambda) = RZ(phi) RY(theta) RZ(lambda) with RY(theta) = RZ(pi/2) RX(theta) RZ(-pi/2),
+    # which is native if theta is a multiple of pi/2, and RY(theta) = RX(-pi/2) RZ(theta) RX(pi/2) otherwise
+    quarter_turns = theta / (math.pi / 2)
+    if abs(_wrap(theta)) < TOLERANCE:
+        sequence = [('RZ', phi + lam)]
+    elif abs(quarter_turns - round(quarter_turns)) < TOLERANCE:
+        sequence = [('RZ', lam - math.pi / 2), ('RX', theta), ('RZ', phi + math.pi / 2)]
+    else:
+        sequence = [('RZ', lam), ('RX', math.pi / 2), ('RZ', theta), ('RX', -math.pi / 2), ('RZ', phi)]
+    return [(name, _wrap(value), qubits) for name, value in sequence if abs(_wrap(value)) > TOLERANCE]
+
+
+def merge_rotations(gates):
+    """ Merges runs of RZ and runs of RX on a qubit of a Rigetti gate list
+
+    RZ is diagonal like CZ, so RZ angles are carried through CZs and merged with the next RZ on their qubit.
+    """
+    merged = []
+    pending = {}
+    # Index in merged of the RX that was the last gate on a qubit
+    last_rx = {}
+
+    def flush(qubit):
+        angle = _wrap(pending.pop(qubit, 0.0))
+        if abs(angle) > TOLERANCE:
+            merged.append(('RZ', angle, [qubit]))
+            last_rx.pop(qubit, None)
+
+    for name, angle, qubits in gates:
+        if name == 'RZ':
+            pending[qubits[0]] = pending.get(qubits[0], 0.0) + angle
+        elif name == 'RX':
+            qubit = qubits[0]
+            flush(qubit)
+            if qubit in last_rx:
+                index = last_rx[qubit]
+                merged[index] = ('RX', _wrap(merged[index][1] + angle), [qubit])
+            else:
+                last_rx[qubit] = len(merged)
+                merged.append((name, angle, qubits))
+        else:
+            for qubit in qubits:
+                last_rx.pop(qubit, None)
+            merged.append((name, angle, qubits))
+    for qubit in sorted(pending):
+        flush(qubit)
+    return [gate for gate in merged if gate[0] != 'RX' or abs(gate[1]) > TOLERANCE]
+
+
+def _cnot_to_cz(gates):
+    """ CNOT(c, t) = H(t) CZ(c, t) H(t) """
+    converted = []
+    for name, angle, qubits in gates:
+        if name == 'CNOT':
+            target = qubits[1]
+            converted += [('H', None, [target]), ('CZ', None, list(qubits)), ('H', None, [target])]
+        else:
+            converted.append((name, angle, qubits))
+    return converted
+
+
+def _to_native(gates, native, resynthesis, random_state):
+    if resynthesis:
+        gates = resynthesize(gates, random_state)
+    gates = fuse_single_qubit_gates(cancel_cnots(fuse_single_qubit_gates(gates)))
+    if native == 'ibmq':
+        return [native_gate for gate in gates for native_gate in _to_ibmq(gate)]
+    gates = fuse_single_qubit_gates(_cnot_to_cz(gates))
+    return merge_rotations([native_gate for gate in gates for native_gate in _to_rigetti(gate)])
+
+
+def optimize(gates, native='ibmq', resynthesis=True, random_state=0):
+    """ Optimized gate list in the native gates of a backend, implementing gates up to a global phase
+
+    The result is never deeper or longer than gates: a generic single qubit gate takes up to five Rigetti gates,
+    so a circuit of textbook gates can grow when it is translated. If neither the resynthesized nor the plain
+    translation is at most as deep and as long as gates, gates is returned as it is (pyquil and qiskit accept
+    its gates, and the compilers of the backends translate them).
+    """
+    if native not in NATIVE_GATES:
+        raise ValueError("Unknown native gate set %s, choose one of %s" % (native, ", ".join(sorted(NATIVE_GATES))))
+    gates = [(name, angle, list(qubits)) for name, angle, qubits in gates]
+    before = circuit_stats(gates)
+    candidates = []
+    for resynthesized in ([True, False] if resynthesis else [False]):
+        candidate = _to_native(gates, native, resynthesized, random_state)
+        stats = circuit_stats(candidate)
+        if stats.depth <= before.depth and stats.gates <= before.gates:
+            candidates.append(((stats.two_qubit_gates, stats.depth, stats.gates), candidate))
+    if not candidates:
+        return gates
+    return min(candidates, key=lambda candidate: candidate[0])[1]
+
+
+# Quantum beats circuits
+
+# Singlet/triplet basis change of ibmq.core, from https://arxiv.org/pdf/1206.0758.pdf
+QUANTUM_BEATS_BASIS_CHANGE = [
+    ('CNOT', None, [0, 1]), ('S', None, [0]), ('S', None, [1]), ('H', None, [0]), ('CNOT', None, [0, 1]),
+    ('T', None, [0]), ('PHASE', -math.pi / 4, [1]), ('CNOT', None, [0, 1]), ('H', None, [0]),
+    ('CNOT', None, [0, 1]), ('PHASE', -math.pi / 2, [1]),
+]
+
+
+def quantum_beats_gates(angle):
+    """ Gate list of the quantum beats circuit of ibmq.core for one phase angle, without measurements
+
+    The time step is applied before the CNOT of the singlet preparation, which it commutes with on the control qubit,
+    so the two qubit block is the same for every angle and resynthesis fits it once per sweep.
+    """
+    preparation = [('X', None, [0]), ('H', None, [1]), ('PHASE', angle, [1]), ('CNOT', None, [1, 0]), ('Z', None, [1])]
+    return preparation + QUANTUM_BEATS_BASIS_CHANGE
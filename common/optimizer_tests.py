@@ -0,0 +1,123 @@
+import math
+import unittest
+import warnings
+from unittest import mock
+import numpy as np
+from . import optimizer, tracing
+from .optimizer import (cancel_cnots, circuit_stats, circuit_unitary, fuse_single_qubit_gates, matrix_of,
+                        minimal_cnot_count, optimize, quantum_beats_gates, u3_angles, u3_matrix)
+from .radical_pair import RadicalPair
+
+
+NATIVE_MATRICES = {
+    'u1': lambda angle: matrix_of(('PHASE', angle, None)),
+    'u2': lambda angle: u3_matrix(math.pi / 2, *angle),
+    'u3': lambda angle: u3_matrix(*angle),
+    'cx': lambda angle: matrix_of(('CNOT', None, None)),
+}
+
+
+def native_unitary(gates, n_qubits):
+    return circuit_unitary([('U3', u3_angles(NATIVE_MATRICES[name](angle)), qubits) if name in ('u1', 'u2', 'u3')
+                            else ('CNOT' if name == 'cx' else name, angle, qubits) for name, angle, qubits in gates],
+                           n_qubits)
+
+
+def same_up_to_phase(a, b):
+    return abs(abs(np.trace(a.conj().T.dot(b))) - len(a)) < 1e-7
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def test_u3_angles(self):
+        random_state = np.random.RandomState(0)
+        for angles in random_state.uniform(-3, 3, (10, 3)):
+            matrix = u3_matrix(*angles)
+            self.assertTrue(same_up_to_phase(u3_matrix(*u3_angles(matrix)), matrix))
+        self.assertTrue(same_up_to_phase(u3_matrix(*u3_angles(matrix_of(('X', None, [0])))), matrix_of(('X', None, [0]))))
+
+    def test_minimal_cnot_count(self):
+        self.assertEqual(minimal_cnot_count(np.kron(u3_matrix(1, 2, 3), u3_matrix(0.5, 0, 1))), 0)
+        self.assertEqual(minimal_cnot_count(matrix_of(('CNOT', None, [0, 1]))), 1)
+        self.assertEqual(minimal_cnot_count(matrix_of(('SWAP', None, [0, 1]))), 3)
+
+    def test_fusion_and_cancellation(self):
+        gates = [('H', None, [0]), ('PHASE', 0.3, [0]), ('H', None, [0]), ('CNOT', None, [0, 1]), ('Z', None, [0]),
+                 ('X', None, [1]), ('CNOT', None, [0, 1]), ('H', None, [1]), ('H', None, [1])]
+        optimized = fuse_single_qubit_gates(cancel_cnots(fuse_single_qubit_gates(gates)))
+        self.assertEqual([name for name, _, _ in optimized], ['U3', 'U3'])
+        self.assertTrue(same_up_to_phase(circuit_unitary(optimized, 2), circuit_unitary(gates, 2)))
+
+    def test_quantum_beats_circuit(self):
+        for angle in [0.0, 0.46, 2.5]:
+            gates = quantum_beats_gates(angle)
+            expected = circuit_unitary(gates, 2)
+            ibmq = optimize(gates, 'ibmq')
+            self.assertTrue(same_up_to_phase(native_unitary(ibmq, 2), expected))
+            self.assertEqual(circuit_stats(ibmq).counts['cx'], minimal_cnot_count(expected))
+            rigetti = optimize(gates, 'rigetti')
+            self.assertTrue(same_up_to_phase(circuit_unitary(rigetti, 2), expected))
+            self.assertLessEqual(circuit_stats(rigetti).depth, circuit_stats(gates).depth)
+            self.assertLessEqual(circuit_stats(rigetti).gates, circuit_stats(gates).gates)
+            self.assertLess(circuit_stats(ibmq).depth, circuit_stats(gates).depth)
+
+    def test_rigetti_translation(self):
+        gates = quantum_beats_gates(0.46)
+        rigetti = optimizer._to_native(gates, 'rigetti', True, 0)
+        self.assertTrue(same_up_to_phase(circuit_unitary(rigetti, 2), circuit_unitary(gates, 2)))
+        self.assertTrue(all(name in ('RZ', 'RX', 'CZ') for name, _, _ in rigetti))
+        self.assertTrue(all(abs(angle / (math.pi / 2) - round(angle / (math.pi / 2))) < 1e-9
+                            for name, angle, _ in rigetti if name == 'RX'))
+        self.assertEqual(circuit_stats(rigetti).counts['CZ'], 2)
+
+    def test_merge_rotations(self):
+        gates = [('RZ', 0.3, [0]), ('CZ', None, [0, 1]), ('RZ', 0.2, [0]), ('RX', math.pi / 2, [0]),
+                 ('RX', math.pi / 2, [0]), ('RZ', 0.1, [1]), ('RZ', -0.1, [1]), ('RX', math.pi / 2, [1])]
+        merged = optimizer.merge_rotations(gates)
+        self.assertEqual([name for name, _, _ in merged], ['CZ', 'RZ', 'RX', 'RX'])
+        self.assertTrue(same_up_to_phase(circuit_unitary(merged, 2), circuit_unitary(gates, 2)))
+
+    def test_optimized_circuits_do_not_grow(self):
+        for gates in [quantum_beats_gates(0.46), RadicalPair((0.3, 0.1), ((0.5,), (0.2,))).trotter_gates(1.0, 2)]:
+            before = circuit_stats(gates)
+            for native in ('ibmq', 'rigetti'):
+                after = circuit_stats(optimize(gates, native))
+                self.assertLessEqual(after.depth, before.depth)
+                self.assertLessEqual(after.gates, before.gates)
+
+    def test_sweep_is_synthesized_once(self):
+        optimizer._synthesized.clear()
+        with mock.patch.object(optimizer, 'synthesize', wraps=optimizer.synthesize) as synthesize:
+            for angle in np.linspace(0, 6, 10):
+                optimize(quantum_beats_gates(angle), 'ibmq')
+        self.assertEqual(synthesize.call_count, 1)
+
+    def test_failed_resynthesis_is_counted(self):
+        gates = quantum_beats_gates(0.46)
+        optimizer._synthesized.clear()
+        tracer = tracing.enable()
+        try:
+            with mock.patch.object(optimizer, 'synthesize', return_value=None), \
+                    warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                optimized = optimize(gates, 'ibmq')
+        finally:
+            tracing.disable()
+            optimizer._synthesized.clear()
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(tracer.summary()['counters']['optimizer'], {'resynthesis_failures': 1})
+        self.assertTrue(same_up_to_phase(native_unitary(optimized, 2), circuit_unitary(gates, 2)))
+        self.assertGreater(circuit_stats(optimized).counts['cx'], minimal_cnot_count(circuit_unitary(gates, 2)))
+
+    def test_trotter_circuit(self):
+        gates = RadicalPair((0.3, 0.1), ((0.5,), (0.2,))).trotter_gates(1.0, 2)
+        optimized = optimize(gates, 'ibmq')
+        self.assertTrue(same_up_to_phase(native_unitary(optimized, 4), circuit_unitary(gates, 4)))
+        self.assertLess(circuit_stats(optimized).two_qubit_gates, circuit_stats(gates).two_qubit_gates)
+
+    def test_unknown_native_gate_set(self):
+        self.assertRaises(ValueError, optimize, [], 'cirq')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,281 @@
+""" Radical pair spin dynamics with hyperfine nuclei
+
+Two electron spins in a magnetic field, each coupled isotropically to its own set of spin 1/2 nuclei:
+
+    H = w_1 S1z + w_2 S2z + sum_k a_k S_e(k) . I_k + w_n sum_k I_kz
+
+with frequencies and hyperfine constants in rad/ns (hbar = 1). Electron 1 is qubit 0, electron 2 is qubit 1
+and the nuclei follow from qubit 2 on, with qubit 0 as the least significant bit of a basis state index,
+so the state space has 4 * 2**N dimensions. The pair starts in the singlet state with the nuclei unpolarized.
+
+The Hamiltonian is a scipy sparse matrix and the singlet state is evolved with expm_multiply (a Krylov/Taylor
+method that never forms the dense propagator). Up to EXACT_NUCLEI nuclei the trace over the nuclear states runs over
+all 2**N basis states; with more nuclei it is estimated with DEFAULT_SAMPLES random nuclear states by default.
+The singlet probability is accumulated over blocks of timesteps, so memory stays at about MAX_BLOCK_ELEMENTS
+amplitudes however long the time grid is, and 16 nuclei fit on a laptop.
+
+Trotterized circuits of the same evolution are emitted as a backend neutral gate list, which can be turned into
+a pyquil Program or a qiskit QuantumCircuit, or run locally to compare the Trotter error with the exact evolution.
+Without nuclei and with w_1 - w_2 = w_larmor this is the quantum beats model of the scripts.
+"""
+import math
+import numpy as np
+import scipy.sparse
+from scipy.sparse.linalg import expm_multiply
+
+from common.gates import GATE_MATRICES, PARAMETRIC_GATES, apply_gate
+from common.sweep import W_LARMOR
+
+
+# Largest number of nuclei whose trace is computed exactly by default
+EXACT_NUCLEI = 8
+# Random nuclear states of the trace estimate above EXACT_NUCLEI
+DEFAULT_SAMPLES = 8
+# Complex amplitudes of evolved states held at once, 2**22 are 64 MB
+MAX_BLOCK_ELEMENTS = 2 ** 22
+
+SIGMA_Z = scipy.sparse.csr_matrix(np.diag([1.0, -1.0]))
+SIGMA_PLUS = scipy.sparse.csr_matrix(np.array([[0.0, 1.0], [0.0, 0.0]]))
+SIGMA_MINUS = SIGMA_PLUS.T.tocsr()
+
+
+def embed(operator, qubit, n_qubits):
+    """ Sparse operator acting on one qubit of n_qubits, qubit 0 being the least significant bit """
+    return scipy.sparse.kron(scipy.sparse.kron(scipy.sparse.identity(2 ** (n_qubits - 1 - qubit)), operator),
+                             scipy.sparse.identity(2 ** qubit), format='csr')
+
+
+def singlet_amplitudes(states):
+    """ Singlet amplitude of the electron pair for every nuclear basis state
+
+    states has shape (..., 4 * 2**N), the result (..., 2**N).
+    """
+    states = np.asarray(states)
+    electrons = states.reshape(states.shape[:-1] + (-1, 4))
+    # Singlet (|01> - |10>) / sqrt(2), as prepared by the quantum beats circuits
+    return (electrons[..., 1] - electrons[..., 2]) / math.sqrt(2)
+
+
+class RadicalPair(object):
+    """ Radical pair with electron Larmor frequencies and hyperfine couplings
+
+    hyperfine holds two sequences of hyperfine constants, the nuclei of electron 1 and of electron 2.
+    nuclear_frequency is the Larmor frequency of the nuclei, usually negligible.
+    """
+
+    def __init__(self, electron_frequencies=(W_LARMOR, 0.0), hyperfine=((), ()), nuclear_frequency=0.0):
+        self.electron_frequencies = tuple(float(w) for w in electron_frequencies)
+        self.nuclei = [(0, float(a)) for a in hyperfine[0]] + [(1, float(a)) for a in hyperfine[1]]
+        self.nuclear_frequency = float(nuclear_frequency)
+
+    @property
+    def n_nuclei(self):
+        return len(self.nuclei)
+
+    @property
+    def n_qubits(self):
+        return 2 + self.n_nuclei
+
+    @property
+    def dim(self):
+        return 2 ** self.n_qubits
+
+    def hamiltonian(self):
+        """ Spin Hamiltonian as a sparse CSR matrix """
+        n = self.n_qubits
+        h = scipy.sparse.csr_matrix((self.dim, self.dim))
+        for electron, w in enumerate(self.electron_frequencies):
+            if w:
+                h = h + 0.5 * w * embed(SIGMA_Z, electron, n)
+        for k, (electron, a) in enumerate(self.nuclei):
+            nucleus = 2 + k
+            # S . I = Sz Iz + (S+ I- + S- I+) / 2, with S = sigma / 2
+            h = h + 0.25 * a * embed(SIGMA_Z, electron, n).dot(embed(SIGMA_Z, nucleus, n))
+            h = h + 0.5 * a * (embed(SIGMA_PLUS, electron, n).dot(embed(SIGMA_MINUS, nucleus, n)) +
+                               embed(SIGMA_MINUS, electron, n).dot(embed(SIGMA_PLUS, nucleus, n)))
+            if self.nuclear_frequency:
+                h = h + 0.5 * self.nuclear_frequency * embed(SIGMA_Z, nucleus, n)
+        return h.tocsr()
+
+    def initial_states(self, samples=None, random_state=None):
+        """ Singlet electron pair times nuclear states, as columns of a (dim, K) array
+
+        With samples=None these are all 2**N nuclear basis states, each weighted 1 / 2**N.
+        Otherwise samples random nuclear states with Gaussian amplitudes, whose average estimates the same trace.
+        """
+        n_nuclear = 2 ** self.n_nuclei
+        if samples is None:
+            nuclear = np.eye(n_nuclear) / math.sqrt(n_nuclear)
+        else:
+            if not isinstance(random_state, np.random.RandomState):
+                random_state = np.random.RandomState(random_state)
+            nuclear = (random_state.normal(size=(n_nuclear, samples)) +
+                       1j * random_state.normal(size=(n_nuclear, samples)))
+            nuclear /= np.linalg.norm(nuclear, axis=0) * math.sqrt(samples)
+        singlet = np.array([0, 1, -1, 0]) / math.sqrt(2)
+        # Nuclear qubits are the most significant bits
+        states = nuclear[:, np.newaxis, :] * singlet[np.newaxis, :, np.newaxis]
+        return states.reshape(self.dim, -1).astype(complex)
+
+    def evolve(self, timesteps, states):
+        """ States at every timestep, (T, dim, K), starting from states (dim, K) at t = 0 """
+        return np.concatenate(list(self.evolve_blocks(timesteps, states)))
+
+    def evolve_blocks(self, timesteps, states, max_elements=MAX_BLOCK_ELEMENTS):
+        """ Yields the states of consecutive blocks of timesteps, (block, dim, K), at most max_elements each """
+        timesteps = np.asarray(timesteps, dtype=float)
+        generator = -1j * self.hamiltonian()
+        block = max(max_elements // states.size, 1)
+        current, previous = states, 0.0
+        for start in range(0, len(timesteps), block):
+            times = timesteps[start:start + block]
+            evolved = _evolve(generator, times - previous, current)
+            yield evolved
+            current, previous = evolved[-1], times[-1]
+
+    def singlet_probability(self, timesteps, samples=None, random_state=None):
+        """ Singlet probability at every timestep (ns), averaged over the nuclear states
+
+        With samples=None the average is exact for up to EXACT_NUCLEI nuclei and estimated with
+        DEFAULT_SAMPLES random nuclear states for more.
+        """
+        if samples is None and self.n_nuclei > EXACT_NUCLEI:
+            samples = DEFAULT_SAMPLES
+        states = self.initial_states(samples, random_state)
+        probabilities = []
+        for evolved in self.evolve_blocks(timesteps, states):
+            # (block, dim, K) -> (block, K, dim), then sum |singlet amplitude|^2 over nuclear basis states and samples
+            amplitudes = singlet_amplitudes(np.swapaxes(evolved, 1, 2))
+            probabilities.append(np.sum(np.abs(amplitudes) ** 2, axis=(1, 2)))
+        return np.concatenate(probabilities)
+
+    # Trotterized circuits
+
+    def trotter_gates(self, t, steps, nuclear_bits=None):
+        """ Gate list of the singlet preparation and steps first order Trotter steps of exp(-iHt)
+
+        Gates are (name, angle, qubits) with names RZ, RX, H, X, Z and CNOT, the first qubit of CNOT is the control.
+        nuclear_bits sets the initial nuclear basis state, all nuclei in |0> by default.
+        The circuit ends with the inverse of the singlet preparation, so singlet is measured as 00 on qubits 0 and 1.
+        """
+        gates = []
+        for k, bit in enumerate(nuclear_bits or []):
+            if bit:
+                gates.append(('X', None, [2 + k]))
+        gates += SINGLET_PREPARATION
+        dt = float(t) / steps
+        for _ in range(steps):
+            for electron, w in enumerate(self.electron_frequencies):
+                if w:
+                    gates.append(('RZ', w * dt, [electron]))
+            for k, (electron, a) in enumerate(self.nuclei):
+                nucleus = 2 + k
+                # exp(-i a dt / 4 (XX + YY + ZZ)), the three terms commute
+                gates += heisenberg_gates(a * dt / 4, electron, nucleus)
+                if self.nuclear_frequency:
+                    gates.append(('RZ', self.nuclear_frequency * dt, [nucleus]))
+        gates += SINGLET_MEASUREMENT
+        return gates
+
+    def trotter_singlet_probability(self, timesteps, steps_per_ns=4, nuclear_bits=None):
+        """ Singlet probability of the Trotterized circuits, simulated locally, for comparison with the exact one """
+        probabilities = []
+        for t in timesteps:
+            steps = max(int(math.ceil(steps_per_ns * t)), 1)
+            state = run_gates(self.trotter_gates(t, steps, nuclear_bits), self.n_qubits)
+            electrons = np.abs(state.reshape(-1, 4)) ** 2
+            probabilities.append(electrons[:, 0].sum())
+        return np.array(probabilities)
+
+
+def _evolve(generator, timesteps, states):
+    """ exp(generator t) states for every t of timesteps, (T, dim, K) """
+    steps = np.diff(timesteps)
+    if len(timesteps) > 2 and np.allclose(steps, steps[0]):
+        # Uniform grid: one call reuses the work of every step
+        start = expm_multiply(generator * timesteps[0], states) if timesteps[0] else states
+        return expm_multiply(generator, start, start=0, stop=timesteps[-1] - timesteps[0],
+                             num=len(timesteps), endpoint=True)
+    evolved = []
+    current, previous = states, 0.0
+    for t in timesteps:
+        if t != previous:
+            current = expm_multiply(generator * (t - previous), current)
+        evolved.append(current)
+        previous = t
+    return np.array(evolved)
+
+
+SINGLET_PREPARATION = [('X', None, [0]), ('H', None, [1]), ('CNOT', None, [1, 0]), ('Z', None, [1])]
+SINGLET_MEASUREMENT = [('Z', None, [1]), ('CNOT', None, [1, 0]), ('H', None, [1]), ('X', None, [0])]
+
+
+def zz_gates(theta, a, b):
+    """ exp(-i theta Z_a Z_b) """
+    return [('CNOT', None, [a, b]), ('RZ', 2 * theta, [b]), ('CNOT', None, [a, b])]
+
+
+def heisenberg_gates(theta, a, b):
+    """ exp(-i theta (X_a X_b + Y_a Y_b + Z_a Z_b)) """
+    gates = zz_gates(theta, a, b)
+    # XX = (H H) ZZ (H H)
+    gates += [('H', None, [a]), ('H', None, [b])] + zz_gates(theta, a, b) + [('H', None, [a]), ('H', None, [b])]
+    # YY = RX(-pi/2) RX(-pi/2) ZZ RX(pi/2) RX(pi/2), in circuit order RX(pi/2) comes first
+    gates += [('RX', math.pi / 2, [a]), ('RX', math.pi / 2, [b])] + zz_gates(theta, a, b)
+    gates += [('RX', -math.pi / 2, [a]), ('RX', -math.pi / 2, [b])]
+    return gates
+
+
+def gate_matrix(name, angle):
+    if name in PARAMETRIC_GATES:
+        return PARAMETRIC_GATES[name](angle)
+    return GATE_MATRICES[name]
+
+
+def run_gates(gates, n_qubits):
+    """ Statevector of a gate list started from |0...0>, with the local statevector engine """
+    state = np.zeros((1, 2 ** n_qubits), dtype=complex)
+    state[0, 0] = 1
+    for name, angle, qubits in gates:
+        state = apply_gate(state, gate_matrix(name, angle), qubits)
+    return state[0]
+
+
+def to_pyquil(gates):
+    """ pyquil Program of a gate list, measuring the electron qubits """
+    from pyquil.quil import Program
+    from pyquil import gates as quil_gates
+    program = Program()
+    for name, angle, qubits in gates:
+        gate = getattr(quil_gates, name)
+        program.inst(gate(angle, *qubits) if angle is not None else gate(*qubits))
+    program.measure(0, 0)
+    program.measure(1, 1)
+    return program
+
+
+# qiskit names of gate list names that are not just lower case
+QISKIT_NAMES = {'CNOT': 'cx', 'PHASE': 'u1'}
+
+
+def to_qiskit(gates, n_qubits, name=None):
+    """ qiskit QuantumCircuit of a gate list, measuring the electron qubits into a 2 bit register
+
+    Gates with a tuple of angles, e.g. the u2 and u3 gates of common.optimizer, get every angle as a parameter.
+    """
+    from qiskit import QuantumCircuit, ClassicalRegister, QuantumRegister
+    qr = QuantumRegister(n_qubits, 'qr')
+    cr = ClassicalRegister(2, 'cr')
+    circuit = QuantumCircuit(qr, cr, name=name)
+    for gate_name, angle, qubits in gates:
+        method = getattr(circuit, QISKIT_NAMES.get(gate_name, gate_name.lower()))
+        registers = [qr[qubit] for qubit in qubits]
+        if angle is None:
+            method(*registers)
+        elif isinstance(angle, tuple):
+            method(*(list(angle) + registers))
+        else:
+            method(angle, *registers)
+    circuit.measure(qr[0], cr[0])
+    circuit.measure(qr[1], cr[1])
+    return circuit
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from .radical_pair import DEFAULT_SAMPLES, EXACT_NUCLEI, RadicalPair
+from .sweep import SINGLET, ideal_probabilities, phase_angles
+
+
+class RadicalPairTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pair = RadicalPair((0.3, 0.1), ((0.5, 0.2), (0.3,)), nuclear_frequency=0.01)
+
+    def test_without_nuclei_matches_quantum_beats(self):
+        timesteps = np.arange(0.0, 30.0)
+        expected = ideal_probabilities(phase_angles(timesteps))[:, SINGLET]
+        np.testing.assert_allclose(RadicalPair().singlet_probability(timesteps), expected, atol=1e-10)
+
+    def test_hamiltonian(self):
+        h = self.pair.hamiltonian()
+        self.assertEqual(h.shape, (32, 32))
+        self.assertEqual(abs(h - h.getH()).max(), 0)
+
+    def test_uniform_and_irregular_grids_agree(self):
+        uniform = self.pair.singlet_probability(np.linspace(0, 10, 11))
+        irregular = self.pair.singlet_probability([0, 3, 7, 10])
+        np.testing.assert_allclose(irregular, uniform[[0, 3, 7, 10]], atol=1e-10)
+
+    def test_random_nuclear_states(self):
+        timesteps = np.linspace(0, 10, 11)
+        exact = self.pair.singlet_probability(timesteps)
+        sampled = self.pair.singlet_probability(timesteps, samples=200, random_state=0)
+        np.testing.assert_allclose(sampled, exact, atol=0.05)
+
+    def test_evolution_in_blocks(self):
+        timesteps = np.linspace(0, 10, 11)
+        states = self.pair.initial_states()
+        blocks = list(self.pair.evolve_blocks(timesteps, states, max_elements=3 * states.size))
+        self.assertEqual([len(block) for block in blocks], [3, 3, 3, 2])
+        np.testing.assert_allclose(np.concatenate(blocks), self.pair.evolve(timesteps, states), atol=1e-10)
+
+    def test_many_nuclei_are_sampled_by_default(self):
+        pair = RadicalPair(hyperfine=([0.1] * (EXACT_NUCLEI // 2 + 1), [0.05] * (EXACT_NUCLEI // 2)))
+        timesteps = np.linspace(0, 4, 5)
+        np.testing.assert_allclose(pair.singlet_probability(timesteps, random_state=0),
+                                   pair.singlet_probability(timesteps, samples=DEFAULT_SAMPLES, random_state=0))
+
+    def test_trotter_circuits_converge_to_exact(self):
+        timesteps = np.linspace(0, 8, 5)
+        exact = self.pair.singlet_probability(timesteps)
+        nuclear_states = [[i & 1, (i >> 1) & 1, (i >> 2) & 1] for i in range(8)]
+        trotter = np.mean([self.pair.trotter_singlet_probability(timesteps, 10, bits) for bits in nuclear_states],
+                          axis=0)
+        np.testing.assert_allclose(trotter, exact, atol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+""" Readout error calibration and mitigation
+
+A calibration prepares every basis state of the measured qubits and counts what is read out. That gives the
+confusion matrix A, A[i, j] being the probability to read outcome i when basis state j was prepared, so measured
+outcome fractions are f = A p for the true outcome probabilities p. Outcomes are in index order, with classical
+register 0 as the least significant bit (rigetti/counting.py).
+
+Calibrations are kept in the result cache (common/cache.py) under the device and number of shots, and are measured
+again only once they are older than their time to live.
+
+Mitigation solves f = A p for all counts of a sweep at once, with counts of shape (..., 2**n):
+  - 'inverse' applies the inverse of A, which is exact on average but can give negative probabilities,
+  - 'least_squares' minimizes |A p - f| over probability vectors p (p >= 0, sum(p) = 1)
+    by projected gradient descent, all distributions in one batch.
+"""
+import time
+import numpy as np
+
+from common.cache import cache_key
+
+
+DEFAULT_TTL = 24 * 60 * 60  # Seconds
+CALIBRATION_SHOTS = 4096
+LEAST_SQUARES_ITERATIONS = 2000
+LEAST_SQUARES_TOLERANCE = 1e-12
+
+METHODS = ('inverse', 'least_squares')
+
+
+def basis_states(n_bits):
+    """ Bits of every basis state in index order, e.g. [(0, 0), (1, 0), (0, 1), (1, 1)], bit 0 first """
+    return [tuple((index >> i) & 1 for i in range(n_bits)) for index in range(2 ** n_bits)]
+
+
+def confusion_matrix(counts):
+    """ Confusion matrix from the counts of the basis state preparations
+
+    counts[j] holds the outcome counts measured after preparing basis state j, in index order.
+    """
+    counts = np.asarray(counts, dtype=float)
+    return (counts / counts.sum(axis=1, keepdims=True)).T
+
+
+def calibration_key(device, n_bits, shots):
+    return cache_key("readout calibration of %s bits" % n_bits, device, shots)
+
+
+def calibrated_confusion_matrix(measure, device, n_bits, shots=CALIBRATION_SHOTS, cache=None, ttl=DEFAULT_TTL,
+                                now=None):
+    """ Confusion matrix of device, from cache if it was measured less than ttl seconds ago
+
+    measure(shots) runs the basis state preparations in the order of basis_states(n_bits) and returns
+    their (2**n, 2**n) outcome counts. Without a cache every call measures again.
+    """
+    now = time.time() if now is None else now
+
+    def compute():
+        return {'matrix': confusion_matrix(measure(shots)), 'created': np.array(now)}
+
+    if cache is None:
+        return compute()['matrix']
+    key = calibration_key(device, n_bits, shots)
+    arrays = cache.get(key)
+    if arrays is None or now - float(arrays['created']) > ttl:
+        arrays = compute()
+        cache.put(key, **arrays)
+    return arrays['matrix']
+
+
+def project_to_simplex(vectors):
+    """ Closest probability vectors to every row of vectors, (..., K) (Duchi et al., ICML 2008) """
+    vectors = np.asarray(vectors, dtype=float)
+    size = vectors.shape[-1]
+    ordered = -np.sort(-vectors, axis=-1)
+    excess = np.cumsum(ordered, axis=-1) - 1
+    # The threshold is the largest mean excess over the k largest entries
+    threshold = np.max(excess / np.arange(1, size + 1), axis=-1, keepdims=True)
+    return np.maximum(vectors - threshold, 0)
+
+
+def mitigate_inverse(fractions, matrix):
+    """ A^-1 f for every distribution of fractions, (..., K) """
+    return np.asarray(fractions, dtype=float).dot(np.linalg.inv(matrix).T)
+
+
+def mitigate_least_squares(fractions, matrix, iterations=LEAST_SQUARES_ITERATIONS,
+                           tolerance=LEAST_SQUARES_TOLERANCE):
+    """ Probability vectors p minimizing |A p - f| for every distribution of fractions, (..., K) """
+    fractions = np.asarray(fractions, dtype=float)
+    matrix = np.asarray(matrix, dtype=float)
+    # Step 1 / L, with L the Lipschitz constant of the gradient A^T (A p - f)
+    step = 1 / np.linalg.norm(matrix, 2) ** 2
+    gram = matrix.T.dot(matrix)
+    target = fractions.dot(matrix)
+    estimate = project_to_simplex(mitigate_inverse(fractions, matrix))
+    for _ in range(iterations):
+        updated = project_to_simplex(estimate - step * (estimate.dot(gram) - target))
+        change = np.abs(updated - estimate)
+        estimate = updated
+        # Distributions with missing counts stay NaN and do not keep the iteration going
+        if not np.any(change > tolerance):
+            break
+    return estimate
+
+
+def mitigate(counts, matrix, method='least_squares'):
+    """ Counts with the readout errors of the confusion matrix removed, for counts of shape (..., 2**n)
+
+    The result has the same number of shots as counts in every distribution, as floats.
+    """
+    counts = np.asarray(counts, dtype=float)
+    shots = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fractions = counts / shots
+    if method == 'inverse':
+        probabilities = mitigate_inverse(fractions, matrix)
+    elif method == 'least_squares':
+        probabilities = mitigate_least_squares(fractions, matrix)
+    else:
+        raise ValueError("Unknown mitigation method %s, choose one of %s" % (method, ", ".join(METHODS)))
+    return probabilities * shots
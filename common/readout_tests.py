@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from .cache import ResultCache
+from .readout import (basis_states, calibrated_confusion_matrix, confusion_matrix, mitigate, project_to_simplex)
+
+
+# Readout errors of two qubits, A[i, j] = P(read i | prepared j)
+CONFUSION = np.kron([[0.9, 0.15], [0.1, 0.85]], [[0.95, 0.08], [0.05, 0.92]])
+
+
+class ReadoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_basis_states(self):
+        self.assertEqual(basis_states(2), [(0, 0), (1, 0), (0, 1), (1, 1)])
+
+    def test_confusion_matrix(self):
+        np.testing.assert_allclose(confusion_matrix(CONFUSION.T * 1000), CONFUSION)
+
+    def test_calibration_is_cached_until_it_expires(self):
+        cache = ResultCache(self.directory)
+        calls = []
+
+        def measure(shots):
+            calls.append(shots)
+            return CONFUSION.T * shots
+
+        for now in [0, 10, 50]:
+            matrix = calibrated_confusion_matrix(measure, '8Q-Agave', 2, 1000, cache, ttl=60, now=now)
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_allclose(matrix, CONFUSION)
+        calibrated_confusion_matrix(measure, '8Q-Agave', 2, 1000, cache, ttl=60, now=100)
+        calibrated_confusion_matrix(measure, '19Q-Acorn', 2, 1000, cache, ttl=60, now=100)
+        self.assertEqual(len(calls), 3)
+
+    def test_project_to_simplex(self):
+        vectors = np.random.RandomState(0).normal(size=(100, 4))
+        projected = project_to_simplex(vectors)
+        self.assertTrue(np.all(projected >= 0))
+        np.testing.assert_allclose(projected.sum(axis=1), 1)
+        np.testing.assert_allclose(project_to_simplex([0.1, 0.2, 0.3, 0.4]), [0.1, 0.2, 0.3, 0.4])
+        np.testing.assert_allclose(project_to_simplex([2.0, 0.0, 0.0, -1.0]), [1, 0, 0, 0])
+
+    def test_mitigation_recovers_exact_distributions(self):
+        probabilities = np.random.RandomState(1).dirichlet(np.ones(4), size=(5, 3))
+        counts = probabilities.dot(CONFUSION.T) * 1024
+        for method in ['inverse', 'least_squares']:
+            np.testing.assert_allclose(mitigate(counts, CONFUSION, method), probabilities * 1024, atol=1e-6)
+
+    def test_least_squares_keeps_probabilities_valid(self):
+        # A state without 00 and 11 measured with few shots: the inverse goes negative
+        counts = np.array([[20, 470, 530, 4], [0, 500, 524, 0]])
+        inverse = mitigate(counts, CONFUSION, 'inverse')
+        least_squares = mitigate(counts, CONFUSION)
+        self.assertTrue(np.any(inverse < 0))
+        self.assertTrue(np.all(least_squares >= 0))
+        np.testing.assert_allclose(least_squares.sum(axis=1), counts.sum(axis=1))
+
+    def test_missing_counts_stay_missing(self):
+        counts = np.array([[np.nan] * 4, [100, 400, 400, 124]])
+        mitigated = mitigate(counts, CONFUSION)
+        self.assertTrue(np.all(np.isnan(mitigated[0])))
+        self.assertFalse(np.any(np.isnan(mitigated[1])))
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, mitigate, np.ones(4), CONFUSION, 'magic')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+""" Columnar store of sweep results
+
+Every column of a result set is a raw binary file of fixed size records next to a schema.json that describes
+the columns (name, dtype, shape of one record, CSV label) and the number of complete records.
+Records are buffered in memory and appended to the column files in blocks, and the schema is rewritten after
+every block, so a crashed sweep leaves every record up to the last flush readable.
+Columns are read back as memory maps with read_results, without parsing any text.
+
+Optionally every record is also echoed as a CSV line, with a header generated from the same columns.
+Columns holding per-repeat arrays are echoed as their mean and standard deviation, ignoring NaN entries.
+"""
+import json
+import os
+import tempfile
+import numpy as np
+
+from common import tracing
+
+
+SCHEMA_FILE = "schema.json"
+DEFAULT_BUFFER_RECORDS = 16
+
+
+class Column(object):
+    """ A column of a result set: every record holds an array of dtype and shape, () for scalars """
+
+    def __init__(self, name, dtype='f8', shape=(), label=None):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.label = label or name
+
+    def to_dict(self):
+        return {'name': self.name, 'dtype': self.dtype.str, 'shape': list(self.shape), 'label': self.label}
+
+    @classmethod
+    def from_dict(cls, description):
+        return cls(description['name'], description['dtype'], description['shape'], description['label'])
+
+    def csv_labels(self):
+        if self.shape:
+            return ["%s Mean" % self.label, "%s Std" % self.label]
+        return [self.label]
+
+    def csv_values(self, value):
+        if self.shape:
+            # Missing entries of float arrays are NaN
+            return [np.nanmean(value), np.nanstd(value)]
+        return [value]
+
+
+def column_path(directory, name):
+    return os.path.join(directory, name + ".bin")
+
+
+def _write_schema(directory, columns, records):
+    """ Replaces schema.json atomically """
+    schema = {'columns': [column.to_dict() for column in columns], 'records': records}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as fp:
+        json.dump(schema, fp, indent=2)
+    os.replace(tmp_path, os.path.join(directory, SCHEMA_FILE))
+
+
+def read_schema(directory):
+    """ (columns, number of records) of a result set """
+    with open(os.path.join(directory, SCHEMA_FILE)) as fp:
+        schema = json.load(fp)
+    return [Column.from_dict(description) for description in schema['columns']], schema['records']
+
+
+class CsvWriter(object):
+    """ Writes the header and every record of columns to stream as CSV lines, without storing them """
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = list(columns)
+        print(", ".join(label for column in self.columns for label in column.csv_labels()), file=stream)
+
+    def append(self, **values):
+        record = [np.asarray(values[column.name], dtype=column.dtype) for column in self.columns]
+        self.write(record)
+
+    def write(self, record):
+        print(", ".join("%s" % value for column, value in zip(self.columns, record)
+                        for value in column.csv_values(value)), file=self.stream)
+
+    def close(self):
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultWriter(object):
+    """ Appends records to the columns of a result set in directory, replacing what was there before
+
+    Use as a context manager or call close() to write the last records. With echo set to a stream
+    (e.g. sys.stdout) the header and every record are also written to it as CSV lines.
+    """
+
+    def __init__(self, directory, columns, buffer_records=DEFAULT_BUFFER_RECORDS, echo=None):
+        self.directory = directory
+        self.columns = list(columns)
+        self.buffer_records = buffer_records
+        self.echo = CsvWriter(echo, self.columns) if echo is not None else None
+        self.records = 0
+        self._buffer = []
+        os.makedirs(directory, exist_ok=True)
+        for column in self.columns:
+            open(column_path(directory, column.name), 'wb').close()
+        _write_schema(directory, self.columns, 0)
+
+    def append(self, **values):
+        """ Adds a record with a value for every column """
+        missing = [column.name for column in self.columns if column.name not in values]
+        if missing:
+            raise ValueError("Record has no value for %s" % ", ".join(missing))
+        record = []
+        for column in self.columns:
+            value = np.asarray(values[column.name], dtype=column.dtype)
+            if value.shape != column.shape:
+                raise ValueError("Column %s holds records of shape %s, got %s"
+                                 % (column.name, column.shape, value.shape))
+            record.append(value)
+        self._buffer.append(record)
+        if self.echo is not None:
+            self.echo.write(record)
+        if len(self._buffer) >= self.buffer_records:
+            self.flush()
+
+    def flush(self):
+        """ Appends the buffered records to the column files """
+        if not self._buffer:
+            return
+        with tracing.span('results.flush', records=len(self._buffer)):
+            written = 0
+            for i, column in enumerate(self.columns):
+                block = np.stack([record[i] for record in self._buffer])
+                with open(column_path(self.directory, column.name), 'ab') as fp:
+                    block.tofile(fp)
+                written += block.nbytes
+            tracing.count('results', records=len(self._buffer), bytes=written)
+            self.records += len(self._buffer)
+            self._buffer = []
+            _write_schema(self.directory, self.columns, self.records)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_results(directory, mmap_mode='r'):
+    """ Columns of a result set as a dict of arrays of shape (records,) + column shape
+
+    The arrays are memory maps of the column files, unless mmap_mode is None.
+    """
+    columns, records = read_schema(directory)
+    results = {}
+    for column in columns:
+        shape = (records,) + column.shape
+        path = column_path(directory, column.name)
+        if mmap_mode is None or records == 0:
+            count = records * int(np.prod(column.shape, dtype=int))
+            results[column.name] = np.fromfile(path, dtype=column.dtype, count=count).reshape(shape)
+        else:
+            results[column.name] = np.memmap(path, dtype=column.dtype, mode=mmap_mode, shape=shape)
+    return results
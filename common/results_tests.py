@@ -0,0 +1,49 @@
+import io
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from .results import Column, ResultWriter, read_results, read_schema
+
+
+class ResultWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.columns = [Column('t', 'i8', label='Timestamp'), Column('singlet', 'f8', label='Singlet'),
+                        Column('singlet_qpu', 'i8', (3,), label='Singlet (QPU)')]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        with ResultWriter(self.directory, self.columns, buffer_records=2) as writer:
+            for t in range(5):
+                writer.append(t=t, singlet=0.5 * t, singlet_qpu=[t, t + 1, t + 2])
+            # Two blocks of two records are on disk, the last record is still buffered
+            self.assertEqual(read_schema(self.directory)[1], 4)
+        results = read_results(self.directory)
+        np.testing.assert_array_equal(results['t'], np.arange(5))
+        np.testing.assert_allclose(results['singlet'], 0.5 * np.arange(5))
+        self.assertEqual(results['singlet_qpu'].shape, (5, 3))
+        np.testing.assert_array_equal(results['singlet_qpu'][4], [4, 5, 6])
+
+    def test_echo(self):
+        echo = io.StringIO()
+        with ResultWriter(self.directory, self.columns, echo=echo) as writer:
+            writer.append(t=1, singlet=0.25, singlet_qpu=[1, 2, 3])
+        header, line = echo.getvalue().splitlines()
+        self.assertEqual(header, "Timestamp, Singlet, Singlet (QPU) Mean, Singlet (QPU) Std")
+        self.assertEqual(len(line.split(", ")), 4)
+        self.assertTrue(line.startswith("1, 0.25, 2.0, "))
+
+    def test_invalid_record(self):
+        with ResultWriter(self.directory, self.columns) as writer:
+            with self.assertRaises(ValueError):
+                writer.append(t=1, singlet=0.25)
+            with self.assertRaises(ValueError):
+                writer.append(t=1, singlet=0.25, singlet_qpu=[1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+""" Shot counts drawn from outcome probabilities
+
+Outcomes are in the order of basis state indices, with qubit 0 as the least significant bit, as in rigetti/counting.py.
+Used by the local simulations of both platforms, so it needs neither pyquil nor qiskit.
+"""
+import numpy as np
+
+
+def sample_counts(probabilities, shots, random_state=None):
+    """ Draws outcome counts for a number of shots straight from outcome probabilities
+
+    probabilities has shape (..., 2**n), e.g. a (T, 4) array for a whole time grid, and the counts
+    have the same shape. Every distribution is sampled at once with conditional binomial draws,
+    which is an exact multinomial draw that needs memory for the outcomes only, not for the shots.
+    random_state is a seed or a np.random.RandomState.
+    """
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+    probabilities = np.asarray(probabilities, dtype=float)
+    probabilities = probabilities / probabilities.sum(axis=-1, keepdims=True)
+
+    counts = np.zeros(probabilities.shape, dtype=np.int64)
+    remaining = np.full(probabilities.shape[:-1], shots, dtype=np.int64)
+    probability_left = np.ones(probabilities.shape[:-1])
+    for outcome in range(probabilities.shape[-1] - 1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(probability_left > 0, probabilities[..., outcome] / probability_left, 0)
+        counts[..., outcome] = random_state.binomial(remaining, np.clip(ratio, 0, 1))
+        remaining -= counts[..., outcome]
+        probability_left -= probabilities[..., outcome]
+    counts[..., -1] = remaining
+    return counts
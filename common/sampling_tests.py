@@ -0,0 +1,26 @@
+import unittest
+import numpy as np
+from .sampling import sample_counts
+
+
+class SampleCountsTest(unittest.TestCase):
+
+    def test_sample_counts(self):
+        probabilities = np.array([[0.1, 0.2, 0.3, 0.4], [0, 0, 1, 0]])
+        counts = sample_counts(probabilities, 1000, random_state=1234)
+        self.assertEqual(counts.shape, (2, 4))
+        np.testing.assert_array_equal(counts.sum(axis=1), [1000, 1000])
+        np.testing.assert_array_equal(counts[1], [0, 0, 1000, 0])
+        # Same seed, same counts
+        np.testing.assert_array_equal(counts, sample_counts(probabilities, 1000, random_state=1234))
+
+    def test_sample_counts_statistics(self):
+        probabilities = np.array([0.1, 0.2, 0.3, 0.4])
+        counts = sample_counts(np.tile(probabilities, (20000, 1)), 1000, random_state=1234)
+        # Multinomial mean and variance
+        np.testing.assert_allclose(counts.mean(axis=0), 1000 * probabilities, rtol=0.01)
+        np.testing.assert_allclose(counts.var(axis=0), 1000 * probabilities * (1 - probabilities), rtol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
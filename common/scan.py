@@ -0,0 +1,81 @@
+""" Two dimensional scans over Larmor frequency and time on a process pool
+
+Every Larmor frequency is one row of the scan. The rows are spread over a pool of worker processes,
+which write their results straight into a shared memory array, so no results are pickled back.
+The random numbers of a row come from np.random.RandomState([seed, row]), so sampled or noisy results
+are the same for any number of processes.
+"""
+import multiprocessing
+from functools import partial
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
+
+from common.sampling import sample_counts
+from common.sweep import SINGLET, ideal_probabilities, phase_angles
+
+
+def ideal_row(w_larmor, timesteps, random_state):
+    """ Exact outcome probabilities of a row, (T, 4) """
+    return ideal_probabilities(phase_angles(timesteps, w_larmor))
+
+
+def sampled_row(w_larmor, timesteps, random_state, shots=1024):
+    """ Outcome fractions of a row, measured with a number of shots at every point, (T, 4) """
+    counts = sample_counts(ideal_row(w_larmor, timesteps, random_state), shots, random_state)
+    return counts / float(shots)
+
+
+# State of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(shared, shape, function, timesteps, seed):
+    _worker['results'] = np.frombuffer(shared, dtype=np.float64).reshape(shape)
+    _worker['function'] = function
+    _worker['timesteps'] = timesteps
+    _worker['seed'] = seed
+
+
+def _scan_row(task):
+    row, w_larmor = task
+    random_state = np.random.RandomState([_worker['seed'], row])
+    _worker['results'][row] = _worker['function'](w_larmor, _worker['timesteps'], random_state)
+    return row
+
+
+def scan(w_larmors, timesteps, function=ideal_row, n_outcomes=4, seed=None, processes=None, chunksize=1):
+    """ Results of function for every Larmor frequency, as a (W, T, n_outcomes) array
+
+    function(w_larmor, timesteps, random_state) returns the (T, n_outcomes) results of one row, e.g. ideal_row,
+    or partial(sampled_row, shots=1000). It has to be picklable, so define it at module level.
+    processes defaults to the number of cores; with processes=1 the scan runs in this process.
+    """
+    w_larmors = np.asarray(w_larmors, dtype=float)
+    timesteps = np.asarray(timesteps, dtype=float)
+    if seed is None:
+        # Draw the seed once here, so every worker derives its stream from the same one
+        seed = np.random.randint(2 ** 31)
+    shape = (len(w_larmors), len(timesteps), n_outcomes)
+    shared = RawArray('d', int(np.prod(shape)))
+    tasks = list(enumerate(w_larmors))
+
+    if processes == 1:
+        _init_worker(shared, shape, function, timesteps, seed)
+        for task in tasks:
+            _scan_row(task)
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=(shared, shape, function, timesteps, seed))
+        try:
+            for _ in pool.imap_unordered(_scan_row, tasks, chunksize):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+    return np.frombuffer(shared, dtype=np.float64).reshape(shape).copy()
+
+
+def singlet_yield(w_larmors, timesteps, shots=None, seed=None, processes=None):
+    """ Singlet fraction over a (w_larmor, t) grid, exact or measured with a number of shots per point """
+    function = ideal_row if shots is None else partial(sampled_row, shots=shots)
+    return scan(w_larmors, timesteps, function, seed=seed, processes=processes)[..., SINGLET]
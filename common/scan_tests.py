@@ -0,0 +1,31 @@
+import unittest
+from functools import partial
+import numpy as np
+from .scan import ideal_row, sampled_row, scan, singlet_yield
+
+
+class ScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.w_larmors = np.linspace(0.3, 0.6, 7)
+        self.timesteps = np.arange(0.0, 30.0, 0.5)
+
+    def test_ideal(self):
+        yields = singlet_yield(self.w_larmors, self.timesteps, processes=2)
+        expected = np.cos(np.outer(self.w_larmors, self.timesteps) / 2) ** 2
+        np.testing.assert_allclose(yields, expected)
+
+    def test_reproducible_for_any_number_of_processes(self):
+        function = partial(sampled_row, shots=1000)
+        serial = scan(self.w_larmors, self.timesteps, function, seed=3, processes=1)
+        parallel = scan(self.w_larmors, self.timesteps, function, seed=3, processes=3)
+        np.testing.assert_array_equal(serial, parallel)
+        np.testing.assert_allclose(serial.sum(axis=-1), 1)
+        self.assertFalse(np.array_equal(serial, scan(self.w_larmors, self.timesteps, function, seed=4, processes=1)))
+
+    def test_shape(self):
+        self.assertEqual(scan(self.w_larmors, self.timesteps, ideal_row, processes=1).shape, (7, 60, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
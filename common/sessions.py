@@ -0,0 +1,103 @@
+""" Backend sessions shared by all entry points of a process
+
+A SessionManager creates every backend connection once, on first use, and keeps it for the rest of the run,
+so repeated lookups are dictionary reads instead of new connections and handshakes. Device metadata (devices,
+ISAs, available backends) is cached for a time to live and fetched again only once it is older than that:
+
+    manager = default_manager()
+    qvm = manager.connection('qvm', QVMConnection)
+    devices = manager.metadata('devices', lambda: get_devices(as_dict=True))
+
+Keys can be anything hashable, e.g. tuples of a backend and its endpoint. Connections and metadata are created
+under a lock, so threads of a sweep that ask for the same key share one instance. With tracing on
+(common/tracing.py) created connections, metadata fetches and metadata cache hits are counted under 'sessions'.
+"""
+import threading
+import time
+
+from common import tracing
+
+
+DEFAULT_TTL = 10 * 60  # Seconds
+
+
+class SessionManager(object):
+    """ Connections created once and device metadata cached for ttl seconds """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._connections = {}
+        # key -> (time fetched, value)
+        self._metadata = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        # One lock per key, so a slow handshake or fetch only blocks the threads that wait for the same key
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def connection(self, key, factory):
+        """ Connection of key, created with factory() the first time it is asked for """
+        try:
+            return self._connections[key]
+        except KeyError:
+            pass
+        with self._key_lock(('connection', key)):
+            if key not in self._connections:
+                self._connections[key] = factory()
+                tracing.count('sessions', connections=1)
+            return self._connections[key]
+
+    def metadata(self, key, fetch, ttl=None):
+        """ Metadata of key from the cache, or from fetch() if it is missing or older than ttl seconds """
+        ttl = self.ttl if ttl is None else ttl
+        with self._key_lock(('metadata', key)):
+            entry = self._metadata.get(key)
+            now = self.clock()
+            if entry is not None and now - entry[0] <= ttl:
+                tracing.count('sessions', metadata_hits=1)
+                return entry[1]
+            value = fetch()
+            self._metadata[key] = (now, value)
+            tracing.count('sessions', metadata_fetches=1)
+            return value
+
+    def invalidate(self, key=None):
+        """ Drops the cached metadata of key, or all of it, so it is fetched again on the next use """
+        with self._lock:
+            if key is None:
+                self._metadata.clear()
+            else:
+                self._metadata.pop(key, None)
+
+    def close(self):
+        """ Closes every connection that can be closed and forgets all connections and metadata """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._metadata.clear()
+        for connection in connections:
+            if hasattr(connection, 'close'):
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_manager():
+    """ The SessionManager shared by all entry points of this process """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SessionManager()
+        return _default
@@ -0,0 +1,87 @@
+import threading
+import unittest
+from . import tracing
+from .sessions import SessionManager, default_manager
+
+
+class Closable(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class SessionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.manager = SessionManager(ttl=60, clock=lambda: self.now)
+
+    def test_connection_created_once(self):
+        created = []
+        factory = lambda: created.append(1) or object()
+        first = self.manager.connection('qvm', factory)
+        self.assertIs(self.manager.connection('qvm', factory), first)
+        self.assertIsNot(self.manager.connection(('qvm', '8Q-Agave'), factory), first)
+        self.assertEqual(len(created), 2)
+
+    def test_connection_shared_between_threads(self):
+        created = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            created.append(1)
+            return object()
+
+        def connect(connections):
+            barrier.wait()
+            connections.append(self.manager.connection('qpu', factory))
+        connections = []
+        threads = [threading.Thread(target=connect, args=(connections,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(created), 1)
+        self.assertEqual(len(set(id(connection) for connection in connections)), 1)
+
+    def test_metadata_ttl(self):
+        fetches = []
+        fetch = lambda: fetches.append(1) or len(fetches)
+        self.assertEqual(self.manager.metadata('devices', fetch), 1)
+        self.now = 60
+        self.assertEqual(self.manager.metadata('devices', fetch), 1)
+        self.now = 61
+        self.assertEqual(self.manager.metadata('devices', fetch), 2)
+        self.assertEqual(self.manager.metadata('devices', fetch, ttl=0), 2)
+        self.manager.invalidate('devices')
+        self.assertEqual(self.manager.metadata('devices', fetch), 3)
+
+    def test_close(self):
+        connection = self.manager.connection('http', Closable)
+        self.manager.metadata('devices', lambda: 1)
+        with self.manager:
+            pass
+        self.assertTrue(connection.closed)
+        self.assertIsNot(self.manager.connection('http', Closable), connection)
+
+    def test_traced(self):
+        tracer = tracing.enable()
+        try:
+            self.manager.connection('qvm', object)
+            self.manager.connection('qvm', object)
+            self.manager.metadata('devices', lambda: 1)
+            self.manager.metadata('devices', lambda: 1)
+        finally:
+            tracing.disable()
+        self.assertEqual(tracer.summary()['counters']['sessions'],
+                         {'connections': 1, 'metadata_fetches': 1, 'metadata_hits': 1})
+
+    def test_default_manager(self):
+        self.assertIs(default_manager(), default_manager())
+
+
+if __name__ == '__main__':
+    unittest.main()
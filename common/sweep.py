@@ -0,0 +1,92 @@
+""" Time grids of quantum beats sweeps
+
+A sweep is a time grid and a Larmor frequency. The ideal singlet and triplet probabilities of every point
+have a closed form, so a grid of any resolution costs next to nothing to compute. Only the points selected
+as slow points are meant to go to hardware or to noisy simulation, so the resolution of the ideal curves
+does not depend on the latency of a backend.
+
+Outcomes are in index order, with qubit 0 as the least significant bit: '00', '01' (singlet), '10' (triplet), '11'.
+"""
+import numpy as np
+
+
+W_LARMOR = 0.46  # 4.6e8 1/s as determined in the experiment
+
+SINGLET = 1
+TRIPLET = 2
+
+
+def phase_angles(timesteps, w_larmor=W_LARMOR):
+    """ Phase accumulated by the radical pair at every timestep (ns), for a Larmor frequency in 1/ns """
+    return w_larmor * np.asarray(timesteps, dtype=float)
+
+
+def ideal_probabilities(angles):
+    """ Exact outcome probabilities of the quantum beats circuit for every phase angle, as a (T, 4) array
+
+    The singlet state picks up the phase on one spin and is measured in the singlet/triplet basis:
+    singlet with probability cos^2(angle / 2) and triplet with probability sin^2(angle / 2).
+    """
+    angles = np.asarray(angles, dtype=float)
+    probabilities = np.zeros(angles.shape + (4,))
+    probabilities[..., SINGLET] = np.cos(angles / 2) ** 2
+    probabilities[..., TRIPLET] = np.sin(angles / 2) ** 2
+    return probabilities
+
+
+def spread_points(n_points, count):
+    """ Indices of count points spread evenly over n_points, first and last point included """
+    if count is None or count >= n_points:
+        return np.arange(n_points)
+    if count <= 1:
+        return np.arange(min(count, n_points))
+    return np.unique(np.round(np.linspace(0, n_points - 1, count)).astype(int))
+
+
+class Sweep(object):
+    """ A time grid at one Larmor frequency, with the subset of slow points
+
+    timesteps is any 1D grid in ns, e.g. range(0, 30) or np.arange(0.0, 30.0, 0.1).
+    slow_points is either the number of slow points, spread evenly over the grid, or their indices.
+    By default every point is a slow point.
+    """
+
+    def __init__(self, timesteps, w_larmor=W_LARMOR, slow_points=None):
+        self.timesteps = np.asarray(timesteps)
+        self.w_larmor = w_larmor
+        self.angles = phase_angles(self.timesteps, w_larmor)
+        if slow_points is None or np.isscalar(slow_points):
+            self.slow_indices = spread_points(len(self.timesteps), slow_points)
+        else:
+            self.slow_indices = np.unique(np.asarray(slow_points, dtype=int))
+        self._slow = np.zeros(len(self.timesteps), dtype=bool)
+        self._slow[self.slow_indices] = True
+
+    def __len__(self):
+        return len(self.timesteps)
+
+    @property
+    def slow_timesteps(self):
+        return self.timesteps[self.slow_indices]
+
+    @property
+    def slow_angles(self):
+        return self.angles[self.slow_indices]
+
+    def is_slow(self, step):
+        """ Whether the point at index step goes to the slow backends """
+        return bool(self._slow[step])
+
+    def ideal_probabilities(self):
+        """ Exact outcome probabilities of every point, (T, 4) """
+        return ideal_probabilities(self.angles)
+
+    def expand(self, slow_values, fill=np.nan):
+        """ Values of the slow points placed on the full grid, fill everywhere else
+
+        slow_values has one row per slow point, the result one row per point of the grid.
+        """
+        slow_values = np.asarray(slow_values, dtype=float)
+        values = np.full((len(self.timesteps),) + slow_values.shape[1:], fill)
+        values[self.slow_indices] = slow_values
+        return values
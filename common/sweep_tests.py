@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from .sweep import SINGLET, TRIPLET, Sweep, ideal_probabilities, phase_angles, spread_points
+
+
+class SweepTest(unittest.TestCase):
+
+    def test_ideal_probabilities(self):
+        probabilities = ideal_probabilities(phase_angles(np.arange(0.0, 30.0, 0.1)))
+        self.assertEqual(probabilities.shape, (300, 4))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1)
+        np.testing.assert_allclose(ideal_probabilities([0, np.pi])[:, [SINGLET, TRIPLET]], [[1, 0], [0, 1]], atol=1e-12)
+
+    def test_spread_points(self):
+        np.testing.assert_array_equal(spread_points(300, 4), [0, 100, 199, 299])
+        np.testing.assert_array_equal(spread_points(3, 10), [0, 1, 2])
+
+    def test_slow_points(self):
+        sweep = Sweep(np.arange(0.0, 30.0, 0.1), w_larmor=0.5, slow_points=30)
+        self.assertEqual(len(sweep), 300)
+        self.assertEqual(len(sweep.slow_timesteps), 30)
+        self.assertTrue(sweep.is_slow(0) and sweep.is_slow(299) and not sweep.is_slow(1))
+        np.testing.assert_allclose(sweep.slow_angles, 0.5 * sweep.slow_timesteps)
+        values = sweep.expand(np.ones((30, 4)))
+        self.assertEqual(values.shape, (300, 4))
+        self.assertEqual(np.isnan(values[:, 0]).sum(), 270)
+
+    def test_all_points_slow_by_default(self):
+        sweep = Sweep(range(30))
+        np.testing.assert_array_equal(sweep.slow_indices, np.arange(30))
+
+
+if __name__ == '__main__':
+    unittest.main()
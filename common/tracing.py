@@ -0,0 +1,199 @@
+""" Lightweight tracing of sweeps: timed spans and per-backend counters
+
+    with span('compile', t=t):
+        ...
+    count('qpu', jobs=1, shots=1024)
+
+Spans nest per thread and record their start, duration, thread and arguments; counters add up named values per
+backend (jobs, shots, bytes, cache hits, errors, ...). Tracing is off by default, then span() returns a shared
+no-op context manager and count() returns at once, so instrumented code costs next to nothing.
+
+Set the environment variable QUANTUM_BEATS_TRACE to a file name to trace a script: at exit the timeline is written
+there in the Chrome trace format (open it in chrome://tracing or https://ui.perfetto.dev) and a summary of the spans
+and counters is printed to stderr. In code use enable() / disable(), or the tracing() context manager.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+
+TRACE_VARIABLE = "QUANTUM_BEATS_TRACE"
+
+
+class _NullSpan(object):
+    """ Span of a disabled tracer """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.events.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+
+class Tracer(object):
+    """ Spans and counters of one traced run """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # list.append is atomic, so spans of any thread are recorded without a lock
+        self.events = []
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self._counter_events = []
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def count(self, backend, **values):
+        with self._lock:
+            counters = self.counters[backend]
+            for name, value in values.items():
+                counters[name] += value
+            self._counter_events.append((backend, time.perf_counter(), dict(counters)))
+
+    def summary(self):
+        """ {'spans': {name: {calls, total, mean, max}}, 'counters': {backend: {name: value}}} """
+        spans = OrderedDict()
+        for name, _, duration, _, _ in sorted(self.events, key=lambda event: event[1]):
+            entry = spans.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+            entry['calls'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+        for entry in spans.values():
+            entry['mean'] = entry['total'] / entry['calls']
+        counters = dict((backend, dict(values)) for backend, values in self.counters.items())
+        return {'spans': spans, 'counters': counters}
+
+    def chrome_trace(self):
+        """ Events in the Chrome trace event format, times in microseconds since the tracer was created """
+        pid = os.getpid()
+        events = []
+        for name, start, duration, thread, args in self.events:
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': thread,
+                           'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6,
+                           'args': dict((key, "%s" % value) for key, value in args.items())})
+        for backend, timestamp, values in self._counter_events:
+            events.append({'name': backend, 'ph': 'C', 'pid': pid, 'ts': (timestamp - self.origin) * 1e6,
+                           'args': values})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.chrome_trace(), fp)
+
+    def print_summary(self, stream=None):
+        stream = stream or sys.stderr
+        summary = self.summary()
+        print("Span, Calls, Total (s), Mean (s), Max (s)", file=stream)
+        for name, entry in sorted(summary['spans'].items(), key=lambda item: -item[1]['total']):
+            print("%s, %s, %.4g, %.4g, %.4g" % (name, entry['calls'], entry['total'], entry['mean'], entry['max']),
+                  file=stream)
+        for backend, values in sorted(summary['counters'].items()):
+            print("%s: %s" % (backend, ", ".join("%s=%g" % item for item in sorted(values.items()))), file=stream)
+
+
+_tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def tracer():
+    """ The active Tracer, None when tracing is off """
+    return _tracer
+
+
+def enable():
+    """ Starts tracing into a new Tracer and returns it """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """ Stops tracing and returns the Tracer that was active """
+    global _tracer
+    active, _tracer = _tracer, None
+    return active
+
+
+def span(name, **args):
+    """ Context manager that records the time spent in its block as a span of name """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **args)
+
+
+def count(backend, **values):
+    """ Adds values to the counters of backend, e.g. count('qpu', jobs=1, shots=1024) """
+    if _tracer is not None:
+        _tracer.count(backend, **values)
+
+
+def traced(name):
+    """ Decorator that records every call of a function as a span of name """
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with _tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def tracing(path=None, stream=None):
+    """ Traces the block, then writes the Chrome trace to path (if given) and prints the summary """
+    active = enable()
+    try:
+        yield active
+    finally:
+        disable()
+        if path:
+            active.write_chrome_trace(path)
+        active.print_summary(stream)
+
+
+def _trace_until_exit(path):
+    active = enable()
+
+    def finish():
+        active.write_chrome_trace(path)
+        active.print_summary()
+        print("Trace written to %s" % path, file=sys.stderr)
+    atexit.register(finish)
+
+
+if os.environ.get(TRACE_VARIABLE):
+    _trace_until_exit(os.environ[TRACE_VARIABLE])
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from . import tracing
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+
+    def test_spans_nest(self):
+        with tracing.span('sweep'):
+            with tracing.span('compile', t=3):
+                pass
+        inner, outer = self.tracer.events
+        self.assertEqual((inner[0], inner[4]), ('compile', {'t': 3}))
+        self.assertEqual(outer[0], 'sweep')
+        self.assertLessEqual(outer[1], inner[1])
+        self.assertGreaterEqual(outer[1] + outer[2], inner[1] + inner[2])
+
+    def test_span_records_errors(self):
+        with self.assertRaises(ValueError):
+            with tracing.span('run'):
+                raise ValueError()
+        self.assertEqual(self.tracer.events[0][4], {'error': 'ValueError'})
+
+    def test_disabled(self):
+        tracing.disable()
+        self.assertFalse(tracing.enabled())
+        self.assertIs(tracing.span('a'), tracing.span('b', t=1))
+        with tracing.span('a'):
+            tracing.count('qpu', jobs=1)
+        self.assertEqual(self.tracer.events, [])
+        self.assertEqual(self.tracer.summary()['counters'], {})
+
+    def test_summary(self):
+        for t in range(3):
+            with tracing.span('run', t=t):
+                tracing.count('qpu', jobs=1, shots=1024)
+        tracing.count('cache', hits=1)
+        summary = self.tracer.summary()
+        self.assertEqual(summary['spans']['run']['calls'], 3)
+        self.assertAlmostEqual(summary['spans']['run']['mean'] * 3, summary['spans']['run']['total'])
+        self.assertEqual(summary['counters'], {'qpu': {'jobs': 3, 'shots': 3072}, 'cache': {'hits': 1}})
+
+    def test_traced(self):
+        @tracing.traced('double')
+        def double(x):
+            return 2 * x
+        self.assertEqual(double(2), 4)
+        self.assertEqual([event[0] for event in self.tracer.events], ['double'])
+
+    def test_chrome_trace(self):
+        with tracing.span('run', t=0.5):
+            tracing.count('qpu', shots=1024)
+        events = self.tracer.chrome_trace()['traceEvents']
+        self.assertEqual([event['ph'] for event in events], ['X', 'C'])
+        self.assertEqual(events[0]['args'], {'t': '0.5'})
+        self.assertEqual(events[1]['args'], {'shots': 1024})
+        self.assertGreaterEqual(events[0]['dur'], 0)
+
+    def test_executor_jobs(self):
+        from rigetti.executor import Job, run_sweep
+        jobs = [Job(t, 'qvm', 0, lambda: 1) for t in range(4)] + [Job(0, 'qpu', 0, lambda: 2)]
+        run_sweep(jobs)
+        self.assertEqual(self.tracer.summary()['counters'], {'qvm': {'jobs': 4}, 'qpu': {'jobs': 1}})
+        self.assertEqual(self.tracer.summary()['spans']['qvm']['calls'], 4)
+
+
+class TracingContextTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_writes_trace_and_summary(self):
+        path = os.path.join(self.directory, 'trace.json')
+        stream = io.StringIO()
+        with tracing.tracing(path, stream):
+            with tracing.span('sweep'):
+                tracing.count('qpu', jobs=1)
+        self.assertFalse(tracing.enabled())
+        with open(path) as fp:
+            self.assertEqual(len(json.load(fp)['traceEvents']), 2)
+        self.assertIn('sweep, 1,', stream.getvalue())
+        self.assertIn('qpu: jobs=1', stream.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
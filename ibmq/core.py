@@ -1,7 +1,22 @@
-from qiskit import QuantumProgram
+from qiskit import QuantumProgram, available_backends, execute, get_backend
 
+from common import tracing
+from common.cache import cache_key, cached_counts
+from common.optimizer import optimize, quantum_beats_gates
+from common.radical_pair import to_qiskit
+from common.sessions import default_manager
+
+
+def create_quantum_program_to_simulate_quantum_beats(lambda_angle, name='qc', optimized=False):
+    """ Quantum beats circuit for one phase angle
+
+    Give circuits that are executed in one job different names, results are looked up by circuit name.
+    With optimized=True the circuit is first run through common.optimizer, which fuses the time step
+    into the basis change and needs 2 instead of 5 CNOTs. Its two qubit block is fitted once for all angles.
+    """
+    if optimized:
+        return to_qiskit(optimize(quantum_beats_gates(lambda_angle), 'ibmq'), 2, name)
 
-def create_quantum_program_to_simulate_quantum_beats(lambda_angle):
     # create QuantumProgram object instance.
     qp = QuantumProgram()
 
@@ -12,9 +27,9 @@ def create_quantum_program_to_simulate_quantum_beats(lambda_angle):
     classical_r = qp.create_classical_register('cr', 2)
 
     # Creating Circuits
-    # create Quantum Circuit called "qc" involving Quantum Register "qr"
+    # create Quantum Circuit called name involving Quantum Register "qr"
     # and lassical Register "cr"
-    circuit = qp.create_circuit('qc', [qr], [classical_r])
+    circuit = qp.create_circuit(name, [qr], [classical_r])
 
     # Put system into singlet state
     circuit.x(qr[0])
@@ -64,4 +79,71 @@ def create_quantum_program_to_simulate_quantum_beats(lambda_angle):
 
     circuit.measure(qr[0], classical_r[0])
     circuit.measure(qr[1], classical_r[1])
-    return circuit
\ No newline at end of file
+    return circuit
+
+
+def create_quantum_programs_to_simulate_quantum_beats(angles, optimized=False):
+    """ Quantum beats circuits for all angles, named qc_0, qc_1, ... so they can run as one job """
+    return [create_quantum_program_to_simulate_quantum_beats(angle, 'qc_%s' % i, optimized)
+            for i, angle in enumerate(angles)]
+
+
+def backend_names(manager=None):
+    """ Names of the available backends, asked for once per time to live of manager (common/sessions.py) """
+    manager = manager if manager is not None else default_manager()
+    return manager.metadata('ibmq available backends', available_backends)
+
+
+def backend_calibration(backend):
+    """ Calibration and parameters of a device backend, which key its results in the cache (common/cache.py) """
+    return get_backend(backend)
+
+
+class Batch(object):
+    """ Jobs of submit_batch() that are still running, collect_batch() waits for their counts """
+
+    def __init__(self, circuits, backend, shots, cache, device, jobs):
+        self.circuits = circuits
+        self.backend = backend
+        self.shots = shots
+        self.cache = cache
+        self.device = device
+        self.jobs = jobs
+
+
+def submit_batch(circuits, backend, shots=1024, max_experiments=None, cache=None, device=None):
+    """ Submits every circuit that is not in cache to backend and returns the Batch of its jobs without waiting
+
+    All circuits go to the backend as multi-experiment jobs of at most max_experiments circuits
+    (one job for all circuits by default), so the queue and handshake overhead is paid once per job
+    instead of once per circuit. Circuits that are already in cache are not executed again;
+    for a device pass its calibration as device (backend_calibration()), so counts are not reused once it changed.
+    Submit the batches of all backends before collecting the first one, so they run at the same time.
+    """
+    pending = [circuit for circuit in circuits
+               if cache is None or cache.get(cache_key(circuit, backend, shots, device=device)) is None]
+    size = max_experiments or max(len(pending), 1)
+    with tracing.span('execute_batch.submit', backend=backend, circuits=len(pending)):
+        jobs = [(pending[start:start + size], execute(pending[start:start + size], backend, shots=shots))
+                for start in range(0, len(pending), size)]
+    tracing.count("%s" % backend, jobs=len(jobs), experiments=len(pending), shots=shots * len(pending),
+                  cache_hits=len(circuits) - len(pending))
+    return Batch(circuits, backend, shots, cache, device, jobs)
+
+
+def collect_batch(batch):
+    """ Counts of every circuit of batch, in the order of its circuits, waiting for its jobs """
+    counts = {}
+    with tracing.span('execute_batch.wait', backend=batch.backend, jobs=len(batch.jobs)):
+        for chunk, job in batch.jobs:
+            result = job.result()
+            for circuit in chunk:
+                counts[circuit.name] = result.get_counts(circuit)
+    return [cached_counts(batch.cache, lambda circuit=circuit: counts[circuit.name], circuit, batch.backend,
+                          batch.shots, device=batch.device)
+            for circuit in batch.circuits]
+
+
+def execute_batch(circuits, backend, shots=1024, max_experiments=None, cache=None, device=None):
+    """ Counts of every circuit, in the order of circuits, see submit_batch() """
+    return collect_batch(submit_batch(circuits, backend, shots, max_experiments, cache, device))
@@ -1,9 +1,23 @@
 import numpy as np
-from qiskit import QuantumCircuit, ClassicalRegister, QuantumRegister
+from qiskit import Aer, QuantumCircuit, ClassicalRegister, QuantumRegister
 from qiskit import execute
 
+from common import tracing
+from common.sessions import default_manager
+
+
+def _parametric_api():
+    """ (Parameter, transpile, assemble) of qiskit-terra 0.8 and later, None for older versions """
+    try:
+        from qiskit import transpile, assemble
+        from qiskit.circuit import Parameter
+    except ImportError:
+        return None
+    return Parameter, transpile, assemble
+
 
 def create_quantum_circuit_to_simulate_quantum_beats(lambda_angle):
+    """ Quantum beats circuit for one phase angle, lambda_angle may also be a Parameter """
 
     # Creating Registers
     # create Quantum Register called "qr" with 2 qubits
@@ -68,4 +82,53 @@ def create_quantum_circuit_to_simulate_quantum_beats(lambda_angle):
     #circuit.measure(qr[0], classical_r[0])
     #circuit.measure(qr[1], classical_r[1])
     circuit.measure(qr,classical_r)
-    return circuit
\ No newline at end of file
+    return circuit
+
+
+def create_parametric_quantum_circuit_to_simulate_quantum_beats():
+    """ Quantum beats circuit with a symbolic u1 angle, returns (circuit, angle parameter)
+
+    Circuit parameters need qiskit-terra 0.8 or later, raises ImportError for older versions.
+    """
+    api = _parametric_api()
+    if api is None:
+        raise ImportError("Parametric circuits need qiskit-terra 0.8 or later, "
+                          "use create_quantum_circuit_to_simulate_quantum_beats(angle) per angle instead")
+    Parameter, _, _ = api
+    lambda_angle = Parameter('lambda')
+    return create_quantum_circuit_to_simulate_quantum_beats(lambda_angle), lambda_angle
+
+
+def get_backend(name, manager=None):
+    """ Aer backend of name, looked up once in manager (common/sessions.py) """
+    manager = manager if manager is not None else default_manager()
+    return manager.connection(('aer', name), lambda: Aer.get_backend(name))
+
+
+def run_quantum_beats_sweep(angles, backend, shots=1024):
+    """ Counts of the quantum beats circuit for every angle, in the order of angles
+
+    The circuit is built and transpiled for backend once, the angles are bound when the circuits
+    are assembled and the whole sweep runs as one job. With qiskit-terra older than 0.8, which has no circuit
+    parameters, a circuit is built per angle and they run as one job with execute().
+    """
+    name = "%s" % backend
+    api = _parametric_api()
+    if api is None:
+        with tracing.span('build_circuits', backend=name, circuits=len(angles)):
+            circuits = [create_quantum_circuit_to_simulate_quantum_beats(angle) for angle in angles]
+        with tracing.span('run', backend=name, circuits=len(angles)):
+            result = execute(circuits, backend, shots=shots).result()
+        tracing.count(name, jobs=1, experiments=len(angles), shots=shots * len(angles))
+        return [result.get_counts(circuit) for circuit in circuits]
+    _, transpile, assemble = api
+    circuit, lambda_angle = create_parametric_quantum_circuit_to_simulate_quantum_beats()
+    with tracing.span('transpile', backend=name):
+        transpiled = transpile(circuit, backend=backend)
+    with tracing.span('assemble', backend=name, circuits=len(angles)):
+        qobj = assemble(transpiled, backend=backend, shots=shots,
+                        parameter_binds=[{lambda_angle: angle} for angle in angles])
+    with tracing.span('run', backend=name, circuits=len(angles)):
+        result = backend.run(qobj).result()
+    tracing.count(name, jobs=1, experiments=len(angles), shots=shots * len(angles))
+    return [result.get_counts(i) for i in range(len(angles))]
@@ -1,6 +1,11 @@
-from qiskit import available_backends, execute
+from common import tracing
+from common.cache import ResultCache
+from common.sweep import phase_angles
+from ibmq.core import (backend_calibration, backend_names, collect_batch,
+                       create_quantum_programs_to_simulate_quantum_beats, submit_batch)
 
-from ibmq.core import create_quantum_program_to_simulate_quantum_beats
+# Shots are random draws, reusing cached ones repeats one draw: set to True to reuse the counts of earlier runs
+USE_CACHE = False
 
 if __name__ == "__main__":
     from qiskit import register
@@ -12,24 +17,29 @@ if __name__ == "__main__":
              project=Qconfig.config["project"])
 
     # circuit = create_quantum_program_to_simulate_quantum_beats(math.pi / 2)
-    w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-    print(available_backends())
-    for t in range(0, 30):
-        circuit = create_quantum_program_to_simulate_quantum_beats(w_larmor * t)
-        if 'ibmqx4' not in available_backends():
-            raise RuntimeError("Can't execute the program on ibmqx4")
+    with tracing.span('available_backends'):
+        backends = backend_names()
+    print(backends)
+    if 'ibmqx4' not in backends:
+        raise RuntimeError("Can't execute the program on ibmqx4")
 
-        # Execute on a quantum device
-        job_real = execute(circuit, "ibmqx4")
-        result_real = job_real.result()
-        # Execute on simulator
-        job_sim = execute(circuit, "local_qasm_simulator")
-        result_sim = job_sim.result()
-        singlet_sim = result_sim.get_counts(circuit).get('01', 0)
-        triplet_sim = result_sim.get_counts(circuit).get('10', 0)
-        singlet = result_real.get_counts(circuit).get('01', 0)
-        triplet = result_real.get_counts(circuit).get('10', 0)
-        state00 = result_real.get_counts(circuit).get('00', 0)
-        state11 = result_real.get_counts(circuit).get('11', 0)
+    timesteps = range(0, 30)
+    with tracing.span('build_programs', timesteps=len(timesteps)):
+        circuits = create_quantum_programs_to_simulate_quantum_beats(phase_angles(timesteps))
+    # With USE_CACHE results of earlier runs of the same circuit, on the same calibration of the device,
+    # are read from the on-disk cache, all other circuits run as one job per backend
+    cache = ResultCache() if USE_CACHE else None
+    # Submit to the quantum device and the simulator before waiting for either, so both run at the same time
+    batch_real = submit_batch(circuits, "ibmqx4", 1024, cache=cache, device=backend_calibration("ibmqx4"))
+    batch_sim = submit_batch(circuits, "local_qasm_simulator", 1024, cache=cache)
+    counts_sim = collect_batch(batch_sim)
+    counts_real = collect_batch(batch_real)
+    for t, real, sim in zip(timesteps, counts_real, counts_sim):
+        singlet_sim = sim.get('01', 0)
+        triplet_sim = sim.get('10', 0)
+        singlet = real.get('01', 0)
+        triplet = real.get('10', 0)
+        state00 = real.get('00', 0)
+        state11 = real.get('11', 0)
         # print("Result: %s, %s" % (t, result_real))
         print("%s, %s, %s, %s, %s, %s, %s" % (t, singlet_sim, triplet_sim, singlet, triplet, state00, state11))
@@ -1,5 +1,7 @@
 import math
 from qiskit import execute
+from common import tracing
+from common.sweep import W_LARMOR
 from ibmq.core import create_quantum_program_to_simulate_quantum_beats
 
 
@@ -16,11 +18,11 @@ if __name__ == "__main__":
     # print(sim_result.get_counts(circuit)['10'])
 
     for t in range(0, 30):
-        w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-
-        circuit = create_quantum_program_to_simulate_quantum_beats(w_larmor * t)
-        job_sim = execute(circuit, "local_qasm_simulator")
-        sim_result = job_sim.result()
+        with tracing.span('execute', backend="local_qasm_simulator", t=t):
+            circuit = create_quantum_program_to_simulate_quantum_beats(W_LARMOR * t)
+            job_sim = execute(circuit, "local_qasm_simulator")
+            sim_result = job_sim.result()
+        tracing.count("local_qasm_simulator", jobs=1, experiments=1, shots=1024)
         singlet = sim_result.get_counts(circuit).get('01', 0)
         triplet = sim_result.get_counts(circuit).get('10', 0)
         print("%s, %s, %s" % (t, singlet, triplet))
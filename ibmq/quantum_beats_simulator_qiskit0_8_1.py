@@ -1,6 +1,7 @@
 import math
-from qiskit import Aer, execute
-from ibmq.core_qiskit0_8_1 import create_quantum_circuit_to_simulate_quantum_beats
+from qiskit import execute
+from common.sweep import phase_angles
+from ibmq.core_qiskit0_8_1 import create_quantum_circuit_to_simulate_quantum_beats, get_backend, run_quantum_beats_sweep
 
 
 if __name__ == "__main__":
@@ -15,14 +16,11 @@ if __name__ == "__main__":
     # print(sim_result.get_counts(circuit)['01'])
     # print(sim_result.get_counts(circuit)['10'])
 
-    for t in range(0, 30):
-        w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-
-        circuit = create_quantum_circuit_to_simulate_quantum_beats(w_larmor * t)
-        #job_sim = execute(circuit, "local_qasm_simulator")
-        simulator = Aer.get_backend('qasm_simulator')
-        #sim_result = job_sim.result()
-        sim_result = execute(circuit, simulator).result()
-        singlet = sim_result.get_counts(circuit).get('01', 0)
-        triplet = sim_result.get_counts(circuit).get('10', 0)
+    timesteps = range(0, 30)
+    simulator = get_backend('qasm_simulator')
+    # One transpiled circuit, all angles bound and simulated in one job
+    all_counts = run_quantum_beats_sweep(phase_angles(timesteps), simulator)
+    for t, counts in zip(timesteps, all_counts):
+        singlet = counts.get('01', 0)
+        triplet = counts.get('10', 0)
         print("%s, %s, %s" % (t, singlet, triplet))
@@ -0,0 +1,198 @@
+""" One command for the quantum beats sweep on every backend
+
+    python quantum_beats.py local --stop 30 --step 0.1
+    python quantum_beats.py rigetti-qvm --shots 1000 --output results/qvm
+    python quantum_beats.py aer --output sweep.csv
+
+Every backend runs the same sweep: the circuits of the existing builders (ibmq/core.py, ibmq/core_qiskit0_8_1.py and
+the Rigetti QVM script) for every point of the time grid, and prints or stores the outcome counts next to the exact
+singlet probability. Backend SDKs are only imported once their backend is selected, so the local backend needs
+neither pyquil nor qiskit and starts without loading them.
+
+--output picks the sink: '-' (the default) prints CSV lines, a file name ending in .csv writes them to that file,
+anything else is a results directory (common/results.py) and the CSV lines are also printed.
+With --cache results of remote backends are kept in the on-disk cache (common/cache.py), results of a device keyed by
+its calibration. Shots are random draws, so without --cache every run draws them again.
+The scripts in rigetti/ and ibmq/ remain for their richer sweeps (repeats, noise columns, readout mitigation).
+"""
+import argparse
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+DEFAULT_SHOTS = 1024
+DEFAULT_DEVICE = '8Q-Agave'
+# Outcome labels in index order, classical register 0 as the least significant bit (rigetti/counting.py)
+OUTCOMES = ('00', '01', '10', '11')
+
+
+def _cache(args):
+    from common.cache import ResultCache
+    return ResultCache() if args.cache else None
+
+
+def _ibmq_counts(counts):
+    """ (T, 4) array of qiskit count dictionaries, qiskit's bit strings put classical bit 0 last too """
+    import numpy as np
+    return np.array([[point.get(outcome, 0) for outcome in OUTCOMES] for point in counts], dtype=np.int64)
+
+
+def run_local(angles, args):
+    """ Multinomial draws from the exact outcome probabilities """
+    from common.sampling import sample_counts
+    from common.sweep import ideal_probabilities
+    return sample_counts(ideal_probabilities(angles), args.shots, random_state=args.seed)
+
+
+def _run_rigetti(connection_name, backend, cache_label, calibrated=False):
+    def run_backend(angles, args):
+        import numpy as np
+        from functools import partial
+        from common.cache import cached_shots
+        from rigetti.counting import distribution
+        from rigetti.executor import Job, run_sweep, silenced
+        from rigetti.quantum_beats_rigetti_qvm import bind_phase_angle, create_parametric_quantum_beats_program
+        from rigetti.sessions import ForestSession
+
+        session = ForestSession(args.device)
+        connection = getattr(session, connection_name)
+        cache = _cache(args)
+        # Results of the device and its noise model are only reused for the same calibration
+        device = session.device if calibrated and cache is not None else None
+        template = create_parametric_quantum_beats_program()
+        jobs = []
+        for step, angle in enumerate(angles):
+            p = bind_phase_angle(template, angle)
+            p.measure(0, 0)
+            p.measure(1, 1)
+            # The QPU connection prints its progress, keep the CSV lines clean
+            run = partial(silenced(connection.run), p, trials=args.shots)
+            label = cache_label % {'device': args.device}
+            jobs.append(Job(step, backend, 0, partial(cached_shots, cache, run, p, label, args.shots, device=device)))
+        results = run_sweep(jobs)
+        return np.array([distribution(results[step, backend, 0], 2).counts for step in range(len(angles))])
+    return run_backend
+
+
+def _run_ibmq(backend, registered=False):
+    def run_backend(angles, args):
+        from ibmq.core import (backend_calibration, backend_names, create_quantum_programs_to_simulate_quantum_beats,
+                               execute_batch)
+        cache = _cache(args)
+        device = None
+        if registered:
+            _register_ibmq()
+            if backend not in backend_names():
+                raise RuntimeError("Can't execute the program on %s" % backend)
+            if cache is not None:
+                device = backend_calibration(backend)
+        circuits = create_quantum_programs_to_simulate_quantum_beats(angles, args.optimized)
+        return _ibmq_counts(execute_batch(circuits, backend, args.shots, cache=cache, device=device))
+    return run_backend
+
+
+def _register_ibmq():
+    """ Registers the IBM Q account of ibmq/Qconfig.py (see README.md) """
+    import os
+    from qiskit import register
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ibmq"))
+    import Qconfig
+    register(Qconfig.APItoken, Qconfig.config["url"],
+             hub=Qconfig.config["hub"],
+             group=Qconfig.config["group"],
+             project=Qconfig.config["project"])
+
+
+def run_aer(angles, args):
+    """ Qiskit 0.8 Aer simulator, the whole sweep as one parametric job """
+    from ibmq.core_qiskit0_8_1 import get_backend, run_quantum_beats_sweep
+    return _ibmq_counts(run_quantum_beats_sweep(angles, get_backend('qasm_simulator'), args.shots))
+
+
+# Backend name -> (run(angles, args) returning (T, 4) outcome counts, description)
+BACKENDS = OrderedDict([
+    ('local', (run_local, "exact probabilities sampled locally, no SDK needed")),
+    ('rigetti-qvm', (_run_rigetti('qvm', 'qvm', 'QVM'), "perfect Rigetti QVM (pyquil 1.9)")),
+    ('rigetti-qvm-noisy', (_run_rigetti('qvm_noisy', 'qvm_noisy', '%(device)s QVM', calibrated=True),
+                           "Rigetti QVM with the noise of --device (pyquil 1.9)")),
+    ('rigetti-qpu', (_run_rigetti('qpu', 'qpu', '%(device)s', calibrated=True), "Rigetti QPU --device (pyquil 1.9)")),
+    ('ibmq-simulator', (_run_ibmq('local_qasm_simulator'), "IBM Q local simulator (qiskit 0.5)")),
+    ('ibmqx4', (_run_ibmq('ibmqx4', registered=True), "IBM Q ibmqx4 device, needs ibmq/Qconfig.py (qiskit 0.5)")),
+    ('aer', (run_aer, "Qiskit Aer qasm simulator (qiskit 0.8)")),
+])
+
+
+def columns(backend):
+    from common.results import Column
+    return [
+        Column('t', 'f8', label="Timestamp"),
+        Column('singlet_wavefunction', 'f8', label="Singlet (Wavefunction)"),
+        Column('singlet', 'i8', label="Singlet (%s)" % backend),
+        Column('triplet', 'i8', label="Triplet (%s)" % backend),
+        Column('state00', 'i8', label="00 (%s)" % backend),
+        Column('state11', 'i8', label="11 (%s)" % backend),
+    ]
+
+
+@contextmanager
+def _writer(output, columns):
+    from common.results import CsvWriter, ResultWriter
+    if output == '-':
+        with CsvWriter(sys.stdout, columns) as writer:
+            yield writer
+    elif output.endswith('.csv'):
+        with open(output, 'w') as fp, CsvWriter(fp, columns) as writer:
+            yield writer
+    else:
+        with ResultWriter(output, columns, echo=sys.stdout) as writer:
+            yield writer
+
+
+def run(args):
+    """ Runs the sweep of args on its backend and writes it to args.output """
+    import numpy as np
+    from common import tracing
+    from common.sweep import SINGLET, W_LARMOR, ideal_probabilities, phase_angles
+
+    timesteps = np.arange(args.start, args.stop, args.step)
+    angles = phase_angles(timesteps, W_LARMOR if args.w_larmor is None else args.w_larmor)
+    function, _ = BACKENDS[args.backend]
+    with tracing.span('quantum_beats.%s' % args.backend, timesteps=len(timesteps), shots=args.shots):
+        counts = function(angles, args)
+    singlet = ideal_probabilities(angles)[:, SINGLET]
+    with _writer(args.output, columns(args.backend)) as writer:
+        for step, t in enumerate(timesteps):
+            # Index order: 00, 01 (singlet), 10 (triplet), 11
+            state00, singlet_counts, triplet_counts, state11 = counts[step]
+            writer.append(t=t, singlet_wavefunction=singlet[step], singlet=singlet_counts, triplet=triplet_counts,
+                          state00=state00, state11=state11)
+    return counts
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog='quantum-beats', description="Quantum beats sweep on a simulator or quantum computer",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="backends:\n" + "\n".join("  %-18s %s" % (name, description)
+                                         for name, (_, description) in BACKENDS.items()))
+    parser.add_argument('backend', choices=list(BACKENDS), metavar='backend', help="where to run, see below")
+    parser.add_argument('--start', type=float, default=0.0, help="first timestep (ns), default 0")
+    parser.add_argument('--stop', type=float, default=30.0, help="end of the time grid (ns, excluded), default 30")
+    parser.add_argument('--step', type=float, default=1.0, help="spacing of the time grid (ns), default 1")
+    parser.add_argument('--w-larmor', type=float, help="Larmor frequency (1/ns), W_LARMOR of common/sweep.py")
+    parser.add_argument('--shots', type=int, default=DEFAULT_SHOTS, help="shots per timestep")
+    parser.add_argument('--output', default='-', help="'-' for CSV on stdout, a .csv file or a results directory")
+    parser.add_argument('--seed', type=int, help="seed of the local backend")
+    parser.add_argument('--device', default=DEFAULT_DEVICE, help="Rigetti device")
+    parser.add_argument('--optimized', action='store_true', help="run optimized circuits (IBM Q, common/optimizer.py)")
+    parser.add_argument('--cache', action='store_true', help="reuse results of earlier runs from the on-disk cache")
+    return parser
+
+
+def main(argv=None):
+    return run(parser().parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import numpy as np
+from common.results import read_results
+from quantum_beats import main, parser
+
+
+# A sys.meta_path finder that refuses to import the SDKs, so tests do not pass just because they are not installed
+BLOCK_SDKS = '''
+import sys
+
+
+class SdkBlocker(object):
+
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in ('pyquil', 'qiskit'):
+            raise ImportError("%s imported by the local backend" % name)
+        return None
+
+
+sys.meta_path.insert(0, SdkBlocker())
+'''
+
+
+def run_without_sdks(code):
+    return subprocess.run([sys.executable, '-c', BLOCK_SDKS + code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+class QuantumBeatsCommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_local_csv(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            counts = main(['local', '--stop', '3', '--shots', '100', '--seed', '1'])
+        header, *lines = stdout.getvalue().splitlines()
+        self.assertEqual(header, "Timestamp, Singlet (Wavefunction), Singlet (local), Triplet (local), "
+                                 "00 (local), 11 (local)")
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0], "0.0, 1.0, 100, 0, 0, 0")
+        np.testing.assert_array_equal(counts.sum(axis=1), 100)
+
+    def test_outputs(self):
+        path = os.path.join(self.directory, 'sweep.csv')
+        results = os.path.join(self.directory, 'sweep')
+        with redirect_stdout(io.StringIO()):
+            main(['local', '--step', '0.5', '--seed', '2', '--output', path])
+            main(['local', '--step', '0.5', '--seed', '2', '--output', results])
+        with open(path) as fp:
+            self.assertEqual(len(fp.read().splitlines()), 61)
+        stored = read_results(results)
+        np.testing.assert_array_equal(stored['t'], np.arange(0, 30, 0.5))
+        np.testing.assert_array_equal(stored['singlet'] + stored['triplet'], 1024)
+
+    def test_unknown_backend(self):
+        with redirect_stdout(io.StringIO()), self.assertRaises(SystemExit):
+            parser().parse_args(['ibmqx5'])
+
+    def test_local_backend_imports_no_sdk(self):
+        process = run_without_sdks("import quantum_beats; quantum_beats.main(['local', '--stop', '2'])")
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(len(process.stdout.splitlines()), 3)
+
+    def test_sdk_imports_are_blocked(self):
+        process = run_without_sdks("import qiskit")
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn("qiskit imported by the local backend", process.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
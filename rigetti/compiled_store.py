@@ -0,0 +1,138 @@
+""" Store of compiled Quil programs, reused across runs
+
+Compiled programs are kept in a SQLite database indexed by hashes of the source program
+and of the ISA of the target device, together with the compiler metrics of the compilation,
+so a program is compiled only once per device and the metrics can be queried later.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from common import tracing
+from common.cache import DEFAULT_DIRECTORY, program_text
+from rigetti.executor import silence_stdout
+
+
+DEFAULT_PATH = os.path.join(DEFAULT_DIRECTORY, "compiled_quil.sqlite")
+
+# Compiler metrics, as reported by the compiler job
+METRICS = ('gate_depth', 'gate_volume', 'multiqubit_gate_depth', 'program_fidelity', 'topological_swaps')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compiled_programs (
+    source_hash TEXT NOT NULL,
+    isa_hash TEXT NOT NULL,
+    device TEXT,
+    source TEXT NOT NULL,
+    compiled_quil TEXT NOT NULL,
+    gate_depth INTEGER,
+    gate_volume INTEGER,
+    multiqubit_gate_depth INTEGER,
+    program_fidelity REAL,
+    topological_swaps INTEGER,
+    created REAL NOT NULL,
+    PRIMARY KEY (source_hash, isa_hash)
+)
+"""
+
+
+def compile_program(compiler, program):
+    """ Compiles a program for the compiler's device and returns the finished job """
+    job_id = compiler.compile_async(program)
+    # wait_for_job has print statement
+    with silence_stdout():
+        return compiler.wait_for_job(job_id)
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def isa_hash(isa):
+    """ Hash of a device ISA, given as a pyquil ISA or its dict """
+    if hasattr(isa, 'to_dict'):
+        isa = isa.to_dict()
+    return _hash(json.dumps(isa, sort_keys=True))
+
+
+def job_metrics(job):
+    """ Compiler metrics of a finished compiler job, None for metrics the job does not report """
+    metrics = {}
+    for name in METRICS:
+        try:
+            metrics[name] = getattr(job, name)()
+        except (AttributeError, KeyError, TypeError):
+            metrics[name] = None
+    return metrics
+
+
+class CompiledStore(object):
+    """ Compiled programs indexed by (source program hash, target device ISA hash) """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if path != ':memory:' and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Compilations may run on the threads of the sweep executor
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute(SCHEMA)
+
+    def get(self, program, isa):
+        """ Stored record of program compiled for isa as a dict, or None """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM compiled_programs WHERE source_hash = ? AND isa_hash = ?",
+                (_hash(program_text(program)), isa_hash(isa))).fetchone()
+        return dict(row) if row is not None else None
+
+    def put(self, program, isa, compiled_quil, metrics=None, device=None):
+        """ Stores the compiled program and its compiler metrics """
+        source = program_text(program)
+        metrics = metrics or {}
+        values = [_hash(source), isa_hash(isa), device, source, "%s" % compiled_quil]
+        values += [metrics.get(name) for name in METRICS]
+        values.append(time.time())
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO compiled_programs VALUES (%s)" % ", ".join("?" * len(values)), values)
+
+    def compile(self, compiler, program, isa, device=None):
+        """ Compiled Quil of program, from the store or compiled with compiler and stored """
+        record = self.get(program, isa)
+        if record is None:
+            with tracing.span('compile', device=device):
+                job = compile_program(compiler, program)
+            tracing.count('compiler', compilations=1)
+            self.put(program, isa, job.compiled_quil(), job_metrics(job), device)
+            record = self.get(program, isa)
+        else:
+            tracing.count('compiler', store_hits=1)
+        return record['compiled_quil']
+
+    def records(self, device=None):
+        """ All stored records as dicts, oldest first, optionally only the ones of a device """
+        query = "SELECT * FROM compiled_programs"
+        params = ()
+        if device is not None:
+            query += " WHERE device = ?"
+            params = (device,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY created", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    # Print the compiler metrics of everything compiled so far
+    print("Device, Created, " + ", ".join(METRICS))
+    for record in CompiledStore().records():
+        print("%s, %s, %s" % (record['device'], time.ctime(record['created']),
+                              ", ".join("%s" % record[name] for name in METRICS)))
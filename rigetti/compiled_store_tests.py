@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from .compiled_store import METRICS, CompiledStore, isa_hash
+
+
+AGAVE_ISA = {'1Q': {'0': {}, '1': {}}, '2Q': {'0-1': {}}}
+ACORN_ISA = {'1Q': {'0': {}, '1': {}, '5': {}}, '2Q': {'0-5': {}}}
+
+
+class FakeJob(object):
+
+    def __init__(self, program):
+        self.program = program
+
+    def compiled_quil(self):
+        return "RX(pi/2) 0\n# compiled from %s" % self.program.splitlines()[0]
+
+    def gate_depth(self):
+        return 3
+
+    def gate_volume(self):
+        return 5
+
+    def multiqubit_gate_depth(self):
+        return 1
+
+    def program_fidelity(self):
+        return 0.97
+
+    # No topological_swaps, as with older compiler versions
+
+
+class FakeCompiler(object):
+    """ Compiler with the compile_async and wait_for_job calls of pyquil's CompilerConnection """
+
+    def __init__(self):
+        self.compiled = []
+
+    def compile_async(self, program):
+        self.compiled.append(program)
+        return len(self.compiled) - 1
+
+    def wait_for_job(self, job_id):
+        return FakeJob(self.compiled[job_id])
+
+
+class CompiledStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "compiled_quil.sqlite")
+        self.compiler = FakeCompiler()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compiled_once(self):
+        store = CompiledStore(':memory:')
+        first = store.compile(self.compiler, "H 0\nCNOT 0 1", AGAVE_ISA, '8Q-Agave')
+        # Same program up to trailing whitespace
+        second = store.compile(self.compiler, "H 0\nCNOT 0 1\n", AGAVE_ISA, '8Q-Agave')
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.compiler.compiled), 1)
+        store.close()
+
+    def test_isa_is_part_of_the_key(self):
+        store = CompiledStore(':memory:')
+        store.compile(self.compiler, "H 0", AGAVE_ISA, '8Q-Agave')
+        store.compile(self.compiler, "H 0", ACORN_ISA, '19Q-Acorn')
+        self.assertEqual(len(self.compiler.compiled), 2)
+        self.assertNotEqual(isa_hash(AGAVE_ISA), isa_hash(ACORN_ISA))
+        self.assertEqual([record['device'] for record in store.records('19Q-Acorn')], ['19Q-Acorn'])
+        self.assertIsNone(store.get("X 0", AGAVE_ISA))
+        store.close()
+
+    def test_persistent(self):
+        store = CompiledStore(self.path)
+        compiled = store.compile(self.compiler, "H 0", AGAVE_ISA, '8Q-Agave')
+        store.close()
+        store = CompiledStore(self.path)
+        self.assertEqual(store.compile(FakeCompiler(), "H 0", AGAVE_ISA, '8Q-Agave'), compiled)
+        self.assertEqual(len(store.records()), 1)
+        store.close()
+
+    def test_metrics(self):
+        store = CompiledStore(':memory:')
+        store.compile(self.compiler, "H 0", AGAVE_ISA, '8Q-Agave')
+        record = store.get("H 0", AGAVE_ISA)
+        self.assertEqual(dict((name, record[name]) for name in METRICS),
+                         {'gate_depth': 3, 'gate_volume': 5, 'multiqubit_gate_depth': 1, 'program_fidelity': 0.97,
+                          'topological_swaps': None})
+        self.assertEqual(record['source'], "H 0")
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+""" Vectorized counting of measurement results
+
+Measured bits are packed into integers with classical register 0 as the least significant bit,
+the same way the Rigetti QVM enumerates basis states. Counts are kept in that fixed order.
+http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+"""
+import numpy as np
+
+# Drawing counts from probabilities does not depend on the backend, it lives in common/
+from common.sampling import sample_counts
+
+
+def pack_bits(data, n_bits=None):
+    """ Packs every shot of (shots, n_bits) measured bits into one integer """
+    bits = np.asarray(data, dtype=np.uint8)
+    if n_bits is None:
+        n_bits = bits.shape[-1] if bits.ndim > 1 else 1
+    bits = bits.reshape(-1, n_bits)
+    weights = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+    return bits.dot(weights)
+
+
+def histogram(packed, n_bits):
+    """ Counts of every outcome in index order, from packed shots """
+    return np.bincount(np.asarray(packed, dtype=np.int64).ravel(), minlength=2 ** n_bits)
+
+
+class Distribution(object):
+    """ Counts of measured outcomes in index order
+
+    Outcomes can be looked up by index, by tuple of bits as returned by QVMConnection.run, e.g. (1, 0),
+    or by bitstring in Rigetti notation, e.g. '01', where qubit 0 is the rightmost bit.
+    Outcomes that were never measured count as 0.
+    """
+
+    def __init__(self, counts):
+        self.counts = np.asarray(counts)
+        self.n_bits = int(len(self.counts)).bit_length() - 1
+
+    def index(self, outcome):
+        """ Position of an outcome in the counts array """
+        if isinstance(outcome, str):
+            index = int(outcome, 2)
+        elif isinstance(outcome, tuple):
+            if len(outcome) != self.n_bits:
+                raise KeyError(outcome)
+            index = sum(int(bit) << i for i, bit in enumerate(outcome))
+        else:
+            index = int(outcome)
+        if not 0 <= index < len(self.counts):
+            raise KeyError(outcome)
+        return index
+
+    def __getitem__(self, outcome):
+        return self.counts[self.index(outcome)]
+
+    def get(self, outcome, default=0):
+        try:
+            return self[outcome]
+        except (KeyError, ValueError):
+            return default
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def shots(self):
+        return int(self.counts.sum())
+
+    def items(self):
+        """ (bits, count) pairs of the outcomes that were measured, bits as a tuple like in QVMConnection.run """
+        return [(tuple((int(index) >> i) & 1 for i in range(self.n_bits)), int(self.counts[index]))
+                for index in np.flatnonzero(self.counts)]
+
+    def __repr__(self):
+        return "{%s}" % ", ".join("%s: %s" % (bits, count) for bits, count in self.items())
+
+
+def distribution(data, n_bits=None):
+    """ Distribution of measurement of quantum system """
+    bits = np.asarray(data, dtype=np.uint8)
+    if n_bits is None:
+        n_bits = bits.shape[-1] if bits.ndim > 1 else 1
+    return Distribution(histogram(pack_bits(bits, n_bits), n_bits))
+
+
+def sample_distribution(probabilities, shots, random_state=None):
+    """ Distribution of shots measurements drawn from the outcome probabilities of one state """
+    return Distribution(sample_counts(np.ravel(probabilities), shots, random_state))
@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from .counting import pack_bits, histogram, distribution, Distribution, sample_distribution
+
+
+class CountingTest(unittest.TestCase):
+
+    def test_pack_bits(self):
+        # Classical register 0 is the least significant bit
+        np.testing.assert_array_equal(pack_bits([[0, 0], [1, 0], [0, 1], [1, 1]]), [0, 1, 2, 3])
+
+    def test_histogram(self):
+        np.testing.assert_array_equal(histogram([1, 1, 3], 2), [0, 2, 0, 1])
+
+    def test_distribution_lookup(self):
+        data = [[1, 0], [1, 0], [0, 1], [1, 0]]
+        distr = distribution(data)
+        np.testing.assert_array_equal(distr.counts, [0, 3, 1, 0])
+        self.assertEqual(distr[(1, 0)], 3)
+        # Rigetti string notation is reversed: (1, 0) is '01'
+        self.assertEqual(distr['01'], 3)
+        self.assertEqual(distr['10'], 1)
+        self.assertEqual(distr[(1, 1)], 0)
+        self.assertEqual(distr.get((1, 1, 1), -1), -1)
+        self.assertEqual(distr.shots, 4)
+        self.assertEqual(distr.items(), [((1, 0), 3), ((0, 1), 1)])
+
+    def test_matches_dict_counting(self):
+        data = np.random.RandomState(1234).randint(0, 2, size=(10000, 3))
+        expected = {}
+        for result in data:
+            expected[tuple(result)] = expected.get(tuple(result), 0) + 1
+        distr = distribution(data)
+        self.assertEqual(len(distr), 8)
+        for outcome, count in expected.items():
+            self.assertEqual(distr[outcome], count)
+
+    def test_distribution_from_counts(self):
+        distr = Distribution([5, 0, 0, 7])
+        self.assertEqual(distr.n_bits, 2)
+        self.assertEqual(distr['11'], 7)
+
+    def test_sample_distribution(self):
+        distr = sample_distribution([0, 1, 0, 0], 1024, random_state=1234)
+        self.assertEqual(distr[(1, 0)], 1024)
+        self.assertEqual(distr.shots, 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+""" Concurrent execution of sweep jobs on the Rigetti backends
+
+Every backend gets its own lane of worker threads, so jobs of different backends overlap and a sweep
+takes about as long as its slowest lane instead of the sum of all round trips.
+"""
+import sys
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from common import tracing
+
+
+# Number of jobs every backend runs at the same time
+DEFAULT_LIMITS = {
+    'qvm': 4,
+    'qvm_noisy': 4,
+    'compiler': 2,
+    'qpu': 1,
+}
+
+# One job of a sweep: function() run on backend for timestep t,
+# use functools.partial to pass arguments
+Job = namedtuple('Job', ['t', 'backend', 'repeat', 'function'])
+
+
+class _ThreadSilencingStdout(object):
+    """ Stream that drops writes of silenced threads and forwards everything else """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        if getattr(self.local, 'depth', 0):
+            return len(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_install_lock = threading.Lock()
+# Silenced calls running in all threads, sys.stdout is wrapped while there are any
+_active = 0
+
+
+@contextmanager
+def silence_stdout():
+    """ Suppresses print statements of the current thread only
+
+    wait_for_job and qpu.run print progress. Unlike swapping sys.stdout for os.devnull,
+    this is safe when other threads print at the same time.
+    sys.stdout is wrapped by the first silenced call and restored when the last one returns.
+    """
+    global _active
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadSilencingStdout):
+            sys.stdout = _ThreadSilencingStdout(sys.stdout)
+        stream = sys.stdout
+        _active += 1
+    stream.local.depth = getattr(stream.local, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        stream.local.depth -= 1
+        with _install_lock:
+            _active -= 1
+            # Unless sys.stdout was replaced in the meantime
+            if not _active and sys.stdout is stream:
+                sys.stdout = stream.stream
+
+
+def silenced(function):
+    """ Wraps function so it runs with silence_stdout """
+    def wrapper(*args, **kwargs):
+        with silence_stdout():
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _traced(job):
+    """ job.function, recorded as a span of its backend and counted, when tracing is on """
+    if not tracing.enabled():
+        return job.function
+
+    def run():
+        tracing.count(job.backend, jobs=1)
+        try:
+            with tracing.span(job.backend, t=job.t, repeat=job.repeat):
+                return job.function()
+        except Exception:
+            tracing.count(job.backend, errors=1)
+            raise
+    return run
+
+
+def run_sweep(jobs, limits=None):
+    """ Runs sweep jobs concurrently and returns their results in timestep order
+
+    At most limits[backend] jobs of a backend run at the same time (DEFAULT_LIMITS by default,
+    1 for backends without a limit). Returns an OrderedDict {(t, backend, repeat): result}
+    sorted by timestep, with jobs of the same timestep in the order they were given.
+    If a job failed, its exception is raised and the jobs that did not start yet are dropped.
+    """
+    jobs = list(jobs)
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    lanes = dict((backend, ThreadPoolExecutor(max_workers=limits.get(backend, 1)))
+                 for backend in set(job.backend for job in jobs))
+    futures = [(job, lanes[job.backend].submit(_traced(job))) for job in jobs]
+    try:
+        ordered = sorted(enumerate(futures), key=lambda item: (item[1][0].t, item[0]))
+        return OrderedDict(((job.t, job.backend, job.repeat), future.result()) for _, (job, future) in ordered)
+    finally:
+        for _, future in futures:
+            future.cancel()
+        for lane in lanes.values():
+            lane.shutdown(wait=False)
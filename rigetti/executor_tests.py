@@ -0,0 +1,84 @@
+import io
+import sys
+import threading
+import time
+import unittest
+from functools import partial
+from .executor import Job, run_sweep, silence_stdout, silenced
+
+
+class ExecutorTest(unittest.TestCase):
+
+    def test_results_in_timestep_order(self):
+        def work(t, delay):
+            time.sleep(delay)
+            return t
+        # Later timesteps finish first
+        jobs = [Job(t, 'qvm', 0, partial(work, t, 0.01 * (5 - t))) for t in range(5)]
+        jobs += [Job(t, 'qpu', 0, partial(work, -t, 0)) for t in range(5)]
+        results = run_sweep(jobs, limits={'qvm': 5})
+        self.assertEqual(list(results.keys())[:4], [(0, 'qvm', 0), (0, 'qpu', 0), (1, 'qvm', 0), (1, 'qpu', 0)])
+        self.assertEqual(results[3, 'qpu', 0], -3)
+
+    def test_backend_limits(self):
+        running = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.01)
+            with lock:
+                running['now'] -= 1
+
+        run_sweep([Job(t, 'qpu', 0, work) for t in range(6)], limits={'qpu': 2})
+        self.assertEqual(running['max'], 2)
+
+    def test_failure_is_raised(self):
+        def fail():
+            raise RuntimeError("QPU is retuning")
+        with self.assertRaises(RuntimeError):
+            run_sweep([Job(0, 'qpu', 0, fail)])
+
+    def test_silence_stdout_of_one_thread(self):
+        _old_stdout = sys.stdout
+        sys.stdout = captured = io.StringIO()
+        try:
+            thread = threading.Thread(target=silenced(print), args=("silenced",))
+            thread.start()
+            thread.join()
+            print("visible")
+            with silence_stdout():
+                print("silenced")
+            self.assertIs(sys.stdout, captured)
+        finally:
+            sys.stdout = _old_stdout
+        self.assertEqual(captured.getvalue(), "visible\n")
+
+    def test_stdout_restored_after_last_silenced_call(self):
+        _old_stdout = sys.stdout
+        sys.stdout = captured = io.StringIO()
+        started = threading.Event()
+        release = threading.Event()
+
+        def wait():
+            started.set()
+            release.wait()
+        try:
+            thread = threading.Thread(target=silenced(wait))
+            thread.start()
+            started.wait()
+            with silence_stdout():
+                pass
+            # The other thread is still silenced
+            self.assertIsNot(sys.stdout, captured)
+            release.set()
+            thread.join()
+            self.assertIs(sys.stdout, captured)
+        finally:
+            sys.stdout = _old_stdout
+
+
+if __name__ == '__main__':
+    unittest.main()
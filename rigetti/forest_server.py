@@ -0,0 +1,498 @@
+""" Local stand-in for the Rigetti Forest web API
+
+Serves the endpoints that the pyquil 1.9 clients use, backed by the local simulators of this package:
+  - POST /qvm      multishot, multishot-measure and wavefunction requests of QVMConnection
+  - POST /quilc    compile requests of CompilerConnection (programs are returned as they are)
+  - POST /job      asynchronous QVM, QPU and QUILC jobs of QVMConnection, QPUConnection and CompilerConnection
+  - GET /job/<id>  status and result of an asynchronous job
+  - GET /devices   devices for get_devices, with ISA and specs derived from a NoiseModel
+
+Point the clients at it with their endpoint arguments, e.g.
+    QVMConnection(sync_endpoint=server.url, async_endpoint=server.url)
+    get_devices(async_endpoint=server.url)
+
+QVM requests are simulated without noise, PRAGMAs (e.g. the noise pragmas of a QVMConnection with a device) are
+ignored. QPU jobs are simulated with the noise model of their device (rigetti/noise.py).
+Measurements are treated as terminal. Every request goes through a queue per machine, with a number of slots
+like a real backend, and can be delayed by latency and jitter or fail with a failure rate, so the throughput and
+concurrency of the sweep pipeline can be tested and benchmarked without network access.
+"""
+import ast
+import cmath
+import itertools
+import json
+import math
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import numpy as np
+
+from rigetti.noise import NoiseModel, apply_gate_noise, apply_operator, readout_probabilities
+from rigetti.statevector import GATE_MATRICES, PARAMETRIC_GATES, apply_gate
+
+
+DEFAULT_PORT = 5000
+
+# Requests of a machine that are served at the same time, the others wait in its queue
+DEFAULT_SLOTS = {
+    'QVM': 4,
+    'QPU': 1,
+    'QUILC': 2,
+}
+
+DEVICE_QUBITS = 8
+
+
+# Quil
+
+class QuilError(ValueError):
+    """ A program the stand-in cannot parse or simulate """
+
+
+_NUMBER_NODES = tuple(getattr(ast, name) for name in ('Constant', 'Num') if hasattr(ast, name))
+_FUNCTIONS = {'sqrt': cmath.sqrt, 'exp': cmath.exp, 'sin': cmath.sin, 'cos': cmath.cos}
+_CONSTANTS = {'pi': math.pi, 'i': 1j}
+_OPERATORS = {
+    ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b, ast.Pow: lambda a, b: a ** b,
+}
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, _NUMBER_NODES):
+        # ast.Num before Python 3.8
+        value = getattr(node, 'value', getattr(node, 'n', None))
+        if isinstance(value, (int, float, complex)):
+            return value
+    if isinstance(node, ast.Name) and node.id in _CONSTANTS:
+        return _CONSTANTS[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS:
+        return _FUNCTIONS[node.func.id](*[_evaluate(arg) for arg in node.args])
+    raise QuilError("Unsupported expression %s" % ast.dump(node))
+
+
+def parse_number(text):
+    """ Value of a Quil parameter or matrix entry, e.g. '0.46', 'pi/2', '1/sqrt(2)' or '0.5+0.5i' """
+    # Quil writes imaginary numbers as 1.0i
+    text = re.sub(r'(\d)i\b', r'\1j', text.strip())
+    try:
+        value = _evaluate(ast.parse(text, mode='eval'))
+    except SyntaxError:
+        raise QuilError("Cannot parse number %s" % text)
+    return value.real if isinstance(value, complex) and value.imag == 0 else value
+
+
+_GATE = re.compile(r'^([A-Za-z_][\w\-]*)(?:\((.*)\))?((?:\s+\d+)+)$')
+_MEASURE = re.compile(r'^MEASURE\s+(\d+)(?:\s+\[(\d+)\])?$')
+
+
+def parse_quil(text):
+    """ (gates, measurements) of a Quil program
+
+    gates are (name, matrix, qubits) like statevector.program_gates, measurements (qubit, classical address).
+    """
+    defined = {}
+    gates = []
+    measurements = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].split('#')[0].rstrip()
+        i += 1
+        stripped = line.strip()
+        if not stripped or stripped.startswith('PRAGMA') or stripped in ('HALT', 'NOP', 'RESET'):
+            continue
+        if stripped.startswith('DEFGATE'):
+            name = stripped[len('DEFGATE'):].strip().rstrip(':').strip()
+            rows = []
+            while i < len(lines) and lines[i][:1] in (' ', '\t') and lines[i].strip():
+                rows.append([parse_number(entry) for entry in lines[i].split(',')])
+                i += 1
+            defined[name] = np.array(rows, dtype=complex)
+            continue
+        measure = _MEASURE.match(stripped)
+        if measure:
+            qubit, address = measure.groups()
+            if address is not None:
+                measurements.append((int(qubit), int(address)))
+            continue
+        gate = _GATE.match(stripped)
+        if not gate:
+            raise QuilError("Unsupported instruction %s" % stripped)
+        name, params, qubits = gate.groups()
+        qubits = [int(qubit) for qubit in qubits.split()]
+        if name in defined:
+            matrix = defined[name]
+        elif name in PARAMETRIC_GATES and params is not None:
+            matrix = PARAMETRIC_GATES[name](float(np.real(parse_number(params))))
+        elif name in GATE_MATRICES and params is None:
+            matrix = GATE_MATRICES[name]
+        else:
+            raise QuilError("Unknown gate %s" % name)
+        gates.append((name, matrix, qubits))
+    return gates, measurements
+
+
+def _n_qubits(gates, measurements):
+    qubits = [qubit for _, _, gate_qubits in gates for qubit in gate_qubits] + [qubit for qubit, _ in measurements]
+    return max(qubits) + 1 if qubits else 1
+
+
+def simulate(gates, n_qubits, noise_model=None):
+    """ (statevector or None, outcome probabilities) of gates started from |0...0>
+
+    With a noise model the program runs on the density matrix simulator and has no statevector.
+    """
+    if noise_model is None:
+        state = np.zeros((1, 2 ** n_qubits), dtype=complex)
+        state[0, 0] = 1
+        for _, matrix, qubits in gates:
+            state = apply_gate(state, matrix, qubits)
+        return state[0], np.abs(state[0]) ** 2
+    rhos = np.zeros((1, 2 ** n_qubits, 2 ** n_qubits), dtype=complex)
+    rhos[0, 0, 0] = 1
+    for name, matrix, qubits in gates:
+        rhos = apply_gate_noise(apply_operator(rhos, matrix, qubits), name, qubits, noise_model)
+    return None, readout_probabilities(rhos, noise_model)[0]
+
+
+def _memory(outcomes, measurements, size):
+    """ Classical memory of every shot, (shots, size), from the measured basis state indices """
+    memory = np.zeros((len(outcomes), size), dtype=np.uint8)
+    for qubit, address in measurements:
+        memory[:, address] = (outcomes >> qubit) & 1
+    return memory
+
+
+def run_quil(text, addresses, trials, random_state, noise_model=None):
+    """ Bits of the classical addresses for every trial, as returned by QVMConnection.run """
+    gates, measurements = parse_quil(text)
+    _, probabilities = simulate(gates, _n_qubits(gates, measurements), noise_model)
+    outcomes = random_state.choice(len(probabilities), size=trials, p=probabilities / probabilities.sum())
+    size = max([address + 1 for address in addresses] + [address + 1 for _, address in measurements] + [1])
+    return _memory(outcomes, measurements, size)[:, list(addresses)].tolist()
+
+
+def wavefunction_octets(text, addresses, random_state):
+    """ Response of a wavefunction request: the bit packed classical memory, then big endian complex amplitudes """
+    gates, measurements = parse_quil(text)
+    state, probabilities = simulate(gates, _n_qubits(gates, measurements))
+    memory = [0] * len(addresses)
+    if measurements:
+        outcome = random_state.choice(len(probabilities), p=probabilities / probabilities.sum())
+        bits = _memory(np.array([outcome]), measurements, max(address for _, address in measurements) + 1)[0]
+        memory = [int(bits[address]) if address < len(bits) else 0 for address in addresses]
+        # Collapse onto the measured outcome
+        measured = [qubit for qubit, _ in measurements]
+        keep = np.array([all((index >> qubit) & 1 == (outcome >> qubit) & 1 for qubit in measured)
+                         for index in range(len(state))])
+        state = np.where(keep, state, 0)
+        state = state / np.linalg.norm(state)
+    octets = bytearray()
+    for start in range(0, len(memory), 8):
+        octets.append(sum(bit << i for i, bit in enumerate(memory[start:start + 8])))
+    for amplitude in state:
+        octets += struct.pack('>dd', amplitude.real, amplitude.imag)
+    return bytes(octets)
+
+
+# Devices
+
+def device_description(noise_model=None, n_qubits=DEVICE_QUBITS):
+    """ Entry of the /devices response, a ring of n_qubits with the specs of a noise model """
+    noise_model = noise_model or NoiseModel()
+    edges = ["%s-%s" % tuple(sorted((q, (q + 1) % n_qubits))) for q in range(n_qubits)]
+    specs_1q = dict(("%s" % q, {
+        'T1': noise_model.qubit_t1(q), 'T2': noise_model.qubit_t2(q), 'fRO': noise_model.qubit_ro_fidelity(q),
+        # Inverse of NoiseModel.from_device
+        'f1QRB': 1 - noise_model.depolarizing_1q / 2, 'fActiveReset': None,
+    }) for q in range(n_qubits))
+    specs_2q = dict((edge, {'fCZ': 1 - 3 * noise_model.depolarizing_2q / 4, 'fBellState': None,
+                            'fCZ_std_err': None, 'fCPHASE': None}) for edge in edges)
+    return {
+        'isa': {'1Q': dict(("%s" % q, {}) for q in range(n_qubits)), '2Q': dict((edge, {}) for edge in edges)},
+        'specs': {'1Q': specs_1q, '2Q': specs_2q},
+        'noise_model': None,
+        'is_online': True,
+        'is_retuning': False,
+    }
+
+
+def compiler_metadata(text):
+    """ Compiler metrics of a program, as reported by compiler jobs """
+    gates, _ = parse_quil(text)
+    levels, multiqubit_levels = {}, {}
+    for _, _, qubits in gates:
+        level = max(levels.get(qubit, 0) for qubit in qubits) + 1
+        multiqubit_level = max(multiqubit_levels.get(qubit, 0) for qubit in qubits) + (len(qubits) > 1)
+        for qubit in qubits:
+            levels[qubit] = level
+            multiqubit_levels[qubit] = multiqubit_level
+    return {
+        'gate_depth': max(levels.values()) if levels else 0,
+        'gate_volume': len(gates),
+        'multiqubit_gate_depth': max(multiqubit_levels.values()) if multiqubit_levels else 0,
+        'program_fidelity': 1.0,
+        'topological_swaps': 0,
+    }
+
+
+# Server
+
+class InjectedFailure(Exception):
+    """ Failure injected by the stand-in """
+
+
+class ForestStandIn(object):
+    """ Forest API on a local HTTP server, run in a background thread
+
+    latency and jitter (seconds) delay every request while it holds a slot of its machine, slots gives the number
+    of requests every machine serves at the same time (DEFAULT_SLOTS), and failure_rate is the probability that a
+    request fails. devices maps device names to NoiseModels. Use as a context manager or call start() and stop().
+    stats counts requests, failures, client connections (kept alive between requests, HTTP/1.1) and the most
+    requests every machine served at the same time.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, slots=None, devices=None, seed=None,
+                 host='127.0.0.1', port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.slots = dict(DEFAULT_SLOTS, **(slots or {}))
+        self.devices = devices if devices is not None else {'8Q-Agave': NoiseModel()}
+        self.address = (host, port)
+        self._random_state = np.random.RandomState(seed)
+        self._random_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._lanes = dict((machine, ThreadPoolExecutor(max_workers=count)) for machine, count in self.slots.items())
+        self._jobs = {}
+        self._job_ids = itertools.count(1)
+        self._running = dict((machine, 0) for machine in self.slots)
+        self.stats = {'requests': 0, 'failures': 0, 'connections': 0, 'max_concurrent': dict((machine, 0) for machine in self.slots)}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://%s:%s" % (host, port)
+
+    def start(self):
+        self._server = _ThreadingHTTPServer(self.address, _Handler)
+        self._server.stand_in = self
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for lane in self._lanes.values():
+            lane.shutdown(wait=False)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw(self, function, *args):
+        with self._random_lock:
+            return function(*args)
+
+    def _serve(self, machine, function, started):
+        """ Runs function in a slot of machine, after the injected latency, and returns its result """
+        if started is not None:
+            started()
+        with self._lock:
+            self._running[machine] += 1
+            self.stats['max_concurrent'][machine] = max(self.stats['max_concurrent'][machine], self._running[machine])
+        try:
+            delay = self.latency + (self._draw(self._random_state.uniform, 0, self.jitter) if self.jitter else 0)
+            if delay:
+                time.sleep(delay)
+            if self.failure_rate and self._draw(self._random_state.uniform) < self.failure_rate:
+                with self._lock:
+                    self.stats['failures'] += 1
+                raise InjectedFailure("Injected failure of %s" % machine)
+            return function()
+        finally:
+            with self._lock:
+                self._running[machine] -= 1
+
+    def submit(self, machine, function, started=None):
+        """ Queues function for a slot of machine, returns a future; started() is called when it gets the slot """
+        if machine not in self._lanes:
+            raise QuilError("Unknown machine %s" % machine)
+        with self._lock:
+            self.stats['requests'] += 1
+        return self._lanes[machine].submit(self._serve, machine, function, started)
+
+    def _random(self):
+        """ Random state of one request, seeded from the server's, so seeded servers are reproducible """
+        return np.random.RandomState(self._draw(self._random_state.randint, 2 ** 31))
+
+    def execute(self, machine, payload, device=None):
+        """ Result of a /qvm payload or a job program on machine """
+        kind = payload.get('type')
+        text = payload.get('compiled-quil') or payload.get('uncompiled-quil') or payload.get('quil-instructions', '')
+        if machine == 'QUILC':
+            return {'compiled-quil': text, 'metadata': compiler_metadata(text)}
+        random_state = self._random()
+        if 'rng-seed' in payload:
+            random_state = np.random.RandomState(payload['rng-seed'])
+        noise_model = self.devices.get(device) if machine == 'QPU' else None
+        if kind == 'wavefunction':
+            return wavefunction_octets(text, payload.get('addresses', []), random_state)
+        if kind in ('multishot', 'multishot-measure'):
+            if kind == 'multishot-measure':
+                # Every listed qubit is measured into the address of the same number
+                text += "\n" + "\n".join("MEASURE %s [%s]" % (q, q) for q in payload.get('qubits', []))
+                addresses = payload.get('qubits', [])
+            else:
+                addresses = payload.get('addresses', [])
+            return run_quil(text, addresses, int(payload.get('trials', 1)), random_state, noise_model)
+        raise QuilError("Unsupported request type %s" % kind)
+
+    def create_job(self, request):
+        """ Queues an asynchronous job and returns its id """
+        machine = request.get('machine', 'QVM')
+        program = dict(request.get('program', {}))
+        job_id = "%s" % next(self._job_ids)
+        job = {'jobId': job_id, 'status': 'QUEUED', 'program': program, 'result': None}
+        with self._lock:
+            self._jobs[job_id] = job
+
+        def started():
+            with self._lock:
+                job['status'] = 'RUNNING'
+
+        def run():
+            result = self.execute(machine, program, request.get('device'))
+            if isinstance(result, bytes):
+                raise QuilError("Wavefunctions are only served synchronously")
+            return result
+
+        def done(future):
+            with self._lock:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    job['status'], job['result'] = 'ERROR', "%s" % e
+                else:
+                    if machine == 'QUILC':
+                        program.update(result)
+                    job['status'], job['result'] = 'FINISHED', result
+
+        self.submit(machine, run, started).add_done_callback(done)
+        return job_id
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if job['status'] == 'QUEUED':
+                job['position_in_queue'] = sum(1 for other in self._jobs.values() if other['status'] == 'QUEUED')
+            return job
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, every reply has a Content-Length
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        stand_in = self.server.stand_in
+        with stand_in._lock:
+            stand_in.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', "%s" % len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, error_type, message):
+        # The body pyquil.api.errors.parse_error expects
+        self._reply(status, {'error_type': error_type, 'status': message})
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        if self.path.rstrip('/') == '/devices':
+            self._reply(200, {'devices': dict((name, device_description(noise_model))
+                                              for name, noise_model in stand_in.devices.items())})
+        elif self.path.startswith('/job/'):
+            job = stand_in.job(self.path[len('/job/'):])
+            if job is None:
+                self._error(404, 'job_not_found', "No job %s" % self.path)
+            else:
+                self._reply(200, job)
+        else:
+            self._error(404, 'not_found', "No endpoint %s" % self.path)
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        except ValueError:
+            self._error(400, 'invalid_json', "Request body is not JSON")
+            return
+        machine = {'/qvm': 'QVM', '/quilc': 'QUILC'}.get(self.path.rstrip('/'))
+        try:
+            if self.path.rstrip('/') == '/job':
+                self._reply(200, {'jobId': stand_in.create_job(request)})
+            elif machine is not None:
+                result = stand_in.submit(machine, lambda: stand_in.execute(machine, request)).result()
+                if isinstance(result, bytes):
+                    self._reply(200, result, 'application/octet-stream')
+                else:
+                    self._reply(200, result)
+            else:
+                self._error(404, 'not_found', "No endpoint %s" % self.path)
+        except InjectedFailure as e:
+            self._error(503, 'qvm_error', "%s" % e)
+        except (QuilError, KeyError, ValueError) as e:
+            self._error(400, 'qvm_error', "%s" % e)
+
+
+def main(port=DEFAULT_PORT, **kwargs):
+    """ Serves the stand-in on port until interrupted """
+    stand_in = ForestStandIn(port=port, **kwargs).start()
+    print("Forest stand-in serving on %s" % stand_in.url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import http.client
+import json
+import struct
+import time
+import unittest
+import urllib.error
+import urllib.request
+from functools import partial
+import numpy as np
+from .executor import Job, run_sweep
+from .forest_server import ForestStandIn, QuilError, parse_number, parse_quil
+
+
+# Quantum beats program as written by pyquil's Program.out()
+QUANTUM_BEATS_QUIL = """DEFGATE SWITCH_TO_SINGLET_TRIPLET_BASIS:
+    1.0, 0, 0, 0
+    0, 0.7071067811865475, 0.7071067811865475, 0
+    0, 0.7071067811865475, -0.7071067811865475, 0
+    0, 0, 0, 1.0
+
+X 0
+H 1
+CNOT 1 0
+Z 1
+PHASE(%s) 0
+SWITCH_TO_SINGLET_TRIPLET_BASIS 0 1
+MEASURE 0 [0]
+MEASURE 1 [1]
+"""
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+        if response.headers['Content-Type'] == 'application/json':
+            return json.loads(body.decode('utf-8'))
+        return body
+
+
+def get(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def wait_for_job(url, job_id):
+    while True:
+        job = get("%s/job/%s" % (url, job_id))
+        if job['status'] in ('FINISHED', 'ERROR'):
+            return job
+        time.sleep(0.01)
+
+
+class QuilTest(unittest.TestCase):
+
+    def test_parse_number(self):
+        self.assertAlmostEqual(parse_number('1/sqrt(2)'), 0.7071067811865475)
+        self.assertAlmostEqual(parse_number('-pi/2'), -np.pi / 2)
+        self.assertEqual(parse_number('0.5+1.0i'), 0.5 + 1j)
+        self.assertRaises(QuilError, parse_number, '__import__("os")')
+
+    def test_parse_quil(self):
+        gates, measurements = parse_quil(QUANTUM_BEATS_QUIL % 'pi/2')
+        self.assertEqual([name for name, _, _ in gates],
+                         ['X', 'H', 'CNOT', 'Z', 'PHASE', 'SWITCH_TO_SINGLET_TRIPLET_BASIS'])
+        self.assertEqual(gates[2][2], [1, 0])
+        self.assertAlmostEqual(gates[4][1][1, 1], 1j)
+        self.assertEqual(measurements, [(0, 0), (1, 1)])
+        self.assertRaises(QuilError, parse_quil, "FOO 0")
+
+
+class ForestStandInTest(unittest.TestCase):
+
+    def test_multishot(self):
+        with ForestStandIn(seed=0) as server:
+            # Singlet (1, 0) with probability cos^2(angle / 2)
+            bits = post(server.url + "/qvm", {'type': 'multishot', 'addresses': [0, 1], 'trials': 2000,
+                                              'compiled-quil': QUANTUM_BEATS_QUIL % 'pi/2'})
+        bits = np.array(bits)
+        self.assertEqual(bits.shape, (2000, 2))
+        self.assertAlmostEqual(np.mean(np.all(bits == [1, 0], axis=1)), 0.5, delta=0.05)
+        self.assertAlmostEqual(np.mean(np.all(bits == [0, 1], axis=1)), 0.5, delta=0.05)
+
+    def test_wavefunction(self):
+        singlet = "X 0\nH 1\nCNOT 1 0\nZ 1\n"
+        with ForestStandIn() as server:
+            octets = post(server.url + "/qvm", {'type': 'wavefunction', 'addresses': [], 'compiled-quil': singlet})
+        amplitudes = [complex(*struct.unpack('>dd', octets[i:i + 16])) for i in range(0, len(octets), 16)]
+        np.testing.assert_allclose(amplitudes, [0, 2 ** -0.5, -2 ** -0.5, 0], atol=1e-12)
+
+    def test_devices(self):
+        with ForestStandIn() as server:
+            devices = get(server.url + "/devices")['devices']
+        agave = devices['8Q-Agave']
+        self.assertEqual(len(agave['isa']['1Q']), 8)
+        self.assertAlmostEqual(agave['specs']['1Q']['0']['fRO'], 0.95)
+
+    def test_jobs(self):
+        with ForestStandIn(seed=1) as server:
+            qpu = post(server.url + "/job", {'machine': 'QPU', 'device': '8Q-Agave', 'program': {
+                'type': 'multishot', 'addresses': [0, 1], 'trials': 100, 'compiled-quil': QUANTUM_BEATS_QUIL % 0}})
+            compiler = post(server.url + "/job", {'machine': 'QUILC', 'program': {
+                'type': 'multishot', 'uncompiled-quil': QUANTUM_BEATS_QUIL % 0}})
+            qpu_job = wait_for_job(server.url, qpu['jobId'])
+            compiler_job = wait_for_job(server.url, compiler['jobId'])
+        self.assertEqual(qpu_job['status'], 'FINISHED')
+        self.assertEqual(len(qpu_job['result']), 100)
+        self.assertEqual(compiler_job['program']['metadata']['gate_volume'], 6)
+        self.assertIn('compiled-quil', compiler_job['program'])
+
+    def test_keep_alive(self):
+        with ForestStandIn() as server:
+            connection = http.client.HTTPConnection(*server._server.server_address[:2])
+            for _ in range(3):
+                connection.request('GET', '/devices')
+                self.assertIn('8Q-Agave', json.loads(connection.getresponse().read().decode('utf-8'))['devices'])
+            connection.close()
+        self.assertEqual(server.stats['connections'], 1)
+
+    def test_injected_failures(self):
+        with ForestStandIn(failure_rate=1.0) as server:
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                post(server.url + "/qvm", {'type': 'multishot', 'addresses': [0], 'trials': 1,
+                                           'compiled-quil': "X 0\nMEASURE 0 [0]"})
+            self.assertEqual(raised.exception.code, 503)
+            self.assertEqual(json.loads(raised.exception.read().decode('utf-8'))['error_type'], 'qvm_error')
+            job = post(server.url + "/job", {'machine': 'QVM', 'program': {
+                'type': 'multishot', 'addresses': [0], 'trials': 1, 'compiled-quil': "X 0\nMEASURE 0 [0]"}})
+            self.assertEqual(wait_for_job(server.url, job['jobId'])['status'], 'ERROR')
+            self.assertEqual(server.stats['failures'], 2)
+
+    def test_queueing_and_sweep_concurrency(self):
+        payload = {'type': 'multishot', 'addresses': [0, 1], 'trials': 10, 'compiled-quil': QUANTUM_BEATS_QUIL % 0}
+        with ForestStandIn(latency=0.05, slots={'QVM': 4, 'QPU': 1}) as server:
+            def run(machine):
+                job = post(server.url + "/job", {'machine': machine, 'device': '8Q-Agave', 'program': payload})
+                return wait_for_job(server.url, job['jobId'])['result']
+
+            start = time.time()
+            jobs = [Job(t, 'qvm', 0, partial(run, 'QVM')) for t in range(8)]
+            jobs += [Job(t, 'qpu', 0, partial(run, 'QPU')) for t in range(4)]
+            results = run_sweep(jobs, limits={'qvm': 8, 'qpu': 4})
+            elapsed = time.time() - start
+        self.assertEqual(len(results), 12)
+        self.assertEqual(server.stats['max_concurrent'], {'QVM': 4, 'QPU': 1, 'QUILC': 0})
+        # The QPU serves one job at a time
+        self.assertGreaterEqual(elapsed, 4 * 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+""" Local density matrix simulation of noisy quantum beats programs
+
+Mirrors the decoherence noise model of pyquil (pyquil.noise.add_decoherence_noise):
+after every gate the qubits it acted on are damped (T1) and dephased (T2) for the duration of the gate,
+optionally depolarized, and every measured bit is flipped with the readout assignment probabilities.
+Gates that are frame changes on the Rigetti devices (RZ, PHASE, Z, S, T) take no time.
+
+Timesteps are evolved together as a (T, 2**n, 2**n) batch of density matrices,
+and repeated runs are sampled from the measured probabilities in one multinomial draw.
+"""
+import math
+import numpy as np
+
+from rigetti.counting import sample_counts
+from rigetti.statevector import GATE_MATRICES, apply_gate, phase_matrix, program_gates
+
+
+# Defaults of pyquil.noise.add_decoherence_noise
+T1 = 30e-6
+T2 = 30e-6
+GATE_TIME_1Q = 50e-9
+GATE_TIME_2Q = 150e-09
+RO_FIDELITY = 0.95
+
+VIRTUAL_GATES = ('RZ', 'PHASE', 'Z', 'S', 'T')
+
+
+class NoiseModel(object):
+    """ Noise parameters of a device
+
+    t1, t2 and ro_fidelity are either one value for all qubits or a dict of values per qubit.
+    depolarizing_1q and depolarizing_2q are the depolarizing probabilities applied after one and two qubit gates.
+    """
+
+    def __init__(self, t1=T1, t2=T2, gate_time_1q=GATE_TIME_1Q, gate_time_2q=GATE_TIME_2Q,
+                 ro_fidelity=RO_FIDELITY, depolarizing_1q=0.0, depolarizing_2q=0.0):
+        self.t1 = t1
+        self.t2 = t2
+        self.gate_time_1q = gate_time_1q
+        self.gate_time_2q = gate_time_2q
+        self.ro_fidelity = ro_fidelity
+        self.depolarizing_1q = depolarizing_1q
+        self.depolarizing_2q = depolarizing_2q
+
+    @classmethod
+    def from_device(cls, device, **kwargs):
+        """ Noise model with T1, T2, readout fidelities and gate errors from the specs of a pyquil Device """
+        specs = device.specs
+
+        def known(values):
+            return dict((qubit, value) for qubit, value in values.items() if value is not None)
+
+        f1q = list(known(specs.f1QRBs()).values())
+        f2q = list(known(specs.fCZs()).values())
+        # Average gate fidelity F of a depolarizing channel with probability p: F = 1 - p (d - 1) / d
+        if f1q:
+            kwargs.setdefault('depolarizing_1q', 2 * (1 - np.mean(f1q)))
+        if f2q:
+            kwargs.setdefault('depolarizing_2q', 4 * (1 - np.mean(f2q)) / 3)
+        kwargs.setdefault('t1', known(specs.T1s()))
+        kwargs.setdefault('t2', known(specs.T2s()))
+        kwargs.setdefault('ro_fidelity', known(specs.fROs()))
+        return cls(**kwargs)
+
+    @staticmethod
+    def _for_qubit(value, qubit, default):
+        if isinstance(value, dict):
+            return value.get(qubit, default)
+        return value
+
+    def qubit_t1(self, qubit):
+        return self._for_qubit(self.t1, qubit, T1)
+
+    def qubit_t2(self, qubit):
+        return self._for_qubit(self.t2, qubit, T2)
+
+    def qubit_ro_fidelity(self, qubit):
+        return self._for_qubit(self.ro_fidelity, qubit, RO_FIDELITY)
+
+    def key(self):
+        """ Parameters of the model as a string, to tell noise models apart """
+        return repr(sorted(self.__dict__.items()))
+
+
+def damping_after_dephasing_kraus(t1, t2, gate_time):
+    """ Kraus operators of amplitude damping followed by dephasing, as in pyquil.noise.damping_after_dephasing """
+    gamma = 1 - math.exp(-float(gate_time) / t1)
+    damping = [np.array([[1, 0], [0, math.sqrt(1 - gamma)]]), np.array([[0, math.sqrt(gamma)], [0, 0]])]
+
+    # T2 is upper bounded by 2 * T1
+    gamma_phi = max(float(gate_time) / t2 - float(gate_time) / (2 * t1), 0.0)
+    p = .5 * (1 - math.exp(-2 * gamma_phi))
+    dephasing = [math.sqrt(1 - p) * np.eye(2), math.sqrt(p) * GATE_MATRICES['Z']]
+    return [np.dot(k_dephasing, k_damping) for k_dephasing in dephasing for k_damping in damping]
+
+
+def depolarizing_kraus(p, n_qubits):
+    """ Kraus operators of rho -> (1 - p) rho + p I / d on n_qubits """
+    paulis = [GATE_MATRICES[name] for name in ('I', 'X', 'Y', 'Z')]
+    operators = [np.eye(1)]
+    for _ in range(n_qubits):
+        operators = [np.kron(operator, pauli) for operator in operators for pauli in paulis]
+    weight = p / len(operators)
+    return [math.sqrt(1 - p + weight) * operators[0]] + [math.sqrt(weight) * operator for operator in operators[1:]]
+
+
+def apply_operator(rhos, matrix, qubits):
+    """ matrix rho matrix^dagger for a (T, D, D) batch of density matrices
+
+    matrix is either a single gate or a (T, d, d) stack with one gate per density matrix.
+    """
+    batch, dim, _ = rhos.shape
+    matrix = np.asarray(matrix)
+    if matrix.ndim == 3:
+        matrix = np.repeat(matrix, dim, axis=0)
+    # Every column of rho transforms as a statevector
+    columns = rhos.transpose(0, 2, 1).reshape(batch * dim, dim)
+    left = apply_gate(columns, matrix, qubits).reshape(batch, dim, dim).transpose(0, 2, 1)
+    # and every row of (matrix rho) with the complex conjugate
+    rows = np.ascontiguousarray(left).reshape(batch * dim, dim)
+    return apply_gate(rows, np.conj(matrix), qubits).reshape(batch, dim, dim)
+
+
+def apply_kraus(rhos, operators, qubits):
+    """ Applies the channel given by Kraus operators to a batch of density matrices """
+    return sum(apply_operator(rhos, operator, qubits) for operator in operators)
+
+
+def apply_gate_noise(rhos, name, qubits, noise_model):
+    """ Noise that follows a gate: depolarizing, then damping and dephasing of every qubit for the gate time """
+    if name in VIRTUAL_GATES:
+        return rhos
+    if len(qubits) == 1:
+        gate_time, depolarizing = noise_model.gate_time_1q, noise_model.depolarizing_1q
+    else:
+        gate_time, depolarizing = noise_model.gate_time_2q, noise_model.depolarizing_2q
+    if depolarizing:
+        rhos = apply_kraus(rhos, depolarizing_kraus(depolarizing, len(qubits)), qubits)
+    for qubit in qubits:
+        operators = damping_after_dephasing_kraus(noise_model.qubit_t1(qubit), noise_model.qubit_t2(qubit), gate_time)
+        rhos = apply_kraus(rhos, operators, [qubit])
+    return rhos
+
+
+def readout_probabilities(rhos, noise_model):
+    """ Probabilities of the measured outcomes, including readout errors """
+    probabilities = np.real(np.diagonal(rhos, axis1=1, axis2=2))
+    n_qubits = int(round(math.log(probabilities.shape[1], 2)))
+    for qubit in range(n_qubits):
+        f = noise_model.qubit_ro_fidelity(qubit)
+        assignment = np.array([[f, 1 - f], [1 - f, f]])
+        probabilities = apply_gate(probabilities, assignment, [qubit])
+    return np.clip(probabilities, 0, 1)
+
+
+def readout_confusion_matrix(noise_model, n_qubits=2):
+    """ Confusion matrix of the readout errors of a noise model, in the convention of common/readout.py """
+    dim = 2 ** n_qubits
+    prepared = np.zeros((dim, dim, dim))
+    prepared[np.arange(dim), np.arange(dim), np.arange(dim)] = 1
+    return readout_probabilities(prepared, noise_model).T
+
+
+def simulate_noisy_quantum_beats(prepared_program, angles, noise_model=None, phase_qubit=0,
+                                 switch_gate="SWITCH_TO_SINGLET_TRIPLET_BASIS", switch_qubits=(0, 1), n_qubits=2):
+    """ Measured outcome probabilities of the noisy quantum beats program for all angles at once
+
+    Takes the same program as statevector.simulate_quantum_beats and returns a (T, 2**n) array.
+    """
+    if noise_model is None:
+        noise_model = NoiseModel()
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    switch_matrix = [gate.matrix for gate in prepared_program.defined_gates if gate.name == switch_gate][0]
+
+    rhos = np.zeros((1, 2 ** n_qubits, 2 ** n_qubits), dtype=complex)
+    rhos[0, 0, 0] = 1
+    for name, matrix, qubits in program_gates(prepared_program):
+        rhos = apply_gate_noise(apply_operator(rhos, matrix, qubits), name, qubits, noise_model)
+
+    rhos = np.repeat(rhos, len(angles), axis=0)
+    rhos = apply_gate_noise(apply_operator(rhos, phase_matrix(angles), [phase_qubit]), 'PHASE', [phase_qubit],
+                            noise_model)
+    rhos = apply_gate_noise(apply_operator(rhos, switch_matrix, switch_qubits), switch_gate, list(switch_qubits),
+                            noise_model)
+    return readout_probabilities(rhos, noise_model)
+
+
+def sample_noisy_quantum_beats(prepared_program, angles, shots, repeats=1, noise_model=None, random_state=None):
+    """ Counts of repeated noisy runs of the quantum beats program, as a (T, repeats, 2**n) array """
+    probabilities = simulate_noisy_quantum_beats(prepared_program, angles, noise_model)
+    batch = np.repeat(probabilities[:, np.newaxis, :], repeats, axis=1)
+    return sample_counts(batch, shots, random_state)
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from .quantum_beats_rigetti_qvm import create_singlet_state, add_switch_to_singlet_triplet_basis_gate_to_program
+from .statevector import simulate_quantum_beats, outcome_probabilities
+from .noise import NoiseModel, simulate_noisy_quantum_beats, sample_noisy_quantum_beats, depolarizing_kraus, apply_kraus
+
+ANGLES = 0.46 * np.arange(0, 30)
+
+
+def create_prepared_program():
+    p = create_singlet_state()
+    add_switch_to_singlet_triplet_basis_gate_to_program(p)
+    return p
+
+
+class NoiseTest(unittest.TestCase):
+
+    def test_noiseless_matches_statevector(self):
+        noise_model = NoiseModel(t1=float('inf'), t2=float('inf'), ro_fidelity=1.0)
+        probs = simulate_noisy_quantum_beats(create_prepared_program(), ANGLES, noise_model)
+        expected = outcome_probabilities(simulate_quantum_beats(create_prepared_program(), ANGLES))
+        np.testing.assert_allclose(probs, expected, atol=1e-12)
+
+    def test_readout_error(self):
+        noise_model = NoiseModel(t1=float('inf'), t2=float('inf'), ro_fidelity=0.9)
+        probs = simulate_noisy_quantum_beats(create_prepared_program(), ANGLES, noise_model)
+        # Ideal outcomes are only 01 and 10, a single bit flip turns them into 00 or 11
+        np.testing.assert_allclose(probs[:, 0], 0.09)
+        np.testing.assert_allclose(probs[:, 3], 0.09)
+        np.testing.assert_allclose(probs.sum(axis=1), 1)
+
+    def test_full_depolarizing(self):
+        rhos = np.zeros((1, 4, 4), dtype=complex)
+        rhos[0, 1, 1] = 1
+        rhos = apply_kraus(rhos, depolarizing_kraus(1.0, 2), [0, 1])
+        np.testing.assert_allclose(rhos[0], np.eye(4) / 4, atol=1e-12)
+
+    def test_decoherence_reduces_contrast(self):
+        ideal = simulate_noisy_quantum_beats(create_prepared_program(), ANGLES, NoiseModel(ro_fidelity=1.0))
+        noisy = simulate_noisy_quantum_beats(create_prepared_program(), ANGLES,
+                                             NoiseModel(t1=1e-6, t2=1e-6, ro_fidelity=1.0, depolarizing_2q=0.05))
+        self.assertLess(np.ptp(noisy[:, 1]), np.ptp(ideal[:, 1]))
+
+    def test_sample_repeats(self):
+        counts = sample_noisy_quantum_beats(create_prepared_program(), ANGLES, 1000, repeats=3, random_state=1234)
+        self.assertEqual(counts.shape, (30, 3, 4))
+        np.testing.assert_array_equal(counts.sum(axis=2), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
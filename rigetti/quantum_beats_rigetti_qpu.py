@@ -1,22 +1,40 @@
 import math
-import numpy as np
-import sys
 import os
+import sys
+import numpy as np
+from functools import partial
 
 from pyquil.quil import Program
 from pyquil.gates import Z, X, H, CNOT, PHASE
-from pyquil.api import QVMConnection, get_devices, QPUConnection, CompilerConnection
 
-
-def distribution(data):
-    """ Distribution of measurement of quantum system """
-    combinations = {}
-    for result in data:
-        result_as_tuple = tuple(result)
-        if result_as_tuple not in combinations:
-            combinations[result_as_tuple] = 0
-        combinations[result_as_tuple] += 1
-    return combinations
+from common import tracing
+from common.cache import ResultCache, cached_shots
+from common.results import Column, ResultWriter
+from common.sweep import W_LARMOR, phase_angles
+from rigetti.counting import distribution, sample_counts, Distribution
+from rigetti.executor import Job, run_sweep, silenced
+from rigetti.noise import NoiseModel, sample_noisy_quantum_beats
+from rigetti.sessions import ForestSession
+from rigetti.statevector import simulate_quantum_beats, outcome_probabilities, get_outcome_probs
+
+
+RESULTS_DIRECTORY = os.path.join("results", "quantum_beats_rigetti_qpu")
+
+COLUMNS = [
+    Column('t', 'i8', label="Timestamp"),
+    Column('singlet_wavefunction', 'f8', label="Singlet (Wavefunction)"),
+    Column('triplet_wavefunction', 'f8', label="Triplet (Wavefunction)"),
+    Column('singlet_qvm', 'i8', label="Singlet (QVM)"),
+    Column('triplet_qvm', 'i8', label="Triplet (QVM)"),
+    Column('singlet_noise', 'i8', label="Singlet (QVM Noise)"),
+    Column('triplet_noise', 'i8', label="Triplet (QVM Noise)"),
+    Column('state00_noise', 'i8', label="00 (QVM Noise)"),
+    Column('state11_noise', 'i8', label="11 (QVM Noise)"),
+    Column('singlet_qpu', 'i8', label="Singlet (QPU)"),
+    Column('triplet_qpu', 'i8', label="Triplet (QPU)"),
+    Column('state00_qpu', 'i8', label="00 (QPU)"),
+    Column('state11_qpu', 'i8', label="11 (QPU)"),
+]
 
 
 def create_singlet_state():
@@ -56,66 +74,113 @@ def add_switch_to_singlet_triplet_basis_gate_to_program(program):
     program.defgate("SWITCH_TO_SINGLET_TRIPLET_BASIS", my_array)
 
 
-def main():
-    agave = get_devices(as_dict=True)['8Q-Agave']
-    compiler = CompilerConnection(agave)
-    qvm = QVMConnection()  # Perfect QVM
-    qvm_noisy = QVMConnection(agave)  # Simulate Noise
-    qpu = QPUConnection(agave)  # Physical QPU
-    print("Timestamp, Singlet (Wavefunction), Triplet (Wavefunction), Singlet (QVM), Triplet (QVM),"
-          "Singlet (QVM Noise), Triplet (QVM Noise), 00 (QVM Noise), 11 (QVM Noise),"
-          "Singlet (QPU), Triplet (QPU), 00 (QPU), 11 (QPU)")
-    # Rotation
-    for t in range(1, 50):  # ns
-        p = create_singlet_state()
-        add_switch_to_singlet_triplet_basis_gate_to_program(p)
-        w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-        p.inst(PHASE(w_larmor * t, 0))
-        p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
-        wavefunction = qvm.wavefunction(p)
-        probs = wavefunction.get_outcome_probs()
-
-        p.measure(0, 0)
-        p.measure(1, 1)
-
-        # Run the code on a perfect QVM (no noise)
-        data = qvm.run(p, trials=1024)
-
-        # simulate physical noise on QVM
-        data_noisy = qvm_noisy.run(p, trials=1000)
-        noisy_data_distr = distribution(data_noisy)
-
-        # Run the code on QPU
-        # Suppress print statements
-        _old_stdout = sys.stdout
-        with open(os.devnull, 'w') as fp:
-            sys.stdout = fp
-            data_qpu = qpu.run(p, trials=1024)
-        sys.stdout = _old_stdout
-
-        # print('compiled quil', job.compiled_quil())
-        # print('gate volume', job.gate_volume())
-        # print('gate depth', job.gate_depth())
-        # print('topological swaps', job.topological_swaps())
-        # print('program fidelity', job.program_fidelity())
-        # print('multiqubit gate depth', job.multiqubit_gate_depth())
-
-        # Note the order of qubit in Rigetti
-        # http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
-        # (1, 0) is singlet, but in string notation it is reversed ('01'), because
-        #
-        #  "The Rigetti QVM enumerates bitstrings such that qubit 0 is the least significant bit (LSB)
-        #   and therefore on the right end of a bitstring"
-        #
-        print("%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s" %
-              (t, probs['01'], probs['10'],
-               distribution(data).get((1, 0), 0), distribution(data).get((0, 1), 0),
-               noisy_data_distr.get((1, 0), 0), noisy_data_distr.get((0, 1), 0),
-               noisy_data_distr.get((0, 0), 0), noisy_data_distr.get((1, 1), 0),
-               distribution(data_qpu).get((1, 0), 0), distribution(data_qpu).get((0, 1), 0),
-               distribution(data_qpu).get((0, 0), 0), distribution(data_qpu).get((1, 1), 0))
-        )
+@tracing.traced('rigetti_qpu.sweep')
+def main(sample_locally=True, simulate_noise_locally=True, use_cache=False, seed=None,
+         results_directory=RESULTS_DIRECTORY, session=None):
+    """ Prints the quantum beats sweep and stores it in results_directory (common/results.py)
+
+    With sample_locally=True the perfect QVM columns are drawn from the exact probabilities
+    with a multinomial draw seeded by seed, instead of running every shot on the QVM.
+    With simulate_noise_locally=True the noisy QVM columns come from the local density matrix simulator
+    with the noise model of the device (rigetti/noise.py).
+    With use_cache=True results of remote runs are kept in the on-disk cache (common/cache.py)
+    and only programs that changed are run again. Results of the device are keyed by its specs and ISA,
+    so they are run again once it is recalibrated. Shots are random draws, so caching is off by default.
+    Connections and device metadata come from session (a ForestSession of rigetti/sessions.py, one on the shared
+    session manager by default), so scripts run in one process reuse them.
+    """
+    session = session or ForestSession('8Q-Agave')
+    with tracing.span('get_devices'):
+        agave = session.device
+    qvm = session.qvm  # Perfect QVM
+    qvm_noisy = session.qvm_noisy  # Simulate Noise
+    qpu = session.qpu  # Physical QPU
+    timesteps = range(1, 50)  # ns
+    angles = phase_angles(timesteps, W_LARMOR)
+    random_state = np.random.RandomState(seed)
+
+    # Exact wavefunctions for the whole sweep, computed locally
+    with tracing.span('simulate_locally', timesteps=len(angles)):
+        prepared = create_singlet_state()
+        add_switch_to_singlet_triplet_basis_gate_to_program(prepared)
+        wavefunctions = simulate_quantum_beats(prepared, angles)
+        # Ideal shot counts for the whole sweep, drawn from the exact probabilities
+        ideal_counts = sample_counts(outcome_probabilities(wavefunctions), 1024, random_state=random_state)
+        # Noisy shot counts for the whole sweep and all repeats
+        noisy_counts = sample_noisy_quantum_beats(prepared, angles, 1000, 1,
+                                                  noise_model=NoiseModel.from_device(agave),
+                                                  random_state=random_state)
+
+    # Programs for every timestep
+    with tracing.span('build_programs', timesteps=len(angles)):
+        programs = []
+        for angle in angles:
+            p = create_singlet_state()
+            add_switch_to_singlet_triplet_basis_gate_to_program(p)
+            p.inst(PHASE(angle, 0))
+            p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
+            p.measure(0, 0)
+            p.measure(1, 1)
+            programs.append(p)
+
+    # Remote jobs of the whole sweep run concurrently, up to the limit of every backend
+    cache = ResultCache() if use_cache else None
+    jobs = []
+    for t, p in zip(timesteps, programs):
+        if not sample_locally:
+            # Run the code on a perfect QVM (no noise)
+            run = partial(qvm.run, p, trials=1024)
+            jobs.append(Job(t, 'qvm', 0, partial(cached_shots, cache, run, p, 'QVM', 1024)))
+        if not simulate_noise_locally:
+            # simulate physical noise on QVM
+            run = partial(qvm_noisy.run, p, trials=1000)
+            jobs.append(Job(t, 'qvm_noisy', 0,
+                            partial(cached_shots, cache, run, p, '8Q-Agave QVM', 1000, device=agave)))
+        # Run the code on QPU, suppressing its print statements
+        run = partial(silenced(qpu.run), p, trials=1024)
+        jobs.append(Job(t, 'qpu', 0, partial(cached_shots, cache, run, p, '8Q-Agave', 1024, device=agave)))
+    with tracing.span('run_sweep', jobs=len(jobs)):
+        results = run_sweep(jobs)
 
+    # Rotation
+    with tracing.span('write_results'), ResultWriter(results_directory, COLUMNS, echo=sys.stdout) as writer:
+        for step, t in enumerate(timesteps):
+            probs = get_outcome_probs(wavefunctions[step])
+
+            if sample_locally:
+                data_distr = Distribution(ideal_counts[step])
+            else:
+                data_distr = distribution(results[t, 'qvm', 0])
+
+            if simulate_noise_locally:
+                noisy_data_distr = Distribution(noisy_counts[step, 0])
+            else:
+                noisy_data_distr = distribution(results[t, 'qvm_noisy', 0])
+
+            qpu_data_distr = distribution(results[t, 'qpu', 0])
+
+            # print('compiled quil', job.compiled_quil())
+            # print('gate volume', job.gate_volume())
+            # print('gate depth', job.gate_depth())
+            # print('topological swaps', job.topological_swaps())
+            # print('program fidelity', job.program_fidelity())
+            # print('multiqubit gate depth', job.multiqubit_gate_depth())
+
+            # Note the order of qubit in Rigetti
+            # http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+            # (1, 0) is singlet, but in string notation it is reversed ('01'), because
+            #
+            #  "The Rigetti QVM enumerates bitstrings such that qubit 0 is the least significant bit (LSB)
+            #   and therefore on the right end of a bitstring"
+            #
+            writer.append(
+                t=t, singlet_wavefunction=probs['01'], triplet_wavefunction=probs['10'],
+                singlet_qvm=data_distr.get((1, 0), 0), triplet_qvm=data_distr.get((0, 1), 0),
+                singlet_noise=noisy_data_distr.get((1, 0), 0), triplet_noise=noisy_data_distr.get((0, 1), 0),
+                state00_noise=noisy_data_distr.get((0, 0), 0), state11_noise=noisy_data_distr.get((1, 1), 0),
+                singlet_qpu=qpu_data_distr.get((1, 0), 0), triplet_qpu=qpu_data_distr.get((0, 1), 0),
+                state00_qpu=qpu_data_distr.get((0, 0), 0), state11_qpu=qpu_data_distr.get((1, 1), 0),
+            )
 
 if __name__ == '__main__':
     main()
@@ -1,22 +1,74 @@
 import math
-import numpy as np
-import sys
 import os
+import sys
+import numpy as np
+from functools import partial
 
 from pyquil.quil import Program
 from pyquil.gates import Z, X, H, CNOT, PHASE
-from pyquil.api import QVMConnection, get_devices, QPUConnection, CompilerConnection
 
+from common.adaptive import AdaptiveScheduler, binomial_width
+from common import tracing
+from common.cache import ResultCache, cached_shots
+from common.checkpoint import Checkpoint, resume_sweep
+from common.readout import DEFAULT_TTL, mitigate
+from common.results import Column, ResultWriter
+from common.sweep import W_LARMOR, Sweep
+from rigetti.counting import distribution, sample_counts, Distribution
+from rigetti.executor import Job, run_sweep, silenced
+from rigetti.noise import NoiseModel, sample_noisy_quantum_beats
+from rigetti.readout import device_confusion_matrix
+from rigetti.sessions import ForestSession
+from rigetti.uncertainty import multinomial_mean, multinomial_std
+
+
+RESULTS_DIRECTORY = os.path.join("results", "quantum_beats_rigetti_qpu_std")
+JOURNAL_FILE = "journal.jsonl"
 
-def distribution(data):
-    """ Distribution of measurement of quantum system """
-    combinations = {}
-    for result in data:
-        result_as_tuple = tuple(result)
-        if result_as_tuple not in combinations:
-            combinations[result_as_tuple] = 0
-        combinations[result_as_tuple] += 1
-    return combinations
+# Counts of a backend that did not run a point
+MISSING = Distribution(np.full(4, np.nan))
+
+NOISY_REPEATS = 3
+QPU_REPEATS = 9  # At most, with adaptive=True timesteps stop as soon as they converge
+# QPU shots per slow point of the sweep on average, 5 repeats of 1024 shots instead of 9
+QPU_SHOT_BUDGET = 5 * 1024
+# Width of the 95% confidence interval of the outcome fractions at which a timestep needs no more QPU repeats.
+# Points in the middle of the curve reach it after 3 repeats of shot noise, leaving the rest of the budget
+# for points whose repeats scatter more
+TARGET_WIDTH = binomial_width(1024, 3)
+
+# Columns of the noisy QVM and QPU outcomes hold the counts of every repeat,
+# printed as their mean and standard deviation. QPU repeats that did not run are NaN,
+# and so are the columns of remote backends at points that are not slow points of the sweep
+COLUMNS = [
+    Column('t', 'i8', label="Timestamp"),
+    Column('singlet_wavefunction', 'f8', label="Singlet (Wavefunction)"),
+    Column('triplet_wavefunction', 'f8', label="Triplet (Wavefunction)"),
+    Column('singlet_qvm', 'f8', label="Singlet (QVM)"),
+    Column('triplet_qvm', 'f8', label="Triplet (QVM)"),
+    Column('singlet_noise', 'f8', (NOISY_REPEATS,), label="Singlet (QVM Noise)"),
+    Column('triplet_noise', 'f8', (NOISY_REPEATS,), label="Triplet (QVM Noise)"),
+    Column('state00_noise', 'f8', (NOISY_REPEATS,), label="00 (QVM Noise)"),
+    Column('state11_noise', 'f8', (NOISY_REPEATS,), label="11 (QVM Noise)"),
+    Column('singlet_qpu', 'f8', (QPU_REPEATS,), label="Singlet (QPU)"),
+    Column('triplet_qpu', 'f8', (QPU_REPEATS,), label="Triplet (QPU)"),
+    Column('state00_qpu', 'f8', (QPU_REPEATS,), label="00 (QPU)"),
+    Column('state11_qpu', 'f8', (QPU_REPEATS,), label="11 (QPU)"),
+    Column('repeats_qpu', 'i8', label="Repeats (QPU)"),
+]
+
+# With single_run=True the QPU columns hold the mean and the analytic standard deviation of the counts of 1024 shots,
+# estimated from one run of QPU_REPEATS * 1024 shots
+SINGLE_RUN_COLUMNS = COLUMNS[:9] + [
+    Column('singlet_qpu', 'f8', label="Singlet (QPU) Mean"),
+    Column('singlet_qpu_std', 'f8', label="Singlet (QPU) Std"),
+    Column('triplet_qpu', 'f8', label="Triplet (QPU) Mean"),
+    Column('triplet_qpu_std', 'f8', label="Triplet (QPU) Std"),
+    Column('state00_qpu', 'f8', label="00 (QPU) Mean"),
+    Column('state00_qpu_std', 'f8', label="00 (QPU) Std"),
+    Column('state11_qpu', 'f8', label="11 (QPU) Mean"),
+    Column('state11_qpu_std', 'f8', label="11 (QPU) Std"),
+]
 
 
 def create_singlet_state():
@@ -56,109 +108,218 @@ def add_switch_to_singlet_triplet_basis_gate_to_program(program):
     program.defgate("SWITCH_TO_SINGLET_TRIPLET_BASIS", my_array)
 
 
-def main():
-    agave = get_devices(as_dict=True)['8Q-Agave']
-    compiler = CompilerConnection(agave)
-    qvm = QVMConnection()  # Perfect QVM
-    qvm_noisy = QVMConnection(agave)  # Simulate Noise
-    qpu = QPUConnection(agave)  # Physical QPU
-    print("Timestamp,"
-          "Singlet (Wavefunction), Triplet (Wavefunction), "
-          "Singlet (QVM), Triplet (QVM),"
-          "Singlet Mean (QVM Noise), Singlet Std (QVM Noise), "
-          "Triplet Mean (QVM Noise), Triplet Std (QVM Noise),"
-          "00 Mean (QVM Noise), 00 Std (QVM Noise),"
-          "11 Mean (QVM Noise), 11 Std (QVM Noise),"
-          "Singlet Mean (QPU), Singlet Std (QPU),"
-          "Triplet Mean (QPU), Triplet Std (QPU),"
-          "00 Mean (QPU), 00 Std (QPU),"
-          "11 Mean (QPU), 1 Std (QPU)")
+@tracing.traced('rigetti_qpu_std.sweep')
+def main(sample_locally=True, simulate_noise_locally=True, use_cache=False, seed=None,
+         results_directory=RESULTS_DIRECTORY, resume=True, adaptive=True, single_run=False,
+         timesteps=range(0, 30), w_larmor=W_LARMOR, slow_points=None, mitigate_readout=False,
+         mitigation='least_squares', readout_ttl=DEFAULT_TTL, session=None):
+    """ Prints the quantum beats sweep and stores it, with the counts of every repeat, in results_directory
+
+    With sample_locally=True the perfect QVM columns are drawn from the exact probabilities
+    with a multinomial draw seeded by seed, instead of running every shot on the QVM.
+    With simulate_noise_locally=True the noisy QVM columns come from the local density matrix simulator
+    with the noise model of the device (rigetti/noise.py).
+    With use_cache=True results of remote runs are kept in the on-disk cache (common/cache.py)
+    and only programs that changed are run again. Results of the device are keyed by its specs and ISA,
+    so they are run again once it is recalibrated. Shots are random draws, so caching is off by default.
+    Every finished remote job is journaled in results_directory (common/checkpoint.py) until the sweep is stored.
+    With resume=True a sweep that was interrupted continues where it stopped, with resume=False it starts from scratch.
+    A sweep with other parameters (shots, time grid, target width, ...) than the interrupted one does not resume,
+    it raises ParametersMismatch (common/checkpoint.py) until it is started with resume=False.
+    With adaptive=True timesteps get QPU repeats until their outcome fractions are known to TARGET_WIDTH,
+    within QPU_SHOT_BUDGET per point (common/adaptive.py). Otherwise every timestep gets QPU_REPEATS repeats.
+    With single_run=True every timestep runs once on the QPU with QPU_REPEATS * 1024 shots, and the error bars
+    come from the multinomial variance of that run (rigetti/uncertainty.py) instead of from repeats.
+    timesteps (ns) can be any grid, e.g. np.arange(0.0, 30.0, 0.1). Only slow_points of them, spread evenly
+    over the grid (all by default), run on the remote backends; the other columns cover every point.
+    With mitigate_readout=True the QPU counts are corrected for readout errors with mitigation, 'least_squares' or
+    'inverse' (common/readout.py). The confusion matrix of the QPU is calibrated with basis state preparations,
+    and the confusion matrix is kept in the on-disk cache until it is readout_ttl seconds old.
+    Connections and device metadata come from session (a ForestSession of rigetti/sessions.py, one on the shared
+    session manager by default), so scripts run in one process reuse them.
+    """
+    session = session or ForestSession('8Q-Agave')
+    with tracing.span('get_devices'):
+        agave = session.device
+    qvm = session.qvm  # Perfect QVM
+    qvm_noisy = session.qvm_noisy  # Simulate Noise
+    qpu = session.qpu  # Physical QPU
+    # Ideal and locally simulated columns cover every point of the grid,
+    # the remote backends only run the slow points of the sweep (common/sweep.py)
+    sweep = Sweep(timesteps, w_larmor, slow_points)
+    random_state = np.random.RandomState(seed)
+
+    with tracing.span('simulate_locally', timesteps=len(sweep.timesteps)):
+        # Exact outcome probabilities for the whole sweep, in closed form
+        ideal_probabilities = sweep.ideal_probabilities()
+        # Ideal shot counts for the whole sweep, drawn from the exact probabilities
+        ideal_counts = sample_counts(ideal_probabilities, 1024, random_state=random_state)
+        # Noisy shot counts for the whole sweep and all repeats
+        prepared = create_singlet_state()
+        add_switch_to_singlet_triplet_basis_gate_to_program(prepared)
+        noisy_counts = sample_noisy_quantum_beats(prepared, sweep.angles, 1000, NOISY_REPEATS,
+                                                  noise_model=NoiseModel.from_device(agave),
+                                                  random_state=random_state)
+
+    # Programs for every slow point
+    with tracing.span('build_programs', timesteps=len(sweep.slow_timesteps)):
+        programs = {}
+        for t, angle in zip(sweep.slow_timesteps, sweep.slow_angles):
+            p = create_singlet_state()
+            add_switch_to_singlet_triplet_basis_gate_to_program(p)
+            p.inst(PHASE(angle, 0))
+            p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
+            p.measure(0, 0)
+            p.measure(1, 1)
+            programs[t] = p
+
+    # Remote jobs of the whole sweep run concurrently, up to the limit of every backend
+    cache = ResultCache() if use_cache else None
+    jobs = []
+    for t in sweep.slow_timesteps:
+        p = programs[t]
+        if not sample_locally:
+            # Run the code on a perfect QVM (no noise)
+            run = partial(qvm.run, p, trials=1024)
+            jobs.append(Job(t, 'qvm', 0, partial(cached_shots, cache, run, p, 'QVM', 1024)))
+        if not simulate_noise_locally:
+            # simulate physical noise on QVM
+            for i in range(0, NOISY_REPEATS):
+                run = partial(qvm_noisy.run, p, trials=1000)
+                jobs.append(Job(t, 'qvm_noisy', i, partial(cached_shots, cache, run, p, '8Q-Agave QVM', 1000,
+                                                           seed=i, device=agave)))
+
+    def qpu_job(t, i):
+        # Run the code on QPU, suppressing its print statements
+        p = programs[t]
+        run = partial(silenced(qpu.run), p, trials=scheduler.shots)
+        return Job(t, 'qpu', i, partial(cached_shots, cache, run, p, '8Q-Agave', scheduler.shots, seed=i,
+                                        device=agave))
+
+    # QPU repeats are requested in rounds, only for timesteps that did not converge yet
+    if single_run:
+        scheduler = AdaptiveScheduler(sweep.slow_timesteps, 4, QPU_REPEATS * 1024, 0.0,
+                                      min_repeats=1, max_repeats=1)
+    elif adaptive:
+        scheduler = AdaptiveScheduler(sweep.slow_timesteps, 4, 1024, TARGET_WIDTH,
+                                      QPU_SHOT_BUDGET * len(sweep.slow_timesteps), max_repeats=QPU_REPEATS)
+    else:
+        scheduler = AdaptiveScheduler(sweep.slow_timesteps, 4, 1024, 0.0,
+                                      min_repeats=QPU_REPEATS, max_repeats=QPU_REPEATS)
+    results = {}
+    journal = os.path.join(results_directory, JOURNAL_FILE)
+    # A journal of a sweep with other parameters is not resumed (common/checkpoint.py)
+    parameters = {
+        'device': agave.name, 'w_larmor': w_larmor, 'timesteps': sweep.slow_timesteps,
+        'sample_locally': sample_locally, 'simulate_noise_locally': simulate_noise_locally,
+        'qvm_shots': 1024, 'noisy_shots': 1000, 'noisy_repeats': NOISY_REPEATS, 'qpu_shots': scheduler.shots,
+        'adaptive': adaptive, 'single_run': single_run, 'target_width': scheduler.target_width,
+        'shot_budget': scheduler.shot_budget, 'min_repeats': scheduler.min_repeats,
+        'max_repeats': scheduler.max_repeats,
+    }
+    with Checkpoint(journal, resume=resume, parameters=parameters) as checkpoint:
+        if len(checkpoint):
+            print("Resuming sweep, %s jobs already finished" % len(checkpoint), file=sys.stderr)
+
+        def run_round(requests):
+            # The other backends run along with the first round
+            round_jobs = jobs + [qpu_job(t, i) for t, i in requests]
+            del jobs[:]
+            results.update(resume_sweep(round_jobs, checkpoint, run_sweep))
+            return dict(((t, i), distribution(results[t, 'qpu', i]).counts) for t, i in requests)
+
+        with tracing.span('run_sweep', adaptive=adaptive):
+            scheduler.run(run_round)
+    print("QPU repeats: %(repeats)s, shots: %(shots)s, converged timesteps: %(converged)s of %(timesteps)s"
+          % scheduler.summary(), file=sys.stderr)
+
+    # QPU counts of every repeat, corrected for readout errors in one pass over the whole sweep
+    qpu_keys = [key for key in results if key[1] == 'qpu']
+    qpu_counts = [distribution(results[key]).counts for key in qpu_keys]
+    if mitigate_readout and qpu_keys:
+        with tracing.span('mitigate_readout', method=mitigation):
+            # The calibration expires by itself after readout_ttl, it is cached even without use_cache
+            confusion = device_confusion_matrix(qpu, '8Q-Agave', cache=cache or ResultCache(), ttl=readout_ttl)
+            qpu_counts = mitigate(np.array(qpu_counts), confusion, mitigation)
+    qpu_counts = dict(zip(qpu_keys, qpu_counts))
+
     # Rotation
-    fp_raw = open("output.txt", "w")
-    for t in range(0, 30):  # ns
-    # for t in np.arange(0.0, 30.0, 0.1):  # ns
-        p = create_singlet_state()
-        add_switch_to_singlet_triplet_basis_gate_to_program(p)
-        w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-        p.inst(PHASE(w_larmor * t, 0))
-        p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
-        wavefunction = qvm.wavefunction(p)
-        probs = wavefunction.get_outcome_probs()
-
-        p.measure(0, 0)
-        p.measure(1, 1)
-
-        # Run the code on a perfect QVM (no noise)
-        data = qvm.run(p, trials=1024)
-
-        # simulate physical noise on QVM
-        singlet_noisy = []
-        triplet_noisy = []
-        state11_noisy = []
-        state00_noisy = []
-        for i in range(0, 3):
-            data_noisy = qvm_noisy.run(p, trials=1000)
-            noisy_data_distr = distribution(data_noisy)
-            singlet_noisy.append(noisy_data_distr[(1, 0)])
-            triplet_noisy.append(noisy_data_distr[(0, 1)])
-            state11_noisy.append(noisy_data_distr[(1, 1)])
-            state00_noisy.append(noisy_data_distr[(0, 0)])
-
-        # Run the code on QPU
-        singlet_qpu = []
-        triplet_qpu = []
-        state11_qpu = []
-        state00_qpu = []
-
-
-        # Suppress print statements
-        _old_stdout = sys.stdout
-        for i in range(0, 9):
-            with open(os.devnull, 'w') as fp:
-                sys.stdout = fp
-                data_qpu = qpu.run(p, trials=1024)
-            qpu_data_distr = distribution(data_qpu)
-            singlet_qpu.append(qpu_data_distr[(1, 0)])
-            triplet_qpu.append(qpu_data_distr[(0, 1)])
-            state11_qpu.append(qpu_data_distr[(1, 1)])
-            state00_qpu.append(qpu_data_distr[(0, 0)])
-
-        sys.stdout = _old_stdout
-        # print('compiled quil', job.compiled_quil())
-        # print('gate volume', job.gate_volume())
-        # print('gate depth', job.gate_depth())
-        # print('topological swaps', job.topological_swaps())
-        # print('program fidelity', job.program_fidelity())
-        # print('multiqubit gate depth', job.multiqubit_gate_depth())
-
-        # Note the order of qubit in Rigetti
-        # http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
-        # (1, 0) is singlet, but in string notation it is reversed ('01'), because
-        #
-        #  "The Rigetti QVM enumerates bitstrings such that qubit 0 is the least significant bit (LSB)
-        #   and therefore on the right end of a bitstring"
-        #
-        print("%s, Noise, Singlet, %s" % (t, singlet_noisy), file=fp_raw)
-        print("%s, Noise, Triplet, %s" % (t, triplet_noisy), file=fp_raw)
-        print("%s, Noise, 00, %s" % (t, state00_noisy), file=fp_raw)
-        print("%s, Noise, 11, %s" % (t, state11_noisy), file=fp_raw)
-        print("%s, QPU, Singlet, %s" % (t, singlet_qpu), file=fp_raw)
-        print("%s, QPU, Triplet, %s" % (t, triplet_qpu), file=fp_raw)
-        print("%s, QPU, 00, %s" % (t, state00_qpu), file=fp_raw)
-        print("%s, QPU, 11, %s" % (t, state11_qpu), file=fp_raw)
-        print("%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s" %
-              (t, 
-               probs['01'], probs['10'],
-               distribution(data).get((1, 0), 0), distribution(data).get((0, 1), 0),
-               np.mean(singlet_noisy), np.std(singlet_noisy),
-               np.mean(triplet_noisy), np.std(triplet_noisy),
-               np.mean(state00_noisy), np.std(state00_noisy),
-               np.mean(state11_noisy), np.std(state11_noisy),               
-               np.mean(singlet_qpu), np.std(singlet_qpu),
-               np.mean(triplet_qpu), np.std(triplet_qpu),
-               np.mean(state00_qpu), np.std(state00_qpu),
-               np.mean(state11_qpu), np.std(state11_qpu),
-        ))
+    columns = SINGLE_RUN_COLUMNS if single_run else COLUMNS
+    # Integer or float timestamps, depending on the grid
+    columns = [Column('t', sweep.timesteps.dtype, label="Timestamp")] + columns[1:]
+    with tracing.span('write_results'), ResultWriter(results_directory, columns, echo=sys.stdout) as writer:
+        for step, t in enumerate(sweep.timesteps):
+            probs = Distribution(ideal_probabilities[step])
+            slow = sweep.is_slow(step)
+
+            if sample_locally:
+                data_distr = Distribution(ideal_counts[step])
+            elif slow:
+                data_distr = distribution(results[t, 'qvm', 0])
+            else:
+                data_distr = MISSING
+
+            singlet_noisy = []
+            triplet_noisy = []
+            state11_noisy = []
+            state00_noisy = []
+            for i in range(0, NOISY_REPEATS):
+                if simulate_noise_locally:
+                    noisy_data_distr = Distribution(noisy_counts[step, i])
+                elif slow:
+                    noisy_data_distr = distribution(results[t, 'qvm_noisy', i])
+                else:
+                    noisy_data_distr = MISSING
+                singlet_noisy.append(noisy_data_distr[(1, 0)])
+                triplet_noisy.append(noisy_data_distr[(0, 1)])
+                state11_noisy.append(noisy_data_distr[(1, 1)])
+                state00_noisy.append(noisy_data_distr[(0, 0)])
+
+            if single_run:
+                counts = qpu_counts[t, 'qpu', 0] if slow else MISSING.counts
+                qpu_mean = Distribution(multinomial_mean(counts, 1024))
+                qpu_std = Distribution(multinomial_std(counts, 1024))
+                qpu_record = dict(
+                    singlet_qpu=qpu_mean[(1, 0)], singlet_qpu_std=qpu_std[(1, 0)],
+                    triplet_qpu=qpu_mean[(0, 1)], triplet_qpu_std=qpu_std[(0, 1)],
+                    state00_qpu=qpu_mean[(0, 0)], state00_qpu_std=qpu_std[(0, 0)],
+                    state11_qpu=qpu_mean[(1, 1)], state11_qpu_std=qpu_std[(1, 1)],
+                )
+            else:
+                # Repeats that the adaptive scheduler did not request stay NaN
+                singlet_qpu = np.full(QPU_REPEATS, np.nan)
+                triplet_qpu = np.full(QPU_REPEATS, np.nan)
+                state11_qpu = np.full(QPU_REPEATS, np.nan)
+                state00_qpu = np.full(QPU_REPEATS, np.nan)
+                repeats = scheduler.repeats(t) if slow else 0
+                for i in range(0, repeats):
+                    qpu_data_distr = Distribution(qpu_counts[t, 'qpu', i])
+                    singlet_qpu[i] = qpu_data_distr[(1, 0)]
+                    triplet_qpu[i] = qpu_data_distr[(0, 1)]
+                    state11_qpu[i] = qpu_data_distr[(1, 1)]
+                    state00_qpu[i] = qpu_data_distr[(0, 0)]
+                qpu_record = dict(
+                    singlet_qpu=singlet_qpu, triplet_qpu=triplet_qpu,
+                    state00_qpu=state00_qpu, state11_qpu=state11_qpu, repeats_qpu=repeats,
+                )
+
+            # Note the order of qubit in Rigetti
+            # http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+            # (1, 0) is singlet, but in string notation it is reversed ('01'), because
+            #
+            #  "The Rigetti QVM enumerates bitstrings such that qubit 0 is the least significant bit (LSB)
+            #   and therefore on the right end of a bitstring"
+            #
+            writer.append(
+                t=t, singlet_wavefunction=probs['01'], triplet_wavefunction=probs['10'],
+                singlet_qvm=data_distr.get((1, 0), 0), triplet_qvm=data_distr.get((0, 1), 0),
+                singlet_noise=singlet_noisy, triplet_noise=triplet_noisy,
+                state00_noise=state00_noisy, state11_noise=state11_noisy,
+                **qpu_record
+            )
+
+    # The sweep is complete, the next one starts from scratch
+    os.remove(journal)
 
 
 if __name__ == '__main__':
@@ -1,25 +1,48 @@
 import math
+import os
+import sys
 import numpy as np
+from functools import partial
 
 # Documentation: http://pyquil.readthedocs.io/en/latest/
 
 from pyquil.quil import Program
-from pyquil.gates import Z, X, H, CNOT, PHASE
-from pyquil.api import QVMConnection, get_devices, CompilerConnection
-
-
-FILENAME = "output.txt"
-
-
-def distribution(data):
-    """ Distribution of measurement of quantum system """
-    combinations = {}
-    for result in data:
-        result_as_tuple = tuple(result)
-        if result_as_tuple not in combinations:
-            combinations[result_as_tuple] = 0
-        combinations[result_as_tuple] += 1
-    return combinations
+from pyquil.quilbase import Pragma
+from pyquil.gates import Z, X, H, CNOT, RZ
+
+from common import tracing
+from common.cache import ResultCache, cached_shots
+from common.results import Column, ResultWriter
+from common.sweep import W_LARMOR, phase_angles
+from rigetti.compiled_store import CompiledStore
+from rigetti.counting import distribution, sample_counts, Distribution
+from rigetti.executor import DEFAULT_LIMITS, Job, run_sweep
+from rigetti.noise import NoiseModel, sample_noisy_quantum_beats
+from rigetti.sessions import ForestSession
+from rigetti.statevector import simulate_quantum_beats, outcome_probabilities, get_outcome_probs
+
+
+# The PHASE step of the parametric program lives inside this block
+PHASE_BLOCK_START = "PRAGMA PRESERVE_BLOCK"
+PHASE_BLOCK_END = "PRAGMA END_PRESERVE_BLOCK"
+
+RESULTS_DIRECTORY = os.path.join("results", "quantum_beats_rigetti_qvm")
+
+COLUMNS = [
+    Column('t', 'i8', label="Timestamp"),
+    Column('singlet_wavefunction', 'f8', label="Singlet (Wavefunction)"),
+    Column('triplet_wavefunction', 'f8', label="Triplet (Wavefunction)"),
+    Column('singlet_qvm', 'i8', label="Singlet (QVM)"),
+    Column('triplet_qvm', 'i8', label="Triplet (QVM)"),
+    Column('singlet_noise', 'i8', label="Singlet (Noise)"),
+    Column('triplet_noise', 'i8', label="Triplet (Noise)"),
+    Column('state00_noise', 'i8', label="00 (Noise)"),
+    Column('state11_noise', 'i8', label="11 (Noise)"),
+    Column('singlet_compiled', 'i8', label="Singlet (Compiled on QVM)"),
+    Column('triplet_compiled', 'i8', label="Triplet (Compiled on QVM)"),
+    Column('state00_compiled', 'i8', label="00 (Compiled on QVM)"),
+    Column('state11_compiled', 'i8', label="11 (Compiled on QVM)"),
+]
 
 
 def create_singlet_state():
@@ -59,67 +82,157 @@ def add_switch_to_singlet_triplet_basis_gate_to_program(program):
     program.defgate("SWITCH_TO_SINGLET_TRIPLET_BASIS", my_array)
 
 
-def main():
-    qvm = QVMConnection()
-    agave = get_devices(as_dict=True)['8Q-Agave']
-    qvm_noisy = QVMConnection(agave)
-    print("Timestamp, Singlet (Wavefunction), Triplet (Wavefunction), Singlet (QVM), Triplet (QVM),"
-          "Singlet (Noise), Triplet (Noise), 00 (Noise), 11 (Noise),"
-          "Singlet (Compiled on QVM), Triplet (Compiled on QVM), 00 (Compiled on QVM), 11 (Compiled on QVM),"
-          )
+def create_parametric_quantum_beats_program():
+    """ Returns quantum beats program with a placeholder for the PHASE step
 
-    # Truncate file with compiled code
-    open(FILENAME, "w").close()
-    # Rotation
-    for t in range(0, 50):  # ns
-        p = create_singlet_state()
-        add_switch_to_singlet_triplet_basis_gate_to_program(p)
-        w_larmor = 0.46  # 4.6e8 1/s as determined in the experiment
-        p.inst(PHASE(w_larmor * t, 0))
-        p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
-        wavefunction = qvm.wavefunction(p)
-        probs = wavefunction.get_outcome_probs()
-
-        p.measure(0, 0)
-        p.measure(1, 1)
-        # Run on a perfect QVM (no noise)
-        data = qvm.run(p, trials=1000)
-
-        # simulate physical noise on QVM
-        data_noisy = qvm_noisy.run(p, trials=1000)
-        noisy_data_distr = distribution(data_noisy)
-
-        agave = get_devices(as_dict=True)['8Q-Agave']
-        compiler = CompilerConnection(agave)
-        job_id = compiler.compile_async(p)
-        # wait_for_job has print statement
-        # using this workaround to suppress it
-        import sys, os
-        _old_stdout = sys.stdout
-        with open(os.devnull, 'w') as fp:
-            sys.stdout = fp
-            job = compiler.wait_for_job(job_id)  # This is the only line that matters
-        sys.stdout = _old_stdout
+    The phase is applied as a native RZ inside a PRESERVE_BLOCK, so the compiler leaves it alone
+    and the same compiled program can be reused for every angle (see bind_phase_angle).
+    RZ(angle) and PHASE(angle) only differ by a global phase.
+    """
 
+    # Keep logical qubits on the physical qubits with the same index,
+    # so the placeholder RZ acts on qubit 0 before and after compilation
+    p = Program(Pragma("INITIAL_REWIRING", freeform_string="NAIVE"))
+    p.inst(create_singlet_state())
+    add_switch_to_singlet_triplet_basis_gate_to_program(p)
+    p.inst(Pragma("PRESERVE_BLOCK"))
+    p.inst(RZ(0.0, 0))
+    p.inst(Pragma("END_PRESERVE_BLOCK"))
+    p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
+    return p
+
+
+def bind_phase_angle(quil, angle, qubit=0):
+    """ Returns a copy of a parametric quantum beats program with the PHASE step set to angle """
+    lines = ("%s" % quil).splitlines()
+    stripped = [line.strip() for line in lines]
+    start = stripped.index(PHASE_BLOCK_START)
+    end = stripped.index(PHASE_BLOCK_END, start)
+    lines[start + 1:end] = [RZ(angle, qubit).out()]
+    return Program("\n".join(lines))
+
+
+@tracing.traced('rigetti_qvm.sweep')
+def main(parametric=True, sample_locally=True, simulate_noise_locally=True, use_cache=False, seed=None,
+         results_directory=RESULTS_DIRECTORY, session=None):
+    """ Prints the quantum beats sweep and stores it in results_directory (common/results.py)
+
+    With parametric=True the program is built and compiled once, and only the PHASE angle
+    is bound per timestep. Otherwise every timestep is compiled separately.
+    With sample_locally=True the perfect QVM columns are drawn from the exact probabilities
+    with a multinomial draw seeded by seed, instead of running every shot on the QVM.
+    With simulate_noise_locally=True the noisy QVM columns come from the local density matrix simulator
+    with the noise model of the device (rigetti/noise.py).
+    With use_cache=True results of remote runs are kept in the on-disk cache (common/cache.py)
+    and only programs that changed are run again. Results of the device are keyed by its specs and ISA,
+    so they are run again once it is recalibrated. Shots are random draws, so caching is off by default.
+    Compiled programs and their compiler metrics are kept in the compiled program store
+    (rigetti/compiled_store.py), so every distinct program is compiled only once.
+    Connections and device metadata come from session (a ForestSession of rigetti/sessions.py, one on the shared
+    session manager by default), so scripts run in one process reuse them.
+    """
+    session = session or ForestSession('8Q-Agave')
+    with tracing.span('get_devices'):
+        agave = session.device
+        isa = session.isa
+    qvm = session.qvm
+    qvm_noisy = session.qvm_noisy
+    compiler = session.compiler
+    store = CompiledStore()
+
+    template = create_parametric_quantum_beats_program()
+    if parametric:
+        measured_template = template.copy()
+        measured_template.measure(0, 0)
+        measured_template.measure(1, 1)
+        with tracing.span('compile_template'):
+            compiled_template = store.compile(compiler, measured_template, isa, agave.name)
+
+    timesteps = range(0, 50)  # ns
+    angles = phase_angles(timesteps, W_LARMOR)
+    random_state = np.random.RandomState(seed)
+
+    # Exact wavefunctions for the whole sweep, computed locally
+    with tracing.span('simulate_locally', timesteps=len(angles)):
+        prepared = create_singlet_state()
+        add_switch_to_singlet_triplet_basis_gate_to_program(prepared)
+        wavefunctions = simulate_quantum_beats(prepared, angles)
+        # Ideal shot counts for the whole sweep, drawn from the exact probabilities
+        ideal_counts = sample_counts(outcome_probabilities(wavefunctions), 1000, random_state=random_state)
+        # Noisy shot counts for the whole sweep and all repeats
+        noisy_counts = sample_noisy_quantum_beats(prepared, angles, 1000, 1,
+                                                  noise_model=NoiseModel.from_device(agave),
+                                                  random_state=random_state)
+
+    # Programs for every timestep
+    with tracing.span('build_programs', timesteps=len(angles)):
+        programs = []
+        for angle in angles:
+            p = bind_phase_angle(template, angle)
+            p.measure(0, 0)
+            p.measure(1, 1)
+            programs.append(p)
+
+    # Programs compiled for 8Q-Agave
+    with tracing.span('compile_programs', parametric=parametric):
+        if parametric:
+            compiled_programs = [bind_phase_angle(compiled_template, angle) for angle in angles]
+        else:
+            jobs = [Job(t, 'compiler', 0, partial(store.compile, compiler, p, isa, agave.name))
+                    for t, p in zip(timesteps, programs)]
+            compiled = run_sweep(jobs)
+            compiled_programs = [Program(compiled[t, 'compiler', 0]) for t in timesteps]
+
+    # Remote jobs of the whole sweep run concurrently, up to the limit of every backend
+    cache = ResultCache() if use_cache else None
+    jobs = []
+    for t, p, p_compiled in zip(timesteps, programs, compiled_programs):
+        if not sample_locally:
+            # Run on a perfect QVM (no noise)
+            run = partial(qvm.run, p, trials=1000)
+            jobs.append(Job(t, 'qvm', 0, partial(cached_shots, cache, run, p, 'QVM', 1000)))
+        if not simulate_noise_locally:
+            # simulate physical noise on QVM
+            run = partial(qvm_noisy.run, p, trials=1000)
+            jobs.append(Job(t, 'qvm_noisy', 0,
+                            partial(cached_shots, cache, run, p, '8Q-Agave QVM', 1000, device=agave)))
         # Run code compiled for 8Q-Agave on a noisy QVM
         # Per example on https://github.com/rigetticomputing/pyquil/blob/master/examples/run_quil.py
-        p_compiled = Program(job.compiled_quil())
-        with open(FILENAME, "a") as fp:
-            fp.write("Timestep: %s\n" % t)
-            fp.write("%s" % job.compiled_quil())
-            fp.write("\n")
-        data_compiled = qvm_noisy.run(p_compiled, trials=1000)
-        compiled_data_distr = distribution(data_compiled)
-
-        print("%s, %s, %s, %s, %s, %s, %s, %s ,%s, %s, %s, %s, %s" %
-              (t, probs['01'], probs['10'],
-               distribution(data).get((0, 1), 0), distribution(data).get((1, 0), 0),
-               noisy_data_distr.get((0, 1), 0), noisy_data_distr.get((1, 0), 0),
-               noisy_data_distr.get((0, 0), 0), noisy_data_distr.get((1, 1), 0),
-               compiled_data_distr.get((0, 1), 0), compiled_data_distr.get((1, 0), 0),
-               compiled_data_distr.get((0, 0), 0), compiled_data_distr.get((1, 1), 0),
-               )
-              )
+        run = partial(qvm_noisy.run, p_compiled, trials=1000)
+        jobs.append(Job(t, 'qvm_compiled', 0,
+                        partial(cached_shots, cache, run, p_compiled, '8Q-Agave QVM', 1000, device=agave)))
+    with tracing.span('run_sweep', jobs=len(jobs)):
+        results = run_sweep(jobs, limits={'qvm_compiled': DEFAULT_LIMITS['qvm_noisy']})
+
+    # Rotation
+    with tracing.span('write_results'), ResultWriter(results_directory, COLUMNS, echo=sys.stdout) as writer:
+        for step, t in enumerate(timesteps):
+            probs = get_outcome_probs(wavefunctions[step])
+
+            if sample_locally:
+                data_distr = Distribution(ideal_counts[step])
+            else:
+                data_distr = distribution(results[t, 'qvm', 0])
+
+            if simulate_noise_locally:
+                noisy_data_distr = Distribution(noisy_counts[step, 0])
+            else:
+                noisy_data_distr = distribution(results[t, 'qvm_noisy', 0])
+
+            compiled_data_distr = distribution(results[t, 'qvm_compiled', 0])
+
+            # Note the order of qubit in Rigetti: (1, 0) is singlet, but in string notation it is reversed ('01')
+            # http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+            writer.append(
+                t=t, singlet_wavefunction=probs['01'], triplet_wavefunction=probs['10'],
+                singlet_qvm=data_distr.get((1, 0), 0), triplet_qvm=data_distr.get((0, 1), 0),
+                singlet_noise=noisy_data_distr.get((1, 0), 0), triplet_noise=noisy_data_distr.get((0, 1), 0),
+                state00_noise=noisy_data_distr.get((0, 0), 0), state11_noise=noisy_data_distr.get((1, 1), 0),
+                singlet_compiled=compiled_data_distr.get((1, 0), 0),
+                triplet_compiled=compiled_data_distr.get((0, 1), 0),
+                state00_compiled=compiled_data_distr.get((0, 0), 0),
+                state11_compiled=compiled_data_distr.get((1, 1), 0),
+            )
 
 
 if __name__ == '__main__':
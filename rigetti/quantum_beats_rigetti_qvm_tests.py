@@ -1,15 +1,17 @@
 import unittest
 from .quantum_beats_rigetti_qvm import create_singlet_state
+from .forest_server import ForestStandIn
 from pyquil.api import QVMConnection
 
 
 class CoreFunctionsTest(unittest.TestCase):
-    """ REQUIRES CONNECTION TO RIGETTI FOREST QVM """
+    """ Runs against the local Forest stand-in, no connection to Rigetti Forest needed """
 
     def test_create_singlet_state(self):
         p = create_singlet_state()
-        qvm = QVMConnection()
-        wavefunction = qvm.wavefunction(p)
+        with ForestStandIn() as server:
+            qvm = QVMConnection(sync_endpoint=server.url, async_endpoint=server.url)
+            wavefunction = qvm.wavefunction(p)
         # Make sure the wave function is what we expect
         # 1/sqrt(2) * (01|> - 10|>)
         self.assertEqual(wavefunction.amplitudes[0], 0)
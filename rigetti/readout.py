@@ -0,0 +1,33 @@
+""" Readout calibration of the Rigetti backends
+
+Runs the basis state preparations of common/readout.py on a QVMConnection or QPUConnection,
+X on every qubit that is 1 in the basis state, then a measurement of every qubit.
+"""
+from pyquil.quil import Program
+from pyquil.gates import X
+
+from common.readout import CALIBRATION_SHOTS, DEFAULT_TTL, basis_states, calibrated_confusion_matrix
+from rigetti.counting import distribution
+
+
+def basis_state_program(bits):
+    """ Program that prepares the basis state bits, qubit 0 first, and measures every qubit """
+    p = Program()
+    for qubit, bit in enumerate(bits):
+        if bit:
+            p.inst(X(qubit))
+    for qubit in range(len(bits)):
+        p.measure(qubit, qubit)
+    return p
+
+
+def measure_readout_counts(connection, n_qubits, shots):
+    """ (2**n, 2**n) outcome counts of every basis state preparation, in index order """
+    return [distribution(connection.run(basis_state_program(bits), trials=shots), n_qubits).counts
+            for bits in basis_states(n_qubits)]
+
+
+def device_confusion_matrix(connection, device, n_qubits=2, shots=CALIBRATION_SHOTS, cache=None, ttl=DEFAULT_TTL):
+    """ Confusion matrix of the first n_qubits qubits of device, measured at most once per ttl seconds with a cache """
+    return calibrated_confusion_matrix(lambda trials: measure_readout_counts(connection, n_qubits, trials),
+                                       device, n_qubits, shots, cache, ttl)
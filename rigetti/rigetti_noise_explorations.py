@@ -1,23 +1,14 @@
 from pyquil.quil import Program
 from pyquil.gates import Z, X, H, CNOT, PHASE
-from pyquil.api import QVMConnection, get_devices, QPUConnection, CompilerConnection
 
-
-def distribution(data):
-    """ Distribution of measurement of quantum system """
-    combinations = {}
-    for result in data:
-        result_as_tuple = tuple(result)
-        if result_as_tuple not in combinations:
-            combinations[result_as_tuple] = 0
-        combinations[result_as_tuple] += 1
-    return combinations
+from rigetti.counting import distribution
+from rigetti.sessions import ForestSession
 
 
 if __name__ == '__main__':
-    agave = get_devices(as_dict=True)['8Q-Agave']
-    qpu = QPUConnection(agave)  # Physical QPU
-    compiler = CompilerConnection(agave)
+    session = ForestSession('8Q-Agave')
+    qpu = session.qpu  # Physical QPU
+    compiler = session.compiler
 
     p = Program()
 
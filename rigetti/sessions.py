@@ -0,0 +1,87 @@
+""" Connections to the Rigetti Forest backends of one device, shared through a SessionManager
+
+    session = ForestSession('8Q-Agave')
+    qpu = session.qpu            # Created on first use, the same connection afterwards
+    isa = session.isa            # Fetched once per time to live of the session manager
+
+All connections of the session send their requests through one HTTP session with keep-alive and a connection
+pool large enough for the concurrent jobs of a sweep (rigetti/executor.py), instead of a session per connection.
+Endpoints default to the ones of pyquil; pass the url of a ForestStandIn (rigetti/forest_server.py) to run offline.
+"""
+from pyquil.api import CompilerConnection, QPUConnection, QVMConnection, get_devices
+
+from common.sessions import default_manager
+from rigetti.executor import DEFAULT_LIMITS
+
+
+# Pooled HTTP connections, enough for every lane of the executor at the same time
+POOL_SIZE = sum(DEFAULT_LIMITS.values())
+
+
+def pooled(session, pool_size=POOL_SIZE):
+    """ session with keep-alive connection pools of pool_size, keeping the retries of its adapters """
+    from requests.adapters import HTTPAdapter
+    for prefix in ('http://', 'https://'):
+        retries = session.get_adapter(prefix).max_retries
+        session.mount(prefix, HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries))
+    return session
+
+
+class ForestSession(object):
+    """ Connections and metadata of device_name, each created once in manager (default_manager() if None) """
+
+    def __init__(self, device_name='8Q-Agave', manager=None, sync_endpoint=None, async_endpoint=None):
+        self.device_name = device_name
+        self.manager = manager if manager is not None else default_manager()
+        self.endpoints = dict((name, url) for name, url in (('sync_endpoint', sync_endpoint),
+                                                            ('async_endpoint', async_endpoint)) if url)
+
+    def _key(self, name):
+        return ('forest', name, tuple(sorted(self.endpoints.items())))
+
+    def _shared(self, connection):
+        # The first connection's session (with its authentication headers) becomes the one of all connections
+        if hasattr(connection, 'session'):
+            connection.session = self.manager.connection(self._key('http'), lambda: pooled(connection.session))
+        return connection
+
+    def _endpoints(self, *names):
+        return dict((name, url) for name, url in self.endpoints.items() if name in names)
+
+    def _connection(self, name, factory, endpoints=('sync_endpoint', 'async_endpoint'), **kwargs):
+        def create():
+            return self._shared(factory(**dict(self._endpoints(*endpoints), **kwargs)))
+        return self.manager.connection(self._key(name), create)
+
+    def devices(self):
+        """ Devices by name, as get_devices(as_dict=True) """
+        endpoints = self._endpoints('async_endpoint')
+        return self.manager.metadata(self._key('devices'), lambda: get_devices(as_dict=True, **endpoints))
+
+    @property
+    def device(self):
+        return self.devices()[self.device_name]
+
+    @property
+    def isa(self):
+        return self.manager.metadata(self._key(('isa', self.device_name)), self.device.get_isa)
+
+    @property
+    def qvm(self):
+        """ Perfect QVM """
+        return self._connection('qvm', QVMConnection)
+
+    @property
+    def qvm_noisy(self):
+        """ QVM with the noise of the device """
+        return self._connection(('qvm', self.device_name), QVMConnection, device=self.device)
+
+    @property
+    def compiler(self):
+        return self._connection(('compiler', self.device_name), CompilerConnection, device=self.device)
+
+    @property
+    def qpu(self):
+        """ Physical QPU """
+        return self._connection(('qpu', self.device_name), QPUConnection, endpoints=('async_endpoint',),
+                                device=self.device)
@@ -0,0 +1,29 @@
+import unittest
+from pyquil.gates import X
+from pyquil.quil import Program
+from common.sessions import SessionManager
+from .forest_server import ForestStandIn
+from .sessions import ForestSession
+
+
+class ForestSessionTest(unittest.TestCase):
+    """ Runs against the local Forest stand-in, no connection to Rigetti Forest needed """
+
+    def test_connections_and_metadata_are_reused(self):
+        program = Program(X(0)).measure(0, 0)
+        with ForestStandIn() as server, SessionManager() as manager:
+            for _ in range(3):
+                # A new session per timestep still shares the connections and device metadata of manager
+                session = ForestSession('8Q-Agave', manager, sync_endpoint=server.url, async_endpoint=server.url)
+                self.assertEqual(session.device.name, '8Q-Agave')
+                self.assertIs(session.isa, session.isa)
+                self.assertIs(session.qvm_noisy.session, session.qvm.session)
+                self.assertEqual(session.qvm.run(program, [0], trials=10), [[1]] * 10)
+                self.assertEqual(len(session.qvm_noisy.run(program, [0], trials=10)), 10)
+        # One connection for the device list, and one kept alive for all runs
+        self.assertEqual(server.stats['connections'], 2)
+        self.assertEqual(server.stats['requests'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+""" Local NumPy statevector engine for the quantum beats programs
+
+Follows the Rigetti conventions, so results can be compared with QVMConnection.wavefunction:
+qubit 0 is the least significant bit of a basis state index, and the first qubit a gate is applied to
+is the most significant bit of the gate matrix.
+http://pyquil.readthedocs.io/en/latest/qvm.html#multi-qubit-basis-enumeration
+"""
+import math
+import numpy as np
+
+# The gate matrices and apply_gate are shared with the backend neutral code in common/
+from common.gates import GATE_MATRICES, PARAMETRIC_GATES, apply_gate, phase_matrix, rx_matrix, ry_matrix, rz_matrix
+
+
+def bitstrings(n_qubits):
+    """ Basis state labels in index order, e.g. ['00', '01', '10', '11'] """
+    return [format(i, '0%sb' % n_qubits) for i in range(2 ** n_qubits)]
+
+
+def program_gates(program):
+    """ Returns (name, matrix, qubits) for every gate of a pyquil program
+
+    Pragmas and measurements are skipped. Gates defined with defgate are looked up in the program.
+    """
+    defined = dict((gate.name, np.asarray(gate.matrix, dtype=complex)) for gate in program.defined_gates)
+    gates = []
+    for instruction in program.instructions:
+        if not hasattr(instruction, 'qubits') or not hasattr(instruction, 'params'):
+            continue
+        qubits = [getattr(qubit, 'index', qubit) for qubit in instruction.qubits]
+        if instruction.name in defined:
+            matrix = defined[instruction.name]
+        elif instruction.name in PARAMETRIC_GATES:
+            matrix = PARAMETRIC_GATES[instruction.name](float(instruction.params[0]))
+        else:
+            matrix = GATE_MATRICES[instruction.name]
+        gates.append((instruction.name, matrix, qubits))
+    return gates
+
+
+def run_program(program, n_qubits=2):
+    """ Returns the statevector of a pyquil program as a (1, 2**n) array """
+    states = np.zeros((1, 2 ** n_qubits), dtype=complex)
+    states[0, 0] = 1
+    for _, matrix, qubits in program_gates(program):
+        states = apply_gate(states, matrix, qubits)
+    return states
+
+
+def simulate_quantum_beats(prepared_program, angles, phase_qubit=0,
+                           switch_gate="SWITCH_TO_SINGLET_TRIPLET_BASIS", switch_qubits=(0, 1), n_qubits=2):
+    """ Statevectors of the quantum beats program for all angles at once
+
+    prepared_program is the output of create_singlet_state() with the switch gate defined on it
+    (add_switch_to_singlet_triplet_basis_gate_to_program). Each angle is applied as PHASE(angle, phase_qubit),
+    followed by the switch gate. Returns a (T, 2**n) complex array.
+    """
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    switch_matrix = [gate.matrix for gate in prepared_program.defined_gates if gate.name == switch_gate][0]
+
+    state = run_program(prepared_program, n_qubits)
+    states = np.repeat(state, len(angles), axis=0)
+    states = apply_gate(states, phase_matrix(angles), [phase_qubit])
+    return apply_gate(states, switch_matrix, switch_qubits)
+
+
+def outcome_probabilities(states):
+    """ Probabilities of every basis state, same shape as states """
+    return np.abs(states) ** 2
+
+
+def get_outcome_probs(state):
+    """ Same as pyquil's Wavefunction.get_outcome_probs for a single statevector """
+    probabilities = outcome_probabilities(np.asarray(state).ravel())
+    n_qubits = int(round(math.log(len(probabilities), 2)))
+    return dict(zip(bitstrings(n_qubits), probabilities))
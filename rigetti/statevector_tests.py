@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from pyquil.gates import PHASE
+from pyquil.api import QVMConnection
+from .quantum_beats_rigetti_qvm import create_singlet_state, add_switch_to_singlet_triplet_basis_gate_to_program
+from .statevector import run_program, simulate_quantum_beats, outcome_probabilities, get_outcome_probs
+
+
+def create_prepared_program():
+    p = create_singlet_state()
+    add_switch_to_singlet_triplet_basis_gate_to_program(p)
+    return p
+
+
+class StatevectorTest(unittest.TestCase):
+
+    def test_singlet_state(self):
+        state = run_program(create_singlet_state())[0]
+        # 1/sqrt(2) * (01|> - 10|>)
+        np.testing.assert_allclose(state, [0, 0.7071067811865475, -0.7071067811865475, 0], atol=1e-12)
+
+    def test_closed_form(self):
+        angles = 0.46 * np.arange(0, 50)
+        probs = outcome_probabilities(simulate_quantum_beats(create_prepared_program(), angles))
+        self.assertEqual(probs.shape, (50, 4))
+        np.testing.assert_allclose(probs[:, 1], np.cos(angles / 2) ** 2, atol=1e-12)
+        np.testing.assert_allclose(probs[:, 2], np.sin(angles / 2) ** 2, atol=1e-12)
+        np.testing.assert_allclose(probs.sum(axis=1), 1, atol=1e-12)
+
+
+class QVMCrossCheckTest(unittest.TestCase):
+    """ REQUIRES CONNECTION TO RIGETTI FOREST QVM """
+
+    def test_matches_qvm_wavefunction(self):
+        qvm = QVMConnection()
+        angles = 0.46 * np.arange(0, 30, 3)
+        states = simulate_quantum_beats(create_prepared_program(), angles)
+        for angle, state in zip(angles, states):
+            p = create_prepared_program()
+            p.inst(PHASE(angle, 0))
+            p.inst(("SWITCH_TO_SINGLET_TRIPLET_BASIS", 0, 1))
+            expected = qvm.wavefunction(p)
+            np.testing.assert_allclose(state, expected.amplitudes, atol=1e-7)
+            probs = get_outcome_probs(state)
+            for bitstring, probability in expected.get_outcome_probs().items():
+                self.assertAlmostEqual(probs[bitstring], probability)
+
+
+if __name__ == '__main__':
+    unittest.main()
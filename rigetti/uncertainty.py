@@ -0,0 +1,83 @@
+""" Error bars of outcome counts from a single batch of shots
+
+Instead of repeating a run and taking np.std over the repeats, the spread of the counts is derived
+from one larger batch: either analytically, every outcome count of a run of n shots is binomial with
+variance n p (1 - p), or with a bootstrap that resamples the packed shots of the batch.
+Both are vectorized over a whole sweep: counts of shape (T, 2**n), or bits of shape (T, shots, n_bits).
+"""
+import numpy as np
+
+from common.sampling import sample_counts
+from rigetti.counting import pack_bits
+
+
+def outcome_fractions(counts):
+    """ Fraction of shots of every outcome, counts has shape (..., 2**n) """
+    counts = np.asarray(counts, dtype=float)
+    return counts / counts.sum(axis=-1, keepdims=True)
+
+
+def multinomial_mean(counts, shots=None):
+    """ Expected outcome counts of a run of shots shots, estimated from the counts of one batch """
+    counts = np.asarray(counts, dtype=float)
+    if shots is None:
+        return counts
+    return outcome_fractions(counts) * shots
+
+
+def multinomial_std(counts, shots=None):
+    """ Standard deviation of the outcome counts of a run of shots shots, estimated from the counts of one batch
+
+    counts has shape (..., 2**n), shots defaults to the number of shots of the batch. For a batch of
+    9 * 1024 shots and shots=1024 this estimates np.std over 9 repeats of 1024 shots each
+    (np.std over n repeats is biased low, its expected square is (n - 1) / n of the variance).
+    """
+    counts = np.asarray(counts, dtype=float)
+    if shots is None:
+        shots = counts.sum(axis=-1, keepdims=True)
+    p = outcome_fractions(counts)
+    return np.sqrt(shots * p * (1 - p))
+
+
+def multinomial_stderr(counts):
+    """ Standard error of the outcome fractions estimated from the counts of one batch """
+    counts = np.asarray(counts, dtype=float)
+    shots = counts.sum(axis=-1, keepdims=True)
+    p = counts / shots
+    return np.sqrt(p * (1 - p) / shots)
+
+
+def bootstrap_counts(packed, n_bits, shots=None, resamples=1000, random_state=None):
+    """ Outcome counts of resamples runs of shots shots, drawn with replacement from packed shots
+
+    packed holds the shots of one batch as integers (counting.pack_bits), or of a batch per point of a sweep
+    with shape (T, batch shots). Returns a (resamples, 2**n) array, or (T, resamples, 2**n) for a sweep.
+    Drawing shots with replacement from a batch is a multinomial draw from its outcome fractions,
+    so the resamples are drawn as counts (common/sampling.py) without materializing their shots.
+    """
+    packed = np.asarray(packed, dtype=np.int64)
+    if packed.ndim == 0:
+        packed = packed.reshape(1)
+    if shots is None:
+        shots = packed.shape[-1]
+    outcomes = 2 ** n_bits
+    rows = packed.reshape(-1, packed.shape[-1])
+    # One bincount for all batches: batch b counts outcome k at b * outcomes + k
+    offsets = np.arange(len(rows), dtype=np.int64)[:, np.newaxis] * outcomes
+    counts = np.bincount((rows + offsets).ravel(), minlength=len(rows) * outcomes).reshape(len(rows), outcomes)
+    fractions = counts / float(packed.shape[-1])
+    drawn = sample_counts(np.repeat(fractions[:, np.newaxis], resamples, axis=1), shots, random_state)
+    return drawn.reshape(packed.shape[:-1] + (resamples, outcomes))
+
+
+def bootstrap_std(data, shots=None, resamples=1000, random_state=None):
+    """ Bootstrap standard deviation of the outcome counts of a run of shots shots
+
+    data holds the measured bits of one batch, as returned by QVMConnection.run or QPUConnection.run,
+    or of a batch per point of a sweep with shape (T, batch shots, n_bits), for which the result is (T, 2**n).
+    """
+    bits = np.asarray(data, dtype=np.uint8)
+    n_bits = bits.shape[-1] if bits.ndim > 1 else 1
+    packed = pack_bits(bits, n_bits).reshape(bits.shape[:-1] if bits.ndim > 1 else bits.shape)
+    counts = bootstrap_counts(packed, n_bits, shots, resamples, random_state)
+    return counts.std(axis=-2)
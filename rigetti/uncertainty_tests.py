@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from .counting import sample_counts
+from .uncertainty import bootstrap_counts, bootstrap_std, multinomial_mean, multinomial_std
+
+
+class UncertaintyTest(unittest.TestCase):
+
+    def setUp(self):
+        # Singlet/triplet probabilities of a sweep, with some readout noise
+        theta = 0.46 * np.arange(30)
+        p = np.stack([0.02 + 0 * theta, 0.94 * np.cos(theta / 2) ** 2, 0.94 * np.sin(theta / 2) ** 2,
+                      0.04 + 0 * theta], axis=1)
+        self.probabilities = p / p.sum(axis=1, keepdims=True)
+        self.random_state = np.random.RandomState(1)
+
+    def test_matches_repeats(self):
+        # The current way: 9 repeats of 1024 shots and np.std over the repeats
+        repeats = sample_counts(np.repeat(self.probabilities[:, np.newaxis], 9, axis=1), 1024, self.random_state)
+        repeat_std = repeats.std(axis=1)
+        # One batch of 9 * 1024 shots
+        batch = sample_counts(self.probabilities, 9 * 1024, self.random_state)
+        np.testing.assert_allclose(multinomial_mean(batch, 1024), repeats.mean(axis=1), atol=5 * 16 / 3)
+        analytic_std = multinomial_std(batch, 1024)
+        # The std of 9 repeats scatters by about 25%, compare over the whole sweep.
+        # np.std over n repeats (ddof=0) has expected variance (n - 1) / n of the true one
+        self.assertAlmostEqual(np.mean(repeat_std ** 2) / np.mean(analytic_std ** 2), 8. / 9, delta=0.15)
+        np.testing.assert_allclose(analytic_std, np.sqrt(1024 * self.probabilities * (1 - self.probabilities)),
+                                   rtol=0.2, atol=1)
+
+    def test_bootstrap_matches_analytic(self):
+        bits = np.array([[0, 0], [1, 0], [0, 1], [1, 1]], dtype=np.uint8)
+        shots = bits[self.random_state.choice(4, size=4096, p=[0.1, 0.5, 0.3, 0.1])]
+        counts = np.bincount(shots[:, 0] + 2 * shots[:, 1], minlength=4)
+        np.testing.assert_allclose(bootstrap_std(shots, 1024, resamples=2000, random_state=0),
+                                   multinomial_std(counts, 1024), rtol=0.1)
+
+    def test_bootstrap_sweep(self):
+        # A batch of 4096 measured bits per timestep
+        batch = sample_counts(self.probabilities[:5], 4096, self.random_state)
+        packed = np.stack([np.repeat(np.arange(4), counts) for counts in batch])
+        # Classical register 0 is the least significant bit
+        data = np.stack([packed & 1, packed >> 1], axis=-1)
+        self.assertEqual(data.shape, (5, 4096, 2))
+        std = bootstrap_std(data, 1024, resamples=2000, random_state=0)
+        self.assertEqual(std.shape, (5, 4))
+        np.testing.assert_allclose(std, multinomial_std(batch, 1024), rtol=0.1, atol=0.5)
+        np.testing.assert_array_equal(bootstrap_counts(np.zeros((3, 10), dtype=int), 2, resamples=4).shape, (3, 4, 4))
+
+    def test_bootstrap_counts(self):
+        counts = bootstrap_counts([0, 1, 1, 3], 2, shots=10, resamples=5, random_state=0)
+        self.assertEqual(counts.shape, (5, 4))
+        np.testing.assert_array_equal(counts.sum(axis=1), 10)
+        np.testing.assert_array_equal(counts[:, 2], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()